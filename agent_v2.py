@@ -4,104 +4,811 @@ Dev Agent Script - Version 2
 This script processes input from the Dev Agent VS Code extension and returns a response.
 """
 
-import argparse
+import functools
+import itertools
 import json
 import sys
 import os
-import traceback
-import subprocess
-from datetime import datetime
+import re
+import time
+from contextlib import contextmanager
+
+from dev_agent import deadline, sessions
+from dev_agent.router import Request, Router
+from dev_agent.sections import Progress, Response, bullet_list, code_block, heading, iter_frames, paragraph, subsection, table
+
+# Directory holding agent_v2.py and workflow_engine/. When the agent runs from a
+# zipapp built by scripts/build_zipapp.py, __file__ is inside the archive and
+# this is the directory of the archive instead.
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if os.path.isfile(AGENT_DIR):
+    AGENT_DIR = os.path.dirname(AGENT_DIR)
 
 def parse_arguments():
     """Parse command line arguments."""
+    import argparse
     parser = argparse.ArgumentParser(description='Dev Agent Script')
     parser.add_argument('--input-file', type=str, help='Path to the input JSON file')
+    parser.add_argument('--framed', action='store_true',
+                        help='Read the request as a frame on stdin and write the reply as frames on stdout '
+                             '(see dev_agent/ipc.py)')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
+    parser.add_argument('--timings', action='store_true',
+                        help='Emit a per-phase timing breakdown as JSON on stderr')
+    parser.add_argument('--timings-log', type=str,
+                        help='Append the timing breakdown as a JSON line to this file (implies --timings)')
+    parser.add_argument('--memory-budget', type=int, default=64,
+                        help='Memory budget in MB for large-file analysis')
+    parser.add_argument('--large-file-threshold', type=int, default=8,
+                        help='Analyze files larger than this many MB in streaming large-file mode')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a resident server answering JSON-line requests')
+    parser.add_argument('--socket', type=str, help='Unix socket path to listen on in --serve mode')
+    parser.add_argument('--port', type=int, help='Local TCP port to listen on in --serve mode')
+    parser.add_argument('--workers', type=int, default=4, help='Worker threads in --serve mode')
+    parser.add_argument('--request-timeout', type=float, help='Seconds before a served request times out')
+    parser.add_argument('--prefetch-workers', type=int, help='Most workers prefetch requests may use in --serve mode')
+    parser.add_argument('--batch-workers', type=int, help='Most workers batch requests may use in --serve mode')
+    parser.add_argument('--max-queued', type=int, help='Requests each priority class may queue before new ones are rejected')
+    parser.add_argument('--prefetch-cache-mb', type=int, default=16,
+                        help='Memory budget in MB for prefetched responses in --serve mode')
+    parser.add_argument('--no-watch', action='store_true',
+                        help='Do not watch workspace folders for changes in --serve mode')
+    parser.add_argument('--watch-polling', action='store_true',
+                        help='Watch workspace folders by polling instead of inotify in --serve mode')
+    parser.add_argument('--session-mb', type=int, default=32,
+                        help='Memory budget in MB for each chat session in --serve mode')
+    parser.add_argument('--session-idle-seconds', type=float, default=1800,
+                        help='Drop chat sessions idle for longer than this in --serve mode')
+    parser.add_argument('--max-sessions', type=int, default=64, help='Chat sessions kept at most in --serve mode')
+    parser.add_argument('--aging-seconds', type=float, default=5.0,
+                        help='Queue wait after which a background request counts as one priority class higher')
+    parser.add_argument('--metrics-port', type=int, help='Expose Prometheus metrics on this local port')
+    parser.add_argument('--metrics-socket', type=str, help='Expose Prometheus metrics on this Unix socket')
+    parser.add_argument('--format', choices=['markdown', 'sections'], default=None,
+                        help='Print markdown (default) or the response sections as JSON')
+    parser.add_argument('--timeout', type=float,
+                        help='Give up on the request (and kill its child processes) after this many seconds')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write each response section as a JSON line as soon as it is computed')
+    parser.add_argument('--plugins', action='store_true',
+                        help='Add the commands of installed dev_agent.commands plugins (always on in --serve mode)')
+    parser.add_argument('--workspace-workers', type=int,
+                        help='Processes analyzing files for "summarize workspace" or converting large files to pseudo code '
+                             '(default: one per CPU)')
     return parser.parse_args()
 
-def process_command(command, file_content, file_path=None, command_type=None):
-    """Process the command and return a response."""
-    if command_type == "explain":
-        return explain_code(file_content, file_path)
-    elif command_type == "pseudo_code":
-        return generate_pseudo_code(file_content, file_path)
-    elif command_type == "workflow":
-        return execute_workflow(command, file_content, file_path)
-    elif command.lower().startswith("explain"):
-        return explain_code(file_content, file_path)
-    elif command.lower().startswith("pseudo code") or command.lower().startswith("provide pseudo"):
-        return generate_pseudo_code(file_content, file_path)
-    elif command.lower().startswith("summarize"):
-        return summarize_file(file_content, file_path)
-    elif command.lower().startswith("execute"):
-        return execute_code(file_content)
-    elif command.lower().startswith("workflow"):
-        return execute_workflow(command, file_content, file_path)
+class Timings:
+    """Per-request timing breakdown measured with a monotonic clock.
+
+    Phases are recorded once per request (load, process, output). Helper times
+    are inclusive and accumulated per helper name, so a helper that calls
+    detect_language also counts that time. Subprocess times are split into
+    spawn (until the child exists) and wait (until it exits). With an
+    ImportTimer installed, the "import" phase is the time spent importing
+    modules outside helpers (imports a helper makes count in its time).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.helpers = {}
+        self.subprocess = {}
+        self._depth = 0
+        self._helpers_exclusive = 0.0
+        self._phase = None
+        self._imports = 0.0
+        self._process_imports = 0.0
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        outer, self._phase = self._phase, name
+        try:
+            yield
+        finally:
+            self._phase = outer
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def add_helper(self, name, elapsed, outermost):
+        total, calls = self.helpers.get(name, (0.0, 0))
+        self.helpers[name] = (total + elapsed, calls + 1)
+        if outermost:
+            self._helpers_exclusive += elapsed
+
+    def add_subprocess(self, name, elapsed):
+        self.subprocess[name] = self.subprocess.get(name, 0.0) + elapsed
+
+    def add_import(self, elapsed):
+        if self._depth == 0:
+            self._imports += elapsed
+            if self._phase == "process":
+                self._process_imports += elapsed
+
+    def to_dict(self, command_type=None):
+        """Return the breakdown in milliseconds as a JSON-serializable dict."""
+        ms = lambda seconds: round(seconds * 1000, 3)
+        process = self.phases.get('process', 0.0)
+        # Whatever process time is not spent in helpers, importing modules or
+        # waiting on a child is string formatting of the markdown response.
+        render = process - self._helpers_exclusive - self._process_imports - sum(self.subprocess.values())
+        return {
+            "event": "timings",
+            "command_type": command_type,
+            "total_ms": ms(time.perf_counter() - self.started),
+            "phases": {**{name: ms(t) for name, t in self.phases.items()}, "import": ms(self._imports),
+                       "render": ms(max(render, 0.0))},
+            "helpers": {name: {"ms": ms(t), "calls": calls} for name, (t, calls) in self.helpers.items()},
+            "subprocess": {name: ms(t) for name, t in self.subprocess.items()},
+        }
+
+class ImportTimer:
+    """Meta path finder recording in a Timings how long modules take to import.
+
+    It finds modules with the finders after it in sys.meta_path, and times
+    each import from finding the module to the end of its execution; an
+    import is counted once, with the imports it triggers.
+    """
+
+    def __init__(self, timings):
+        self.timings = timings
+        self._depth = 0
+
+    def find_spec(self, name, path, target=None):
+        start = time.perf_counter()
+        for finder in sys.meta_path:
+            if finder is not self and hasattr(finder, "find_spec"):
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+        else:
+            return None
+        if hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self, start, self._depth == 0)
+        return spec
+
+class _TimedLoader:
+    """Wraps a module's loader until the module has been executed."""
+
+    def __init__(self, loader, timer, start, outermost):
+        self.loader = loader
+        self.timer = timer
+        self.start = start
+        self.outermost = outermost
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer._depth += 1
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer._depth -= 1
+            module.__spec__.loader = module.__loader__ = self.loader
+            if self.outermost:
+                self.timer.timings.add_import(time.perf_counter() - self.start)
+
+# Active timing collector for the current request, or None when disabled
+_timings = None
+
+def timed(func):
+    """Record the inclusive run time of an analysis helper when timings are enabled."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        timings = _timings
+        if timings is None:
+            return func(*args, **kwargs)
+        outermost = timings._depth == 0
+        timings._depth += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings._depth -= 1
+            timings.add_helper(func.__name__, time.perf_counter() - start, outermost)
+    return wrapper
+
+@contextmanager
+def phase(name):
+    """Time a request phase if timings are enabled."""
+    if _timings is None:
+        yield
     else:
-        return process_custom_command(command, file_content, file_path)
+        with _timings.phase(name):
+            yield
 
-def explain_code(code, file_path=None):
-    """Explain the provided code."""
-    file_info = f" in {os.path.basename(file_path)}" if file_path else ""
-    return f"""
-# Code Explanation{file_info}
+# Commands whose response depends only on the request, so it can be cached
+CACHEABLE_COMMANDS = {"explain", "pseudo_code", "summarize", "schema", "custom"}
+# Responses computed ahead of time for the active editor file in --serve mode
+PREFETCH_COMMANDS = ("explain", "summarize")
 
-This code appears to be {detect_language(code, file_path)}.
+# Files above the threshold are streamed line by line within the memory budget
+# instead of being split into lists (see dev_agent/large_file.py)
+LARGE_FILE_THRESHOLD = 8 * 1024 * 1024
+MEMORY_BUDGET = 64 * 1024 * 1024
 
-## Overview
-The code {get_code_overview(code, file_path)}.
+# Process pool size for workspace summaries and large pseudo-code conversions;
+# None means one process per CPU
+WORKSPACE_WORKERS = None
 
-## Key Components
-{get_key_components(code)}
+# Chat sessions of the resident server (see dev_agent/sessions.py); None outside --serve mode
+SESSIONS = None
 
-## Potential Issues
-{get_potential_issues(code)}
+# Verbs a workspace question may start with: "show import cycles", "list all todos"
+QUERY_VERBS = ("", "list ", "find ", "show ", "all ", "any ", "list all ", "find all ", "show all ")
 
-## Suggestions for Improvement
-{get_improvement_suggestions(code)}
-"""
+# Questions answered from the workspace's Python import and call graph
+GRAPH_TOPICS = ("callers of", "who calls", "transitive imports", "imports of", "import cycles")
+GRAPH_QUERIES = tuple(verb + topic for verb in QUERY_VERBS for topic in GRAPH_TOPICS)
+GRAPH_MAX_DEFINITIONS = 10
+GRAPH_MAX_CALLERS = 50
 
-def generate_pseudo_code(code, file_path=None):
-    """Generate pseudo code for the provided code."""
-    file_info = f" for {os.path.basename(file_path)}" if file_path else ""
-    return f"""
-# Pseudo Code{file_info}
+# Issue marker queries: "todos", "all FIXMEs under src/ older than 90 days", "list bare excepts"
+MARKER_QUERIES = tuple(verb + noun
+                       for verb in QUERY_VERBS
+                       for noun in ("issue markers", "markers", "todos", "fixmes", "hacks", "bare excepts", "prints",
+                                    "leftover prints"))
+MARKER_MAX_ROWS = 100
 
-```
-{get_pseudo_code(code)}
-```
+# Custom prompts are answered by the first topic with a keyword anywhere in the prompt
+CUSTOM_TOPICS = (
+    (("explain",), "overview"),
+    (("summarize",), "summary"),
+    (("improve", "optimize"), "suggestions"),
+    (("issue", "bug"), "issues"),
+)
+CUSTOM_INTROS = {
+    "overview": "Here's an explanation of the code you provided:",
+    "summary": "Here's a summary of the content:",
+    "suggestions": "Here are some suggestions for improvement:",
+    "issues": "Here are potential issues in the code:",
+}
 
-## Explanation
-{get_pseudo_code_explanation(code)}
-"""
+# Reviews of the changes in the git working tree against a base revision
+REVIEW_BASE = re.compile(r"\b(?:against|since|from|vs\.?)\s+[`'\"]?([^\s`'\"]+)", re.IGNORECASE)
+REVIEW_MAX_FILES = 50
+# Judged on a hunk's added lines, which rarely carry the docstring of their function
+REVIEW_SKIPPED_ISSUES = ("- Limited or no comments/documentation",)
+REVIEW_MAX_COMMENTS = 5
+# Git finds no function context in these; the line it shows instead is arbitrary text
+REVIEW_NO_CONTEXT_LANGUAGES = frozenset({"Markdown", "JSON", "XML", "YAML"})
+
+def classify_command(command, command_type=None):
+    """Return the kind of command a request resolves to."""
+    return ROUTER.classify(command, command_type)
+
+def process_command(command, file_content, file_path=None, command_type=None, workspace_folders=None,
+                    include_callers=False, data=None):
+    """Process the command and return a response."""
+    return build_response(command, file_content, file_path, command_type, workspace_folders,
+                          include_callers, data).to_markdown()
+
+def build_response(command, file_content, file_path=None, command_type=None, workspace_folders=None,
+                   include_callers=False, data=None):
+    """Process the command and return the response as sections."""
+    return Response(iter_sections(command, file_content, file_path, command_type, workspace_folders,
+                                  include_callers, data))
+
+def iter_sections(command, file_content, file_path=None, command_type=None, workspace_folders=None,
+                  include_callers=False, data=None):
+    """Process the command, yielding response sections as they are computed.
+
+    Long-running handlers also yield Progress items between sections. The
+    current request's cancel token is checked before each item.
+    """
+    return deadline.checked(select_handler(command, file_content, file_path, command_type, workspace_folders,
+                                           include_callers, data))
+
+def select_handler(command, file_content, file_path=None, command_type=None, workspace_folders=None,
+                   include_callers=False, data=None):
+    """Return the section generator of the handler for this command.
+
+    include_callers adds the callers of a Python file's functions, found in
+    the workspace folders, to an explanation. data is the whole request,
+    for commands that take more than a prompt and a file.
+    """
+    return ROUTER.dispatch(Request(command, file_content, file_path, command_type, workspace_folders,
+                                   include_callers, data))
+
+# Commands
+# Each is selected by its prompt prefixes, or by its name as the request's
+# command_type unless it is untyped. Untyped kinds are the ones the extension
+# sends as command_type for any prompt, which must still be routed by text.
+
+ROUTER = Router(default="custom")
+
+@ROUTER.command("workspace", "summarize workspace")
+def workspace_command(request):
+    return summarize_workspace(request.folders)
+
+@ROUTER.command("duplicates", "find duplicate")
+def duplicates_command(request):
+    return find_duplicates(request.folders)
+
+@ROUTER.command("graph", *GRAPH_QUERIES)
+def graph_command(request):
+    return query_module_graph(request.command, request.file_path, request.folders)
+
+def review_base(request):
+    """Return the revision a review is against: the one the prompt names, or HEAD."""
+    match = REVIEW_BASE.search(request.command)
+    return match.group(1).rstrip(".?") if match else "HEAD"
+
+@ROUTER.command("review", "review", parse=review_base, word=True)
+def review_command(request):
+    return review_changes(request.args, request.file_path, request.folders)
+
+@ROUTER.command("markers", *MARKER_QUERIES, word=True)
+def markers_command(request):
+    return list_markers(request.command, request.folders)
+
+@ROUTER.command("reindex")
+def reindex_command(request):
+    return reindex_files(request.data.get('changed_paths') or [], request.data.get('rescan_folders') or [])
+
+@ROUTER.command("schema", "infer schema", "json schema", "schema")
+def schema_command(request):
+    return summarize_structured("schema", request.file_content, request.file_path)
+
+@ROUTER.command("explain", "explain")
+def explain_command(request):
+    callers_in = request.folders if request.include_callers else None
+    return large_file_handler(request) or explain_code(request.file_content, request.file_path, callers_in)
+
+@ROUTER.command("pseudo_code", "pseudo code", "provide pseudo")
+def pseudo_code_command(request):
+    return large_file_handler(request) or generate_pseudo_code(request.file_content, request.file_path)
+
+@ROUTER.command("summarize", "summarize", typed=False)
+def summarize_command(request):
+    if request.file_path:
+        from dev_agent import structured
+        if structured.format_of(request.file_path):
+            return summarize_structured("summarize", request.file_content, request.file_path)
+    return large_file_handler(request) or summarize_file(request.file_content, request.file_path)
+
+@ROUTER.command("execute", "execute", typed=False)
+def execute_command(request):
+    return execute_code(request.file_content)
+
+@ROUTER.command("workflow", "workflow")
+def workflow_command(request):
+    return execute_workflow(request.command, request.file_content, request.file_path)
+
+@ROUTER.command("custom", typed=False)
+def custom_command(request):
+    return large_file_handler(request) or process_custom_command(request.command, request.file_content,
+                                                                 request.file_path)
+
+def large_file_handler(request):
+    """Return the streaming large-file handler if the request's file is over the threshold, else None."""
+    file_content, file_path = request.file_content, request.file_path
+    if len(file_content) > LARGE_FILE_THRESHOLD or (not file_content and file_path):
+        from dev_agent import large_file
+        if large_file.is_large(file_content, file_path, LARGE_FILE_THRESHOLD):
+            return process_large_file(request.kind, request.command, file_content, file_path)
+    return None
+
+def process_large_file(kind, command, file_content, file_path=None):
+    """Answer a command for a file too large to analyze in memory, yielding sections.
+
+    file_content may be empty, in which case the file is streamed from disk.
+    """
+    from dev_agent import large_file
+    limits = large_file.Limits(MEMORY_BUDGET)
+    language = detect_language(large_file.read_head(file_content, file_path), file_path)
+
+    if kind == "pseudo_code":
+        file_info = f" for {os.path.basename(file_path)}" if file_path else ""
+        yield heading("title", f"Pseudo Code{file_info}", level=1)
+        from dev_agent.pseudo_code import iter_pseudo_code
+        lines = large_file.iter_source_lines(file_content, file_path, limits)
+        pseudo_code = list(itertools.islice(iter_pseudo_code(lines), limits.max_items + 1))
+        yield code_block("pseudo-code", "\n".join(pseudo_code[:limits.max_items]))
+        if len(pseudo_code) > limits.max_items:
+            yield paragraph("large-file-note", f"_Showing the first {limits.max_items} lines; the file is too large to convert in full._")
+        yield from subsection("explanation", "Explanation", get_pseudo_code_explanation(file_content))
+        return
+
+    # The title does not depend on the analysis, so it goes out before the file is read
+    if kind == "explain":
+        file_info = f" in {os.path.basename(file_path)}" if file_path else ""
+        yield heading("title", f"Code Explanation{file_info}", level=1)
+    elif kind == "summarize":
+        file_info = f" for {os.path.basename(file_path)}" if file_path else ""
+        yield heading("title", f"File Summary{file_info}", level=1)
+    else:
+        file_info = f" for {os.path.basename(file_path)}" if file_path else ""
+        yield heading("title", f'Response to: "{command}"{file_info}', level=1)
+
+    analysis = large_file.analyze(large_file.iter_chunks(file_content, file_path, limits), language, limits)
+    yield paragraph("large-file-note", large_file.large_file_note(analysis))
+    if kind == "explain":
+        yield paragraph("language", f"This code appears to be {language}.")
+        yield from subsection("overview", "Overview", f"The code {large_file.render_overview(analysis, language)}.")
+        yield from subsection("key-components", "Key Components", large_file.render_components(analysis))
+        yield from subsection("potential-issues", "Potential Issues", large_file.render_issues(analysis))
+        yield from subsection("suggestions", "Suggestions for Improvement", large_file.render_suggestions(analysis))
+    elif kind == "summarize":
+        yield paragraph("summary", large_file.render_file_summary(analysis, language))
+        yield from subsection("key-points", "Key Points", large_file.render_key_points(analysis))
+        symbols = large_file.outline_symbols(file_content, file_path, language, limits)
+        yield from subsection("structure", "Structure", large_file.render_structure(analysis, language, symbols))
+    else:
+        topic = custom_topic(command)
+        if topic == "overview":
+            details = large_file.render_overview(analysis, language)
+        elif topic == "summary":
+            details = large_file.render_file_summary(analysis, language)
+        elif topic == "suggestions":
+            details = large_file.render_suggestions(analysis)
+        elif topic == "issues":
+            details = large_file.render_issues(analysis)
+        if topic is None:
+            answer = f"I've processed your command: '{command}'. The content you provided is {analysis.char_count} characters long."
+        else:
+            answer = CUSTOM_INTROS[topic] + "\n\n" + details
+        yield paragraph("answer", answer)
+        yield from subsection("additional-info", "Additional Information",
+                              f"The content appears to be written in {language}. It contains {analysis.line_count} lines and {analysis.char_count} characters.")
+
+def explain_code(code, file_path=None, callers_in=None):
+    """Explain the provided code, yielding sections.
+
+    With callers_in (workspace folders), a Python file's explanation ends
+    with the callers of its functions and classes.
+    """
+    file_info = f" in {os.path.basename(file_path)}" if file_path else ""
+    yield heading("title", f"Code Explanation{file_info}", level=1)
+    yield paragraph("language", f"This code appears to be {detect_language(code, file_path)}.")
+    yield from subsection("overview", "Overview", f"The code {get_code_overview(code, file_path)}.")
+    yield from subsection("key-components", "Key Components", get_key_components(code))
+    yield from subsection("potential-issues", "Potential Issues", get_potential_issues(code))
+    yield from subsection("suggestions", "Suggestions for Improvement", get_improvement_suggestions(code))
+    if callers_in and file_path and file_path.endswith(".py"):
+        callers = get_callers(file_path, callers_in)
+        if callers is not None:
+            yield from subsection("callers", "Callers", callers)
+
+def generate_pseudo_code(code, file_path=None):
+    """Generate pseudo code for the provided code, yielding sections."""
+    file_info = f" for {os.path.basename(file_path)}" if file_path else ""
+    yield heading("title", f"Pseudo Code{file_info}", level=1)
+    yield code_block("pseudo-code", get_pseudo_code(code))
+    yield from subsection("explanation", "Explanation", get_pseudo_code_explanation(code))
 
 def summarize_file(content, file_path=None):
-    """Summarize the provided file content."""
+    """Summarize the provided file content, yielding sections."""
     file_info = f" for {os.path.basename(file_path)}" if file_path else ""
-    return f"""
-# File Summary{file_info}
+    yield heading("title", f"File Summary{file_info}", level=1)
+    yield paragraph("summary", get_file_summary(content, file_path))
+    yield from subsection("key-points", "Key Points", get_key_points(content))
+    yield from subsection("structure", "Structure", get_file_structure(content, file_path))
 
-{get_file_summary(content, file_path)}
+def summarize_workspace(folders):
+    """Summarize every source file in the workspace folders, yielding partial totals, then sections."""
+    from dev_agent import workspace
+    yield heading("title", "Workspace Summary", level=1)
+    summary = workspace.WorkspaceSummary(folders)
+    for totals in workspace.scan(summary, workers=WORKSPACE_WORKERS):
+        yield Progress("workspace-totals", totals)
 
-## Key Points
-{get_key_points(content)}
+    folder_info = ", ".join(f"`{os.path.basename(folder) or folder}`" for folder in summary.roots)
+    if not summary.files:
+        yield paragraph("summary", f"No source files were found in {folder_info}.")
+        return
+    cache_info = f" ({summary.cached} unchanged since the last summary)" if summary.cached else ""
+    yield paragraph("summary", f"{folder_info} contains {summary.files} source files{cache_info} with "
+                               f"{summary.lines} lines in {len(summary.languages)} languages.")
+    yield heading("languages-heading", "Languages")
+    languages = sorted(summary.languages.items(), key=lambda item: (-item[1][1], item[0]))
+    yield table("languages", ("Language", "Files", "Lines", "Classes", "Functions"),
+                ((language, *totals) for language, totals in languages))
+    yield heading("largest-files-heading", "Largest Files")
+    yield table("largest-files", ("File", "Lines"), ((f"`{name}`", lines) for lines, name in summary.largest_files()))
+    yield heading("complex-files-heading", "Most Complex Files")
+    yield table("complex-files", ("File", "Branch points"),
+                ((f"`{name}`", branches) for branches, name in summary.most_complex_files() if branches))
+    yield from subsection("markers", "TODO and FIXME", f"- TODO: {summary.todo}\n- FIXME: {summary.fixme}")
+    notes = []
+    if summary.other_files:
+        notes.append(f"{summary.other_files} files in other formats were not analyzed")
+    if summary.skipped:
+        notes.append(f"{summary.skipped} binary, unreadable or oversized files were skipped")
+    if notes:
+        yield paragraph("workspace-note", f"_{'; '.join(notes)}._")
 
-## Structure
-{get_file_structure(content, file_path)}
-"""
+def plural(count, noun):
+    """Return e.g. "1 module" or "3 modules"."""
+    return f"{count} {noun}{'' if count == 1 else 's'}"
+
+def inline_code(text):
+    """Return text as a markdown code span, fenced with more backticks than any run it contains."""
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    fence = "`" * (longest + 1)
+    padding = " " if longest else ""
+    return f"{fence}{padding}{text}{padding}{fence}"
+
+def graph_argument(command):
+    """Return what a graph question is about: the text after "of" or "who calls", unquoted."""
+    lowered = command.lower()
+    for marker in (" of ", "who calls "):
+        index = lowered.find(marker)
+        if index != -1:
+            argument = command[index + len(marker):].strip().rstrip("?").strip()
+            argument = argument.strip("`'\"")
+            return argument[:-2] if argument.endswith("()") else argument
+    return ""
+
+def query_module_graph(command, file_path, folders):
+    """Answer a question about the import and call graph of the workspace's Python modules, yielding sections."""
+    from dev_agent.graph import get_graph
+    graph = get_graph(folders, WORKSPACE_WORKERS)
+    lowered = " ".join(command.lower().split())
+    lowered = lowered[max(len(verb) for verb in QUERY_VERBS if lowered.startswith(verb)):]
+    modules = len(graph.summaries)
+
+    if lowered.startswith("import cycles"):
+        yield heading("title", "Import Cycles", level=1)
+        cycles = graph.import_cycles()
+        if not cycles:
+            yield paragraph("summary", f"No import cycles were found among the {modules} Python modules of the workspace.")
+            return
+        yield paragraph("summary", f"Found {plural(len(cycles), 'import cycle')} "
+                                   f"among the {modules} Python modules of the workspace.")
+        yield bullet_list("cycles", (" → ".join(f"`{graph.names[path]}`" for path in cycle) for cycle in cycles))
+
+    elif lowered.startswith(("transitive imports", "imports of")):
+        argument = graph_argument(command)
+        path = graph.module_path(argument) if argument else None
+        if path is None and argument and os.path.abspath(argument) in graph.summaries:
+            path = os.path.abspath(argument)
+        if path is None and file_path:
+            # "this file", or anything else that names no module: the file the question was asked in
+            path, argument = os.path.abspath(file_path), None
+        if path is None:
+            path = os.path.abspath(argument)
+        name = graph.names.get(path, argument or os.path.basename(path))
+        yield heading("title", f"Transitive Imports of `{name}`", level=1)
+        if path not in graph.summaries:
+            yield paragraph("summary", f"`{name}` is not a Python module of the workspace.")
+            return
+        imported, external = graph.transitive_imports(path)
+        direct = sum(1 for depth, _ in imported if depth == 1)
+        yield paragraph("summary", f"`{name}` imports {plural(len(imported), 'workspace module')} ({direct} directly) "
+                                   f"and {plural(len(external), 'external package')}.")
+        yield from subsection("workspace-imports", "Workspace Modules",
+                              "\n".join(f"- `{graph.names[target]}`" + (f" (through {plural(depth - 1, 'other module')})" if depth > 1 else "")
+                                        for depth, target in imported) or "None")
+        yield from subsection("external-imports", "External Packages",
+                              ", ".join(f"`{package}`" for package in external) or "None")
+
+    else:
+        symbol = graph_argument(command)
+        yield heading("title", f"Callers of `{symbol}`", level=1)
+        definitions = graph.find_definitions(symbol) if symbol else []
+        if not definitions:
+            yield paragraph("summary", f"No function, method or class named `{symbol}` was found in the "
+                                       f"{modules} Python modules of the workspace.")
+            return
+        for number, definition in enumerate(definitions[:GRAPH_MAX_DEFINITIONS], 1):
+            calls = graph.callers(definition)
+            lines = [f"- `{call.caller}` in `{graph.names[call.path]}` line {call.line}"
+                     + ("" if call.certain else " (possible: matched by method name)") for call in calls[:GRAPH_MAX_CALLERS]]
+            if len(calls) > GRAPH_MAX_CALLERS:
+                lines.append(f"- ... and {len(calls) - GRAPH_MAX_CALLERS} more")
+            yield from subsection(f"callers-{number}", f"`{definition.qualified}` ({definition.kind}, "
+                                                       f"`{graph.names[definition.path]}` line {definition.line})",
+                                  "\n".join(lines) or "No callers were found in the workspace.")
+
+def get_callers(file_path, folders):
+    """List the callers of a Python file's functions and classes; None if it is not in the workspace."""
+    from dev_agent.graph import get_graph
+    graph = get_graph(folders, WORKSPACE_WORKERS)
+    path = os.path.abspath(file_path)
+    if path not in graph.summaries:
+        return None
+    lines = []
+    for definition in graph.definitions_in(path):
+        calls = graph.callers(definition)
+        if calls:
+            shown = ", ".join(f"`{call.caller}` ({graph.names[call.path]}:{call.line})" for call in calls[:5])
+            more = f" and {len(calls) - 5} more" if len(calls) > 5 else ""
+            lines.append(f"- `{definition.qualname}` is called from {shown}{more}")
+    return "\n".join(lines) or "No calls to the functions and classes in this file were found in the workspace."
+
+def list_markers(command, folders):
+    """List the TODO/FIXME/HACK comments, bare excepts and prints in the workspace a question asks for, yielding sections."""
+    from dev_agent import markers
+    query = markers.parse_query(command)
+    index = markers.get_index(folders, WORKSPACE_WORKERS)
+    found = index.query(query)
+    kinds = [kind for kind in markers.KINDS if query.kinds is None or kind in query.kinds]
+    yield heading("title", "Issue Markers", level=1)
+
+    what = ", ".join(kinds[:-1]) + (" or " if len(kinds) > 1 else "") + kinds[-1]
+    scope = f"{plural(len(index.names), 'file')} of the workspace"
+    if not found:
+        yield paragraph("summary", f"No {what} markers{query.describe()} were found in {scope}.")
+        return
+    by_kind = ", ".join(f"{count} {kind}" for kind, count in
+                        ((kind, sum(1 for marker in found if marker.kind == kind)) for kind in kinds) if count)
+    yield paragraph("summary", f"Found {plural(len(found), 'marker')}{query.describe()} in "
+                               f"{plural(len({marker.path for marker in found}), 'file')} ({by_kind}), "
+                               f"among {scope}.")
+    header = ("File", "Line", "Kind", "Text") + (("Author", "Date") if query.needs_blame else ())
+    rows = []
+    for marker in found[:MARKER_MAX_ROWS]:
+        row = [f"`{marker.name}`", marker.line, marker.kind, marker.text.replace("|", "\\|")]
+        if query.needs_blame:
+            if not marker.blamed:
+                row += ["", "not in git"]
+            elif marker.time is None:
+                row += ["", "not committed"]
+            else:
+                row += [marker.author, time.strftime("%Y-%m-%d", time.localtime(marker.time))]
+        rows.append(row)
+    yield table("markers", header, rows)
+    if len(found) > MARKER_MAX_ROWS:
+        yield paragraph("markers-note", f"_Showing {MARKER_MAX_ROWS} of {len(found)} markers"
+                                        f"{', oldest first' if query.needs_blame else ''}._")
+
+def reindex_files(paths, rescan):
+    """Bring the indexes kept in memory up to date after files changed, yielding a report."""
+    from dev_agent import graph, markers
+    updated = graph.files_changed(paths, rescan)
+    rescanned = markers.files_changed(paths, rescan)
+    yield heading("title", "Re-index", level=1)
+    notes = [f"Re-read {plural(updated, 'Python module')} and {plural(rescanned, 'file')} for issue markers "
+             f"for {plural(len(paths), 'changed path')}."]
+    if rescan:
+        notes.append(f"{plural(len(rescan), 'folder')} will be listed again at the next query.")
+    yield paragraph("summary", " ".join(notes))
+
+def find_duplicates(folders):
+    """Report clusters of duplicated code in the workspace folders, yielding progress, then sections."""
+    from dev_agent import duplicates
+    yield heading("title", "Duplicate Code", level=1)
+    report = duplicates.DuplicateReport(folders)
+    for progress in duplicates.scan(report, workers=WORKSPACE_WORKERS):
+        yield Progress("duplicates-progress", progress)
+
+    clusters = report.clusters
+    if not clusters:
+        yield paragraph("summary", f"No duplicated code was found in {report.files_total} source files.")
+        return
+    duplicated = sum(cluster.lines * (len(cluster.locations) - 1) for cluster in clusters)
+    yield paragraph("summary", f"Found {plural(len(clusters), 'group')} of duplicated code in {report.files_total} source files, "
+                               f"about {duplicated} duplicated lines. Identifiers and literals are ignored, so "
+                               f"copies with renamed variables or changed constants are included.")
+    for number, cluster in enumerate(clusters[:duplicates.MAX_CLUSTERS], 1):
+        locations = "\n".join(f"- `{name}` lines {start}-{end}" for name, start, end in cluster.locations)
+        yield from subsection(f"clone-{number}", f"{len(cluster.locations)} copies of ~{cluster.lines} lines "
+                                                 f"({cluster.similarity:.0%} similar)", locations)
+    if len(clusters) > duplicates.MAX_CLUSTERS:
+        yield paragraph("duplicates-note", f"_Showing the {duplicates.MAX_CLUSTERS} largest of {len(clusters)} groups._")
+
+def summarize_structured(kind, file_content, file_path=None):
+    """Summarize the structure of a JSON, JSON Lines or YAML file, yielding sections.
+
+    The file is scanned once in chunks and every record is merged into one
+    inferred schema, so memory stays bounded whatever the file's size.
+    """
+    from dev_agent import structured
+    file_name = os.path.basename(file_path) if file_path else None
+    title = "JSON Schema" if kind == "schema" else "File Summary"
+    yield heading("title", f"{title} for {file_name}" if file_name else title, level=1)
+    try:
+        report = structured.summarize(file_content, file_path)
+    except (ValueError, OSError) as e:
+        yield paragraph("summary", f"The structure could not be read: {e}")
+        return
+    yield paragraph("summary", structured.render_summary(report, file_name))
+    if not report.record_schema.types:
+        yield paragraph("structure", "The file has no records, so there is no structure to infer.")
+        return
+    yield from subsection("structure", "Structure", structured.render_structure(report))
+    if kind == "schema":
+        yield heading("json-schema-heading", "Inferred JSON Schema")
+        yield code_block("json-schema", json.dumps(structured.to_json_schema(report.record_schema), indent=2), "json")
+
+def review_changes(base, file_path, folders):
+    """Review the changes of the git working tree against a base revision, yielding sections.
+
+    Only the changed files are read and only their changed lines are
+    judged; files whose changes match the previous review reuse its analysis.
+    """
+    from dev_agent import changes
+    yield heading("title", f"Change Review against `{base}`", level=1)
+    try:
+        root = changes.repository_root(os.path.dirname(os.path.abspath(file_path)) if file_path else folders[0])
+        commit, description = changes.resolve_base(root, base)
+        file_changes = changes.diff(root, commit)
+    except changes.GitError as e:
+        yield paragraph("summary", f"The changes could not be read from git: {e}")
+        return
+    if not file_changes:
+        yield paragraph("summary", f"There are no changes in `{os.path.basename(root)}` against {description} (`{commit[:10]}`).")
+        return
+
+    analyses, reused = changes.analyze_changes(root, commit, file_changes, lambda change: review_file(root, change))
+    added = sum(change.added for change in file_changes)
+    removed = sum(change.removed for change in file_changes)
+    cache_info = f" ({reused} unchanged since the last review)" if reused else ""
+    yield paragraph("summary", f"{plural(len(file_changes), 'file')} changed{cache_info} in `{os.path.basename(root)}` "
+                               f"against {description} (`{commit[:10]}`), with {added} lines added and {removed} removed.")
+    yield heading("files-heading", "Changed Files")
+    yield table("files", ("File", "Status", "Added", "Removed", "Language"),
+                ((f"`{change.path}`", change.status, change.added, change.removed, analysis["language"] or "-")
+                 for change, analysis in zip(file_changes, analyses)))
+    issues_found = 0
+    for number, (change, analysis) in enumerate(zip(file_changes, analyses), 1):
+        if number > REVIEW_MAX_FILES:
+            yield paragraph("review-note", f"_Showing the first {REVIEW_MAX_FILES} of {len(file_changes)} changed files._")
+            break
+        if change.status == "deleted" or change.binary:
+            continue
+        lines = []
+        if change.status == "renamed":
+            lines.append(f"- Renamed from `{change.old_path}`")
+        ranges = [hunk.new_range() for hunk in change.hunks if hunk.new_count]
+        if ranges:
+            lines.append(f"- Changed lines: {', '.join(ranges)}")
+        if analysis["definitions"]:
+            lines.append(f"- Changed definitions: {', '.join(f'`{name}`' for name in analysis['definitions'])}")
+        elif analysis["contexts"]:
+            lines.append(f"- Changed in: {', '.join(inline_code(context) for context in analysis['contexts'])}")
+        if analysis["components"]:
+            lines.append(f"- Added components: {', '.join(analysis['components'])}")
+        if analysis["comments"]:
+            lines.append(f"- Added comments: {'; '.join(analysis['comments'])}")
+        lines.extend(analysis["issues"])
+        issues_found += len(analysis["issues"])
+        yield from subsection(f"file-{number}", f"`{change.path}`", "\n".join(lines) or "Only removals.")
+    if not issues_found:
+        yield paragraph("issues", "No obvious issues were found in the added lines.")
+
+def review_file(root, change):
+    """Analyze one changed file for a review: its language, the definitions it changes and its added lines.
+
+    The added lines get the checks of explain (components and issues) and
+    of summary (comments), so a review never analyzes unchanged code.
+    """
+    from dev_agent import changes, workspace
+    language = workspace.language_of(change.path)
+    definitions = []
+    if change.path.endswith(".py") and change.status != "deleted":
+        try:
+            with open(os.path.join(root, change.path), "r", encoding="utf-8") as f:
+                definitions = changes.changed_definitions(f.read(), changes.changed_ranges(change))
+        except (OSError, UnicodeDecodeError):
+            pass
+    contexts = []
+    if language is not None and language not in REVIEW_NO_CONTEXT_LANGUAGES:
+        contexts = list(dict.fromkeys(hunk.context for hunk in change.hunks if hunk.context))
+    added = "\n".join(line for hunk in change.hunks for line in hunk.added)
+    issues, components, comments = [], [], []
+    if added.strip():
+        issues = [issue for issue in get_potential_issues(added).split("\n")
+                  if issue.startswith("- ") and issue not in REVIEW_SKIPPED_ISSUES]
+        components = [line[2:] for line in get_key_components(added).split("\n") if line.startswith("- ")]
+        comments = [line[2:] for line in get_key_points(added).split("\n") if line.startswith("- ")][:REVIEW_MAX_COMMENTS]
+    return {"language": language, "definitions": definitions, "contexts": contexts, "components": components,
+            "comments": comments, "issues": issues}
 
 def execute_workflow(command, file_content, file_path=None):
-    """Execute a workflow using the workflow_engine/orchestrator.py script."""
+    """Execute a workflow using the workflow_engine/orchestrator.py script, yielding sections."""
+    from datetime import datetime
     try:
         # Extract workflow name from command
         workflow_name = command.lower().replace("workflow", "").strip()
         if not workflow_name:
             workflow_name = "default"
         
-        # Create a temporary input file for the workflow
-        temp_input_file = f"/tmp/workflow_input_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
-        temp_output_file = f"/tmp/workflow_output_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
-        
         # Prepare input data
         input_data = {
             "command": command,
@@ -110,97 +817,80 @@ def execute_workflow(command, file_content, file_path=None):
             "timestamp": datetime.now().isoformat()
         }
         
-        # Write input data to the temporary file
-        with open(temp_input_file, 'w') as f:
-            json.dump(input_data, f, indent=2)
-        
         # Construct the command to execute the orchestrator.py script
         # Use the workflow_engine's virtual environment
-        orchestrator_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workflow_engine/orchestrator.py")
-        venv_python = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workflow_engine/venv/bin/python")
+        orchestrator_path = os.path.join(AGENT_DIR, "workflow_engine/orchestrator.py")
+        venv_python = os.path.join(AGENT_DIR, "workflow_engine/venv/bin/python")
+        if not os.path.exists(orchestrator_path) and os.path.exists(os.path.join(AGENT_DIR, "orchestrator.pyz")):
+            # A bundle built by scripts/build_zipapp.py: the orchestrator only needs the standard library
+            orchestrator_path = os.path.join(AGENT_DIR, "orchestrator.pyz")
+            venv_python = sys.executable
         
-        # Execute the orchestrator.py script
+        # Execute the orchestrator.py script; the input and the result are
+        # frames (see dev_agent/ipc.py) on its stdin and stdout
         import subprocess
+        from dev_agent import ipc
         cmd = [
             venv_python, 
             orchestrator_path, 
-            "--input-file", temp_input_file,
-            "--output-file", temp_output_file,
+            "--framed",
             "--workflow", workflow_name,
             "--verbose"
         ]
+        token = deadline.current()
+        if token is not None and token.deadline is not None:
+            cmd += ["--deadline", f"{token.deadline:.3f}"]
         
-        process = subprocess.run(cmd, capture_output=True, text=True)
+        # The orchestrator gets its own process group so that it is killed,
+        # with anything it starts, if the request is cancelled
+        spawn_start = time.perf_counter()
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   start_new_session=True)
+        wait_start = time.perf_counter()
+        stdout, stderr = deadline.communicate(process, token, b"".join(ipc.encode(input_data)))
+        stderr = stderr.decode("utf-8", "replace")
+        if _timings is not None:
+            _timings.add_subprocess("spawn", wait_start - spawn_start)
+            _timings.add_subprocess("wait", time.perf_counter() - wait_start)
         
-        # Read the output file
-        if os.path.exists(temp_output_file):
-            with open(temp_output_file, 'r') as f:
-                result = json.load(f)
-        else:
+        # Read the result frame
+        try:
+            result = ipc.decode(stdout)
+        except ipc.FramingError as e:
+            result = {"status": "error", "message": f"Invalid reply from the orchestrator: {str(e)}"}
+        if result is None:
             result = {
                 "status": "error",
-                "message": "Output file not created",
-                "stdout": process.stdout,
-                "stderr": process.stderr
+                "message": "No reply from the orchestrator",
+                "stderr": stderr
             }
         
-        # Clean up temporary files
-        if os.path.exists(temp_input_file):
-            os.remove(temp_input_file)
-        if os.path.exists(temp_output_file):
-            os.remove(temp_output_file)
-        
         # Format the response
         if process.returncode != 0 or result.get("status") == "error":
-            return f"""
-# Workflow Execution Error
-
-## Error
-```
-{process.stderr or result.get("message", "Unknown error")}
-```
-
-## Command
-```
-{' '.join(cmd)}
-```
-
-## Input
-```json
-{json.dumps(input_data, indent=2)}
-```
-"""
+            yield heading("title", "Workflow Execution Error", level=1)
+            yield heading("error-heading", "Error")
+            yield code_block("error", stderr or result.get("message", "Unknown error"))
+            yield heading("command-heading", "Command")
+            yield code_block("command", ' '.join(cmd))
+            yield heading("input-heading", "Input")
+            yield code_block("input", json.dumps(input_data, indent=2), "json")
         else:
-            return f"""
-# Workflow Execution Result
-
-## Output
-```json
-{json.dumps(result, indent=2)}
-```
-
-## Workflow
-{workflow_name}
-
-## Command
-```
-{' '.join(cmd)}
-```
-"""
+            yield heading("title", "Workflow Execution Result", level=1)
+            yield heading("output-heading", "Output")
+            yield code_block("output", json.dumps(result, indent=2), "json")
+            yield from subsection("workflow", "Workflow", workflow_name)
+            yield heading("command-heading", "Command")
+            yield code_block("command", ' '.join(cmd))
     except Exception as e:
-        return f"""
-# Workflow Execution Error
-
-```
-{traceback.format_exc()}
-```
-
-## Command
-{command}
-"""
+        import traceback
+        yield heading("title", "Workflow Execution Error", level=1)
+        yield code_block("error", traceback.format_exc())
+        yield from subsection("command", "Command", command)
 
 def execute_code(code):
-    """Execute the provided Python code and return the result."""
+    """Execute the provided Python code, yielding the result sections."""
+    import subprocess
+    import tempfile
     try:
         # Extract Python code from markdown code blocks if present
         if "```python" in code or "```py" in code:
@@ -222,175 +912,70 @@ def execute_code(code):
             if code_blocks:
                 code = "\n".join(code_blocks)
         
-        # Create a temporary file to execute
-        temp_file = f"/tmp/dev_agent_exec_{datetime.now().strftime('%Y%m%d%H%M%S')}.py"
-        with open(temp_file, "w") as f:
-            f.write(code)
-        
-        # Redirect stdout and stderr to capture output
-        import io
-        from contextlib import redirect_stdout, redirect_stderr
-        
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
-        
-        with redirect_stdout(stdout_buffer), redirect_stderr(stderr_buffer):
-            exec(open(temp_file).read())
-        
-        stdout_output = stdout_buffer.getvalue()
-        stderr_output = stderr_buffer.getvalue()
-        
-        # Clean up the temporary file
-        os.remove(temp_file)
+        # Create a temporary file to execute, unique to this request: served
+        # requests run concurrently
+        fd, temp_file = tempfile.mkstemp(prefix="dev_agent_exec_", suffix=".py")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(code)
+
+            # Run the code in a child interpreter so that it can be killed when the
+            # request is cancelled or runs past its deadline
+            process = subprocess.Popen([sys.executable, temp_file], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       stdin=subprocess.DEVNULL, text=True, start_new_session=True)
+            stdout_output, stderr_output = deadline.communicate(process)
+        finally:
+            # Clean up the temporary file
+            os.remove(temp_file)
         
         # Format the response
+        yield heading("title", "Code Execution Result", level=1)
         if stderr_output:
-            return f"""
-# Code Execution Result
-
-## Error
-```
-{stderr_output}
-```
-
-## Code
-```python
-{code}
-```
-"""
+            yield heading("error-heading", "Error")
+            yield code_block("error", stderr_output)
         else:
-            return f"""
-# Code Execution Result
-
-## Output
-```
-{stdout_output if stdout_output else "No output"}
-```
-
-## Code
-```python
-{code}
-```
-"""
+            yield heading("output-heading", "Output")
+            yield code_block("output", stdout_output if stdout_output else "No output")
+        yield heading("code-heading", "Code")
+        yield code_block("code", code, "python")
     except Exception as e:
-        return f"""
-# Code Execution Error
-
-```
-{traceback.format_exc()}
-```
-
-## Code
-```python
-{code}
-```
-"""
+        import traceback
+        yield heading("title", "Code Execution Error", level=1)
+        yield code_block("error", traceback.format_exc())
+        yield heading("code-heading", "Code")
+        yield code_block("code", code, "python")
 
 def process_custom_command(command, file_content, file_path=None):
-    """Process a custom command."""
+    """Process a custom command, yielding sections."""
     file_info = f" for {os.path.basename(file_path)}" if file_path else ""
-    return f"""
-# Response to: "{command}"{file_info}
-
-I've analyzed the content you provided. Here's my response:
-
-{get_custom_response(command, file_content)}
-
-## Additional Information
-{get_additional_info(command, file_content)}
-"""
+    yield heading("title", f'Response to: "{command}"{file_info}', level=1)
+    yield paragraph("preamble", "I've analyzed the content you provided. Here's my response:")
+    yield paragraph("answer", get_custom_response(command, file_content))
+    yield from subsection("additional-info", "Additional Information", get_additional_info(command, file_content))
 
 # Helper functions for code analysis
+@timed
 def detect_language(code, file_path=None):
     """Detect the programming language of the code."""
-    if file_path:
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == '.py':
-            return "Python"
-        elif ext == '.js':
-            return "JavaScript"
-        elif ext == '.ts':
-            return "TypeScript"
-        elif ext == '.html':
-            return "HTML"
-        elif ext == '.css':
-            return "CSS"
-        elif ext == '.java':
-            return "Java"
-        elif ext == '.c':
-            return "C"
-        elif ext == '.cpp':
-            return "C++"
-        elif ext == '.cs':
-            return "C#"
-        elif ext == '.go':
-            return "Go"
-        elif ext == '.rb':
-            return "Ruby"
-        elif ext == '.php':
-            return "PHP"
-        elif ext == '.swift':
-            return "Swift"
-        elif ext == '.kt':
-            return "Kotlin"
-        elif ext == '.rs':
-            return "Rust"
-        elif ext == '.md':
-            return "Markdown"
-        elif ext == '.json':
-            return "JSON"
-        elif ext == '.xml':
-            return "XML"
-        elif ext == '.yaml' or ext == '.yml':
-            return "YAML"
-    
-    # Simple language detection based on code patterns
-    if 'def ' in code and 'import ' in code:
-        return "Python"
-    elif 'function ' in code and 'var ' in code:
-        return "JavaScript"
-    elif 'class ' in code and 'public ' in code:
-        return "Java or C#"
-    elif '<html>' in code.lower() and '</html>' in code.lower():
-        return "HTML"
-    elif '{' in code and '}' in code and ';' in code:
-        return "a C-family language (C, C++, Java, JavaScript, etc.)"
-    else:
-        return "an unidentified programming language"
+    from dev_agent import languages
+    return languages.detect(code, file_path)
 
+@sessions.reuse
+@timed
 def get_code_overview(code, file_path=None):
     """Get an overview of the code."""
-    language = detect_language(code, file_path)
-    
-    if language == "Python":
-        if "class " in code:
-            return "defines one or more Python classes"
-        elif "def " in code:
-            return "contains one or more Python functions"
-        elif "import " in code:
-            return "imports modules and performs operations"
-        else:
-            return "contains Python script code"
-    elif language == "JavaScript" or language == "TypeScript":
-        if "class " in code:
-            return "defines one or more JavaScript/TypeScript classes"
-        elif "function " in code:
-            return "contains one or more JavaScript/TypeScript functions"
-        elif "import " in code or "require(" in code:
-            return "imports modules and performs operations"
-        else:
-            return "contains JavaScript/TypeScript script code"
-    else:
-        return "implements functionality in " + language
+    from dev_agent import languages
+    return languages.frontend(detect_language(code, file_path)).overview(code)
 
+@sessions.reuse
+@timed
 def get_key_components(code):
     """Identify key components in the code."""
-    lines = code.split('\n')
+    from dev_agent.lines import stripped_lines
     components = []
     
     # Look for classes, functions, imports
-    for line in lines:
-        line = line.strip()
+    for line in stripped_lines(code, 'class ', 'def ', 'import ', 'from '):
         if line.startswith('class '):
             components.append(f"- Class: `{line.split('class ')[1].split('(')[0].split(':')[0]}`")
         elif line.startswith('def '):
@@ -403,6 +988,8 @@ def get_key_components(code):
     else:
         return "No distinct components identified. The code appears to be a script or simple program."
 
+@sessions.reuse
+@timed
 def get_potential_issues(code):
     """Identify potential issues in the code."""
     issues = []
@@ -425,6 +1012,8 @@ def get_potential_issues(code):
     else:
         return "No obvious issues detected in the code."
 
+@sessions.reuse
+@timed
 def get_improvement_suggestions(code):
     """Suggest improvements for the code."""
     suggestions = []
@@ -439,7 +1028,7 @@ def get_improvement_suggestions(code):
     if "except:" in code and "except Exception:" not in code:
         suggestions.append("- Specify exception types in except clauses")
     
-    if len(code.split('\n')) > 200:
+    if code.count('\n') + 1 > 200:
         suggestions.append("- Consider breaking down large files into smaller modules")
     
     if suggestions:
@@ -447,112 +1036,37 @@ def get_improvement_suggestions(code):
     else:
         return "The code appears well-structured. No specific improvements suggested."
 
+@sessions.reuse
+@timed
 def get_pseudo_code(code):
     """Generate pseudo code for the provided code."""
-    # This is a simplified implementation
-    lines = code.split('\n')
-    pseudo_code = []
-    indent = ""
-    
-    for line in lines:
-        stripped = line.strip()
-        if not stripped or stripped.startswith('#'):
-            continue
-        
-        if stripped.startswith('import ') or stripped.startswith('from '):
-            continue
-        
-        if stripped.startswith('class '):
-            class_name = stripped.split('class ')[1].split('(')[0].split(':')[0]
-            pseudo_code.append(f"DEFINE CLASS {class_name}")
-            indent = "  "
-        elif stripped.startswith('def '):
-            func_name = stripped.split('def ')[1].split('(')[0]
-            params = stripped.split('(')[1].split(')')[0]
-            pseudo_code.append(f"{indent}FUNCTION {func_name}({params}):")
-            indent += "  "
-        elif stripped.startswith('if '):
-            condition = stripped.split('if ')[1].split(':')[0]
-            pseudo_code.append(f"{indent}IF {condition} THEN")
-            indent += "  "
-        elif stripped.startswith('elif '):
-            condition = stripped.split('elif ')[1].split(':')[0]
-            indent = indent[:-2]
-            pseudo_code.append(f"{indent}ELSE IF {condition} THEN")
-            indent += "  "
-        elif stripped.startswith('else:'):
-            indent = indent[:-2]
-            pseudo_code.append(f"{indent}ELSE")
-            indent += "  "
-        elif stripped.startswith('for '):
-            loop = stripped.split('for ')[1].split(':')[0]
-            pseudo_code.append(f"{indent}FOR {loop} DO")
-            indent += "  "
-        elif stripped.startswith('while '):
-            condition = stripped.split('while ')[1].split(':')[0]
-            pseudo_code.append(f"{indent}WHILE {condition} DO")
-            indent += "  "
-        elif stripped.startswith('return '):
-            value = stripped.split('return ')[1]
-            pseudo_code.append(f"{indent}RETURN {value}")
-        elif stripped.startswith(('break', 'continue')):
-            pseudo_code.append(f"{indent}{stripped.upper()}")
-        elif stripped.endswith(':'):
-            # Other block structures
-            pseudo_code.append(f"{indent}{stripped}")
-            indent += "  "
-        else:
-            # Regular statements
-            pseudo_code.append(f"{indent}{stripped}")
-    
-    return "\n".join(pseudo_code)
+    from dev_agent import pseudo_code
+    return pseudo_code.get_pseudo_code(code, WORKSPACE_WORKERS)
 
+@timed
 def get_pseudo_code_explanation(code):
     """Explain the pseudo code."""
     return """The pseudo code above represents the logical structure of the original code, 
 with control structures and function definitions highlighted. It abstracts away 
 implementation details to focus on the algorithm and logic flow."""
 
+@sessions.reuse
+@timed
 def get_file_summary(content, file_path=None):
     """Summarize the file content."""
-    language = detect_language(content, file_path)
-    
-    if file_path:
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == '.md':
-            return "This is a Markdown document that contains formatted text and possibly code examples."
-        elif ext == '.json':
-            return "This is a JSON file that contains structured data in JavaScript Object Notation format."
-        elif ext == '.xml':
-            return "This is an XML file that contains structured data in Extensible Markup Language format."
-        elif ext == '.yaml' or ext == '.yml':
-            return "This is a YAML file that contains structured data in YAML Ain't Markup Language format."
-    
-    line_count = len(content.split('\n'))
-    
-    if language == "Python":
-        class_count = content.count('class ')
-        def_count = content.count('def ')
-        return f"This is a Python file containing approximately {line_count} lines of code, {class_count} classes, and {def_count} function definitions."
-    elif language == "JavaScript":
-        function_count = content.count('function ')
-        return f"This is a JavaScript file containing approximately {line_count} lines of code and {function_count} function definitions."
-    elif language == "TypeScript":
-        function_count = content.count('function ')
-        interface_count = content.count('interface ')
-        return f"This is a TypeScript file containing approximately {line_count} lines of code, {function_count} function definitions, and {interface_count} interfaces."
-    else:
-        return f"This is a {language} file containing approximately {line_count} lines of code."
+    from dev_agent import languages
+    return languages.frontend(detect_language(content, file_path)).summary(content)
 
+@sessions.reuse
+@timed
 def get_key_points(content):
     """Extract key points from the content."""
     # This is a simplified implementation
-    lines = content.split('\n')
+    from dev_agent.lines import stripped_lines
     key_points = []
     
     # Look for comments, function definitions, class definitions
-    for line in lines:
-        line = line.strip()
+    for line in stripped_lines(content, '# ', '// ', '/* '):
         if line.startswith('# ') and len(line) > 3:
             key_points.append(f"- {line[2:]}")
         elif line.startswith('// ') and len(line) > 4:
@@ -565,111 +1079,303 @@ def get_key_points(content):
     else:
         return "No explicit key points identified in comments. Consider adding descriptive comments to highlight important aspects of the code."
 
+@sessions.reuse
+@timed
 def get_file_structure(content, file_path=None):
     """Analyze the structure of the file."""
-    language = detect_language(content, file_path)
-    lines = content.split('\n')
-    structure = []
-    
-    if language == "Python":
-        imports = []
-        classes = []
-        functions = []
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('import ') or line.startswith('from '):
-                imports.append(line)
-            elif line.startswith('class '):
-                classes.append(line.split('class ')[1].split('(')[0].split(':')[0])
-            elif line.startswith('def '):
-                functions.append(line.split('def ')[1].split('(')[0])
-        
-        if imports:
-            structure.append(f"- Imports ({len(imports)}): {', '.join(imports[:3])}{'...' if len(imports) > 3 else ''}")
-        if classes:
-            structure.append(f"- Classes ({len(classes)}): {', '.join(classes)}")
-        if functions:
-            structure.append(f"- Functions ({len(functions)}): {', '.join(functions[:5])}{'...' if len(functions) > 5 else ''}")
-    
-    elif language == "JavaScript" or language == "TypeScript":
-        imports = []
-        classes = []
-        functions = []
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('import '):
-                imports.append(line)
-            elif line.startswith('class '):
-                classes.append(line.split('class ')[1].split(' {')[0].split(' extends')[0])
-            elif line.startswith('function '):
-                functions.append(line.split('function ')[1].split('(')[0])
-            elif ' function ' in line:
-                functions.append(line.split(' function ')[1].split('(')[0])
-        
-        if imports:
-            structure.append(f"- Imports ({len(imports)}): {', '.join(imports[:3])}{'...' if len(imports) > 3 else ''}")
-        if classes:
-            structure.append(f"- Classes ({len(classes)}): {', '.join(classes)}")
-        if functions:
-            structure.append(f"- Functions ({len(functions)}): {', '.join(functions[:5])}{'...' if len(functions) > 5 else ''}")
+    from dev_agent import languages
+    structure = languages.frontend(detect_language(content, file_path)).structure(content)
     
     if structure:
         return "\n".join(structure)
     else:
         return "The file structure could not be automatically analyzed."
 
+def custom_topic(command):
+    """Return what a custom prompt asks about (a CUSTOM_TOPICS topic), or None."""
+    lowered = command.lower()
+    for keywords, topic in CUSTOM_TOPICS:
+        if any(keyword in lowered for keyword in keywords):
+            return topic
+    return None
+
+@timed
 def get_custom_response(command, file_content):
     """Generate a custom response based on the command."""
     # This is a simplified implementation
-    if "explain" in command.lower():
-        return "Here's an explanation of the code you provided:\n\n" + get_code_overview(file_content)
-    elif "summarize" in command.lower():
-        return "Here's a summary of the content:\n\n" + get_file_summary(file_content)
-    elif "improve" in command.lower() or "optimize" in command.lower():
-        return "Here are some suggestions for improvement:\n\n" + get_improvement_suggestions(file_content)
-    elif "issue" in command.lower() or "bug" in command.lower():
-        return "Here are potential issues in the code:\n\n" + get_potential_issues(file_content)
-    else:
+    topic = custom_topic(command)
+    if topic is None:
         return f"I've processed your command: '{command}'. The content you provided is {len(file_content)} characters long."
+    answer = {"overview": get_code_overview, "summary": get_file_summary,
+              "suggestions": get_improvement_suggestions, "issues": get_potential_issues}[topic](file_content)
+    return CUSTOM_INTROS[topic] + "\n\n" + answer
 
+@timed
 def get_additional_info(command, file_content):
     """Provide additional information based on the command and content."""
     # This is a simplified implementation
     language = detect_language(file_content)
-    return f"The content appears to be written in {language}. It contains {len(file_content.split('\\n'))} lines and {len(file_content)} characters."
+    return f"The content appears to be written in {language}. It contains {file_content.count(chr(10)) + 1} lines and {len(file_content)} characters."
+
+def emit_timings(timings, command_type=None, log_path=None):
+    """Write the timing breakdown as one JSON line to stderr or a log file."""
+    line = json.dumps(timings.to_dict(command_type), separators=(',', ':'))
+    if log_path:
+        with open(log_path, 'a') as f:
+            f.write(line + "\n")
+    else:
+        print(line, file=sys.stderr)
+
+def parse_request(input_data):
+    """Extract (command, file_content, file_path, command_type) from request JSON."""
+    command = input_data.get('command', input_data.get('prompt', ''))
+    file_content = input_data.get('file_content', input_data.get('input', ''))
+    file_path = input_data.get('file_path', None)
+    command_type = input_data.get('command_type', None)
+    return command, file_content, file_path, command_type
+
+def response_format(input_data, default="markdown"):
+    """Return "markdown" or "sections" for a request; unknown formats fall back to the default."""
+    fmt = input_data.get('response_format', default)
+    return fmt if fmt in ("markdown", "sections") else default
+
+def render_response(response, input_data, default_format="markdown"):
+    """Render a Response in the format the request asked for."""
+    if response_format(input_data, default_format) == "sections":
+        return response.to_dict(include_markdown=bool(input_data.get('include_markdown')))
+    return response.to_markdown()
+
+def request_workspace_folders(input_data):
+    """Return the workspace folders a request names, or None."""
+    folders = [folder for folder in input_data.get('workspace_folders') or [] if isinstance(folder, str)]
+    return folders or None
+
+def handle_request(input_data):
+    """Process one request dict and return the response (markdown or sections dict).
+
+    Within a chat session, analyses already run on the same file are reused,
+    and so is a response the session got recently.
+    """
+    session = find_session(input_data)
+    if session is None:
+        return answer_request(input_data)
+    with sessions.activate(session):
+        kind, fields = response_fields(input_data)
+        file = session.file_of(fields[1]) if fields is not None else None
+        if file is None:
+            return answer_request(input_data)
+        key = (kind, fields[0], file.digest, *fields[2:])
+        response = session.response(key)
+        if response is None:
+            response = answer_request(input_data)
+            session.add_response(key, response)
+        return response
+
+def answer_request(input_data):
+    response = build_response(*parse_request(input_data), request_workspace_folders(input_data),
+                              bool(input_data.get('include_callers')), input_data)
+    return render_response(response, input_data)
+
+def find_session(input_data):
+    """Return the chat session a request names with "session_id", or None."""
+    session_id = input_data.get('session_id')
+    if SESSIONS is None or not isinstance(session_id, str) or not session_id:
+        return None
+    return SESSIONS.find(session_id)
+
+def prepare_request(input_data):
+    """Resolve a request the resident server received against its chat session.
+
+    The request's file content is added to the session, and replaced with
+    the string the session holds for that content, which is what lets its
+    analyses be reused. A request with neither content nor a path (a
+    follow-up such as "now the pseudo code") gets the file the session last
+    saw. Files in large-file mode are left alone.
+    """
+    session_id = input_data.get('session_id')
+    if SESSIONS is None or not isinstance(session_id, str) or not session_id:
+        return input_data
+    session = SESSIONS.get(session_id)
+    _, file_content, file_path, _ = parse_request(input_data)
+    if file_content:
+        if len(file_content) > LARGE_FILE_THRESHOLD:
+            return input_data
+        file = session.add_file(file_content, file_path)
+        return input_data if file is None else dict(input_data, file_content=file.content)
+    file = session.current_file() if not file_path else None
+    if file is None:
+        return input_data
+    return dict(input_data, file_content=file.content, file_path=file.path)
+
+def normalize_prompt(kind, command):
+    """Reduce a prompt to the part that can change the response.
+
+    Explain, pseudo code and summarize responses depend only on the command
+    kind, so their prompts normalize to ""; custom responses quote the prompt
+    verbatim, so it is kept as is.
+    """
+    return command if kind == "custom" else ""
+
+def expand_prefetch(hint):
+    """Return the requests a user is likely to send for the file in a prefetch hint.
+
+    Files over the large-file threshold are not prefetched, and neither are
+    files that cannot be read as UTF-8 text.
+    """
+    file_path = hint.get('file_path')
+    file_content = hint.get('file_content')
+    if file_content is None:
+        try:
+            if not file_path or os.path.getsize(file_path) > LARGE_FILE_THRESHOLD:
+                return []
+            # newline='' keeps CRLF line endings as the editor sends them
+            with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                file_content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return []
+    elif len(file_content) > LARGE_FILE_THRESHOLD:
+        return []
+    commands = [c for c in hint.get('commands') or PREFETCH_COMMANDS if c in CACHEABLE_COMMANDS]
+    return [{"command": c, "command_type": c, "file_content": file_content, "file_path": file_path,
+             "response_format": hint.get('response_format', 'markdown')} for c in commands]
+
+def expand_changes(paths, rescan):
+    """Return the requests that update the indexes after the watcher reported changes."""
+    return [{"command": "reindex", "command_type": "reindex", "changed_paths": list(paths),
+             "rescan_folders": list(rescan)}]
+
+def describe_request(input_data):
+    """Return (command kind, request fingerprint or None) for the resident server.
+
+    The fingerprint keys the result cache and coalesces identical in-flight
+    requests; commands with side effects get none.
+    """
+    from dev_agent.cache import request_key
+    kind, fields = response_fields(input_data)
+    if fields is None:
+        return kind, None
+    return kind, request_key(kind, *fields)
+
+def response_fields(input_data):
+    """Return (command kind, the fields its response depends on, or None if it cannot be reused).
+
+    The fields are (normalized prompt, file content, file path, response format).
+    """
+    command, file_content, file_path, command_type = parse_request(input_data)
+    kind = classify_command(command, command_type)
+    # Callers depend on the other files of the workspace, not just this request
+    if kind not in CACHEABLE_COMMANDS or (kind == "explain" and input_data.get('include_callers')):
+        return kind, None
+    fmt = response_format(input_data)
+    if fmt == "sections" and input_data.get('include_markdown'):
+        fmt = "sections+markdown"
+    return kind, (normalize_prompt(kind, command), file_content, file_path, fmt)
 
 def main():
     """Main function to process input and generate output."""
+    global _timings, LARGE_FILE_THRESHOLD, MEMORY_BUDGET, WORKSPACE_WORKERS, SESSIONS
     args = parse_arguments()
+    LARGE_FILE_THRESHOLD = args.large_file_threshold * 1024 * 1024
+    MEMORY_BUDGET = args.memory_budget * 1024 * 1024
+    WORKSPACE_WORKERS = args.workspace_workers
+    if args.plugins or args.serve:
+        ROUTER.load_plugins()
+    
+    if args.serve:
+        from dev_agent.scheduler import PRIORITY_CLASSES
+        from dev_agent.server import serve
+        if not args.socket and args.port is None:
+            print("Error: --serve needs --socket or --port to listen on.")
+            sys.exit(1)
+        quotas = {priority: limit for priority, limit in (("prefetch", args.prefetch_workers),
+                                                          ("batch", args.batch_workers)) if limit}
+        max_queued = {priority: args.max_queued for priority in PRIORITY_CLASSES} if args.max_queued else None
+        SESSIONS = sessions.SessionStore(args.max_sessions, args.session_mb * 1024 * 1024, args.session_idle_seconds)
+        serve(handle_request, describe_request, socket_path=args.socket, port=args.port,
+              workers=args.workers, request_timeout=args.request_timeout,
+              metrics_port=args.metrics_port, metrics_socket=args.metrics_socket,
+              quotas=quotas, max_queued=max_queued, aging_seconds=args.aging_seconds,
+              expand_prefetch=expand_prefetch, prefetch_bytes=args.prefetch_cache_mb * 1024 * 1024,
+              expand_changes=expand_changes, watch=not args.no_watch, watch_polling=args.watch_polling,
+              verbose=args.verbose, prepare=prepare_request)
+        return
     
-    if not args.input_file:
-        print("Error: No input file specified. Use --input-file to specify the input JSON file.")
+    reply_stream = None
+    if args.framed:
+        # stdout carries the reply frames; anything else printed goes to stderr
+        from dev_agent import ipc
+        reply_stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
+    elif not args.input_file:
+        print("Error: No input file specified. Use --input-file to specify the input JSON file, or --framed.")
         sys.exit(1)
     
+    def emit(message):
+        if reply_stream is not None:
+            ipc.write_frame(reply_stream, message)
+        else:
+            print(message if isinstance(message, str) else json.dumps(message, separators=(",", ":")))
+            sys.stdout.flush()
+    
+    if args.timings or args.timings_log:
+        _timings = Timings()
+        sys.meta_path.insert(0, ImportTimer(_timings))
+    command_type = None
+    
     try:
-        # Read the input file
-        with open(args.input_file, 'r') as f:
-            input_data = json.load(f)
+        # Read the input frame or file
+        with phase("load"):
+            if args.framed:
+                input_data = ipc.read_frame(sys.stdin.buffer)
+                if not isinstance(input_data, dict):
+                    raise ValueError("no request frame on stdin")
+            else:
+                with open(args.input_file, 'r') as f:
+                    input_data = json.load(f)
         
         # Extract data from input
-        command = input_data.get('command', input_data.get('prompt', ''))
-        file_content = input_data.get('file_content', input_data.get('input', ''))
-        file_path = input_data.get('file_path', None)
-        command_type = input_data.get('command_type', None)
+        command, file_content, file_path, command_type = parse_request(input_data)
+        workspace_folders = request_workspace_folders(input_data)
+        include_callers = bool(input_data.get('include_callers'))
+        
+        # Honor the request's timeout/deadline, and stop (killing any child
+        # process) when the extension gives up on us
+        token = deadline.CancelToken.from_request(input_data, args.timeout)
+        import signal
+        signal.signal(signal.SIGTERM, lambda signum, frame: token.cancel("terminated"))
+        
+        if args.stream:
+            # Sections are written as they are computed, so output is part of processing
+            with phase("process"), deadline.activate(token):
+                for frame in iter_frames(iter_sections(command, file_content, file_path, command_type,
+                                                       workspace_folders, include_callers, input_data)):
+                    emit(frame)
+            return
         
         # Process the command
-        response = process_command(command, file_content, file_path, command_type)
+        with phase("process"), deadline.activate(token):
+            response = build_response(command, file_content, file_path, command_type, workspace_folders, include_callers,
+                                      input_data)
+            output = render_response(response, input_data, args.format or "markdown")
         
         # Print the response
-        print(response)
+        with phase("output"):
+            emit({"status": "ok", "response": output} if args.framed else output)
         
-    except Exception as e:
-        print(f"Error processing input: {str(e)}")
+    except (Exception, deadline.Cancelled) as e:
+        if args.stream:
+            emit({"event": "error", "message": f"Error processing input: {str(e)}"})
+        elif args.framed:
+            emit({"status": "error", "response": f"Error processing input: {str(e)}"})
+        else:
+            print(f"Error processing input: {str(e)}")
         if args.verbose:
+            import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        if _timings is not None:
+            emit_timings(_timings, command_type, args.timings_log)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
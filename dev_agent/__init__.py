@@ -0,0 +1,4 @@
+"""
+Dev Agent support package
+Shared building blocks for the resident agent_v2.py process.
+"""
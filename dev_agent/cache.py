@@ -0,0 +1,112 @@
+"""
+Result Cache
+Bounded LRU cache of rendered agent responses for the resident server.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+def request_key(kind, command, file_content, file_path=None, response_format="markdown"):
+    """Return a stable cache key for a request.
+
+    The file content is hashed separately so the key stays small however
+    large the file is.
+    """
+    content_hash = hashlib.sha256(file_content.encode("utf-8", "surrogatepass")).hexdigest()
+    payload = json.dumps([kind, command, file_path, content_hash, response_format], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """Thread-safe LRU mapping of request keys to responses.
+
+    Responses are markdown strings or, for structured requests, JSON-ready
+    dicts, which are sized by their JSON encoding.
+
+    Entries are evicted least recently used first once either the entry
+    count or the total size of the cached responses exceeds its limit.
+    Speculative (prefetched) responses live in a separate LRU with its own
+    byte budget, so guesses never evict answers that were actually asked
+    for; a speculative entry becomes a regular one on its first hit.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, speculative_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.speculative_bytes = speculative_bytes
+        self._entries = OrderedDict()
+        self._speculative = OrderedDict()
+        self._bytes = 0
+        self._speculative_size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries) + len(self._speculative)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries or key in self._speculative
+
+    @property
+    def size_bytes(self):
+        return self._bytes + self._speculative_size
+
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """Return (value or None, whether the value was prefetched)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0], False
+            entry = self._speculative.pop(key, None)
+            if entry is None:
+                return None, False
+            self._speculative_size -= entry[1]
+        self.put(key, entry[0])
+        return entry[0], True
+
+    def put(self, key, value, speculative=False):
+        """Store value under key, evicting old entries to stay in budget."""
+        encoded = json.dumps(value, separators=(",", ":")) if isinstance(value, dict) else value
+        size = len(encoded.encode("utf-8", "surrogatepass")) if isinstance(encoded, str) else len(encoded)
+        if size > (self.speculative_bytes if speculative else self.max_bytes):
+            return
+        with self._lock:
+            if speculative:
+                if key in self._entries:
+                    return
+                entries, limit = self._speculative, self.speculative_bytes
+            else:
+                old = self._speculative.pop(key, None)
+                if old is not None:
+                    self._speculative_size -= old[1]
+                entries, limit = self._entries, self.max_bytes
+            old = entries.pop(key, None)
+            if old is not None:
+                self._adjust(speculative, -old[1])
+            entries[key] = (value, size)
+            self._adjust(speculative, size)
+            while len(entries) > self.max_entries or self._used(speculative) > limit:
+                _, (_, evicted_size) = entries.popitem(last=False)
+                self._adjust(speculative, -evicted_size)
+
+    def _used(self, speculative):
+        return self._speculative_size if speculative else self._bytes
+
+    def _adjust(self, speculative, delta):
+        if speculative:
+            self._speculative_size += delta
+        else:
+            self._bytes += delta
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._speculative.clear()
+            self._bytes = 0
+            self._speculative_size = 0
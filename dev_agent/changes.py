@@ -0,0 +1,235 @@
+"""
+Change Scope
+What changed in a git working tree since a base revision, file by file and
+hunk by hunk, for reviews that should cost time per changed file rather
+than per file in the repository.
+
+Everything comes from one `git diff -U0` of the working tree against the
+merge base of the base revision and HEAD, so staged, unstaged and committed
+changes of a branch are all included; untracked files are not.
+"""
+
+import ast
+import codecs
+import hashlib
+import json
+import re
+import subprocess
+
+from dev_agent import deadline, workspace
+from dev_agent.lines import Span
+
+CACHE_VERSION = 2
+
+class GitError(Exception):
+    """Raised when git is missing or a git command fails."""
+
+class Hunk:
+    """One changed region: line ranges on both sides plus the added and removed lines."""
+
+    __slots__ = ("old_start", "old_count", "new_start", "new_count", "context", "added", "removed")
+
+    def __init__(self, old_start, old_count, new_start, new_count, context=""):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        # The enclosing function or class line git shows after the @@ header
+        self.context = context
+        self.added = []
+        self.removed = []
+
+    def new_range(self):
+        """Return "a-b" (or "a") for the changed lines of the new file, or None for a pure deletion."""
+        if not self.new_count:
+            return None
+        end = self.new_start + self.new_count - 1
+        return str(self.new_start) if end == self.new_start else f"{self.new_start}-{end}"
+
+    def to_list(self):
+        return [self.old_start, self.old_count, self.new_start, self.new_count, self.context, self.added, self.removed]
+
+class FileChange:
+    """Changes of one file: status is added, modified, deleted or renamed."""
+
+    def __init__(self, path, old_path=None, status="modified"):
+        self.path = path
+        self.old_path = old_path or path
+        self.status = status
+        self.binary = False
+        self.hunks = []
+
+    @property
+    def added(self):
+        return sum(len(hunk.added) for hunk in self.hunks)
+
+    @property
+    def removed(self):
+        return sum(len(hunk.removed) for hunk in self.hunks)
+
+    def fingerprint(self):
+        """JSON-ready form of the change, equal for equal changes (keys the analysis cache)."""
+        return [self.path, self.old_path, self.status, self.binary, [hunk.to_list() for hunk in self.hunks]]
+
+def git(root, *args):
+    """Run a git command in root and return its stdout as text; raise GitError on failure."""
+    try:
+        process = subprocess.Popen(["git", "-C", root, *args], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, start_new_session=True)
+    except OSError as e:
+        raise GitError(f"Cannot run git: {e}")
+    stdout, stderr = deadline.communicate(process)
+    if process.returncode != 0:
+        message = stderr.decode("utf-8", "replace").strip().splitlines()
+        raise GitError(message[-1] if message else f"git {args[0]} failed")
+    return stdout.decode("utf-8", "surrogateescape")
+
+def repository_root(folder):
+    """Return the top directory of the git repository containing folder."""
+    return git(folder, "rev-parse", "--show-toplevel").strip()
+
+def resolve_base(root, base="HEAD"):
+    """Return (commit, description) of the revision to diff the working tree against.
+
+    For a branch or other ref that HEAD is not on, that is the merge base,
+    so only the changes made on this side are reviewed.
+    """
+    try:
+        commit = git(root, "rev-parse", "--verify", "--quiet", f"{base}^{{commit}}").strip()
+    except GitError:
+        raise GitError(f"unknown revision `{base}`")
+    try:
+        merge_base = git(root, "merge-base", commit, "HEAD").strip()
+    except GitError:
+        return commit, base
+    if merge_base and merge_base != commit:
+        return merge_base, f"the merge base of {base} and HEAD"
+    return commit, base
+
+def diff(root, commit, paths=()):
+    """Return the FileChanges of the working tree against commit, optionally limited to paths."""
+    args = ["-c", "core.quotePath=false", "diff", "-U0", "--no-color", "--no-ext-diff", "-M", commit]
+    if paths:
+        args += ["--", *paths]
+    return parse_diff(git(root, *args))
+
+_HUNK = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+
+def _diff_path(value):
+    """Strip the a/ or b/ prefix (and quotes) from a path in a diff header."""
+    # git ends ---/+++ paths containing spaces with a tab
+    value = value.rstrip("\t")
+    if value.startswith('"') and value.endswith('"'):
+        value = codecs.escape_decode(value[1:-1].encode("utf-8", "surrogateescape"))[0].decode("utf-8", "replace")
+    return value[2:] if value[:2] in ("a/", "b/") else value
+
+def parse_diff(text):
+    """Parse `git diff` output into FileChanges."""
+    changes = []
+    current = None
+    hunk = None
+    for line in text.split("\n"):
+        if line.startswith("diff --git "):
+            current = FileChange(None)
+            changes.append(current)
+            hunk = None
+            # Fallback for changes without ---/+++ lines (mode changes, binary files)
+            parts = line[len("diff --git "):].split(" b/", 1)
+            if len(parts) == 2:
+                current.old_path = _diff_path(parts[0])
+                current.path = parts[1]
+        elif current is None:
+            continue
+        elif hunk is not None and line[:1] in ("+", "-", "\\"):
+            if line.startswith("+"):
+                hunk.added.append(line[1:])
+            elif line.startswith("-"):
+                hunk.removed.append(line[1:])
+        elif line.startswith("@@"):
+            match = _HUNK.match(line)
+            if match:
+                old_start, old_count, new_start, new_count, context = match.groups()
+                hunk = Hunk(int(old_start), 1 if old_count is None else int(old_count),
+                            int(new_start), 1 if new_count is None else int(new_count), context.strip())
+                current.hunks.append(hunk)
+        elif line.startswith("new file mode"):
+            current.status = "added"
+        elif line.startswith("deleted file mode"):
+            current.status = "deleted"
+        elif line.startswith("rename from "):
+            current.status = "renamed"
+            current.old_path = line[len("rename from "):]
+        elif line.startswith("rename to "):
+            current.path = line[len("rename to "):]
+        elif line.startswith("Binary files "):
+            current.binary = True
+        elif line.startswith("--- ") and line[4:] != "/dev/null":
+            current.old_path = _diff_path(line[4:])
+        elif line.startswith("+++ ") and line[4:] != "/dev/null":
+            current.path = _diff_path(line[4:])
+    for change in changes:
+        if change.status == "deleted":
+            change.path = change.old_path
+    return changes
+
+def changed_ranges(change):
+    """Return the changed line ranges of the new file as Spans."""
+    return [Span(hunk.new_start, hunk.new_start + hunk.new_count - 1) for hunk in change.hunks if hunk.new_count]
+
+def changed_definitions(source, ranges):
+    """Return the qualified names of the Python functions and classes overlapping the line Spans.
+
+    A change is attributed to the innermost definition around it, so a
+    change in a method names the method rather than also its class.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    names = []
+
+    def visit(node, prefix):
+        """Add the definitions under node that hold changes; return the ranges they hold."""
+        held = set()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                definition = Span(min([child.lineno] + [decorator.lineno for decorator in child.decorator_list]),
+                                  child.end_lineno or child.lineno)
+                overlapping = {span for span in ranges if span.overlaps(definition)}
+                if overlapping:
+                    qualname = prefix + child.name
+                    if overlapping - visit(child, qualname + "."):
+                        names.append(qualname)
+                    held |= overlapping
+            else:
+                held |= visit(child, prefix)
+        return held
+
+    visit(tree, "")
+    return names
+
+def analyze_changes(root, commit, file_changes, analyze, cache_path=None):
+    """Return ([analyze(change) for each change], number reused from the last review).
+
+    A change identical to one seen in the previous review of root against the
+    same base (same hunks, same file) reuses its analysis from the cache; the
+    cache holds only the latest review's files, so it stays as small as the diff.
+    """
+    cache_path = cache_path or workspace.default_cache_path([root], "review")
+    cached = workspace.load_cache(cache_path, CACHE_VERSION).get("files", {})
+    entries = {}
+    results = []
+    reused = 0
+    for change in file_changes:
+        deadline.check()
+        key = hashlib.sha256(json.dumps([commit, change.fingerprint()]).encode("utf-8", "surrogatepass")).hexdigest()
+        entry = cached.get(change.path)
+        if entry is not None and entry[0] == key:
+            reused += 1
+        else:
+            entry = [key, analyze(change)]
+        entries[change.path] = entry
+        results.append(entry[1])
+    if entries != cached:
+        workspace.save_cache(cache_path, {"files": entries}, CACHE_VERSION)
+    return results, reused
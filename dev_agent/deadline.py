@@ -0,0 +1,166 @@
+"""
+Deadlines and Cancellation
+Cancel tokens that a request carries through agent_v2.py, the workflow
+orchestrator and the code executor.
+
+A request may set "timeout" (seconds from receipt) or "deadline" (Unix time),
+and the resident server can cancel a request explicitly. The token of the
+request being processed is kept per thread; long loops call check() between
+units of work, and child processes waited on with communicate() are killed,
+together with anything they started, as soon as the token expires.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+POLL_INTERVAL = 0.1
+KILL_GRACE = 2.0
+
+class Cancelled(BaseException):
+    """Raised in the request's thread once it has been cancelled or timed out.
+
+    Like KeyboardInterrupt it is not an Exception, so the broad `except
+    Exception` blocks that turn errors into responses do not swallow it.
+    """
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class CancelToken:
+    """Cancellation flag with an optional deadline.
+
+    timeout is in seconds from now, deadline a Unix timestamp; when both are
+    given the earlier one applies.
+    """
+
+    def __init__(self, timeout=None, deadline=None):
+        expires = []
+        if timeout is not None:
+            expires.append(time.monotonic() + timeout)
+        if deadline is not None:
+            expires.append(time.monotonic() + (deadline - time.time()))
+        self._expires = min(expires) if expires else None
+        self._event = threading.Event()
+        self.reason = None
+
+    @classmethod
+    def from_request(cls, input_data, default_timeout=None):
+        """Build a token from a request's "timeout"/"deadline" fields.
+
+        default_timeout (e.g. the server's --request-timeout) still applies
+        when the request asks for a longer one.
+        """
+        timeouts = [t for t in (_number(input_data.get("timeout")), default_timeout) if t is not None]
+        return cls(min(timeouts) if timeouts else None, _number(input_data.get("deadline")))
+
+    def extend(self, other):
+        """Push the deadline out to other's, so the token outlives both."""
+        if other._expires is None or (self._expires is not None and other._expires > self._expires):
+            self._expires = other._expires
+
+    def cancel(self, reason="cancelled"):
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        if not self._event.is_set() and self._expires is not None and time.monotonic() >= self._expires:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    @property
+    def timed_out(self):
+        return self.cancelled and self.reason == "deadline exceeded"
+
+    def remaining(self):
+        """Seconds left before the deadline, or None if there is none."""
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
+
+    @property
+    def deadline(self):
+        """The deadline as a Unix timestamp, for handing to child processes."""
+        if self._expires is None:
+            return None
+        return time.time() + (self._expires - time.monotonic())
+
+    def check(self):
+        """Raise Cancelled if the token has been cancelled or has expired."""
+        if self.cancelled:
+            raise Cancelled(f"Request {self.reason}")
+
+_local = threading.local()
+
+def current():
+    """Return the token of the request being processed by this thread, or None."""
+    return getattr(_local, "token", None)
+
+@contextmanager
+def activate(token):
+    """Make token the current token of this thread for the duration of the block."""
+    previous = current()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+def check():
+    """Raise Cancelled if the current request has been cancelled or has expired."""
+    token = getattr(_local, "token", None)
+    if token is not None:
+        token.check()
+
+def checked(iterable):
+    """Yield from iterable, checking the current token before each item."""
+    for item in iterable:
+        check()
+        yield item
+
+def kill_process_group(process, grace=KILL_GRACE):
+    """Terminate process and its process group, then reap it."""
+    import signal
+    import subprocess
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            break
+        try:
+            process.wait(grace)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    try:
+        process.communicate(timeout=grace)
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        pass
+
+def communicate(process, token=None, input=None):
+    """Popen.communicate() that kills the child when the request is cancelled.
+
+    The process should be started with start_new_session=True so that
+    whatever it spawns is killed with it. Returns (stdout, stderr).
+    """
+    token = token if token is not None else current()
+    if token is None:
+        return process.communicate(input)
+    import subprocess
+    while True:
+        remaining = token.remaining()
+        timeout = POLL_INTERVAL if remaining is None else min(POLL_INTERVAL, remaining + 0.001)
+        try:
+            return process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Only the first call takes input; later ones carry on sending it where it stopped
+            input = None
+            if token.cancelled:
+                kill_process_group(process)
+                token.check()
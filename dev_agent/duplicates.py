@@ -0,0 +1,383 @@
+"""
+Duplicate Code
+Finds duplicated and near-duplicated code across the workspace by winnowing.
+
+Each file is reduced to a stream of normalized tokens (identifiers become
+"I", numbers "N", strings "S"; keywords and punctuation stay, comments go),
+so renamed variables or changed constants do not hide a copy. Every run of
+K_GRAM tokens gets a rolling hash, and winnowing keeps the smallest hash of
+each WINDOW consecutive ones as the file's fingerprints: any match of at
+least K_GRAM + WINDOW - 1 tokens is guaranteed to share a fingerprint.
+
+Fingerprints are indexed in one hash table, so candidate pairs come from
+shared entries instead of comparing every file with every other. Matches
+between two files are chained into clone regions (allowing small gaps, for
+near-duplicates), regions that overlap are merged into clusters, and each
+file's fingerprints are cached by content hash.
+"""
+
+import hashlib
+import os
+import re
+import stat
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from dev_agent import deadline
+from dev_agent import workspace
+
+CACHE_VERSION = 1
+K_GRAM = 20
+WINDOW = 10
+# Matched regions shorter than this many tokens (a few lines) are not reported
+MIN_TOKENS = 50
+# Fingerprints shared by more locations than this are boilerplate (license
+# headers, import blocks) and are not used to pair files
+MAX_POSTINGS = 32
+# Tokens two consecutive matches may be apart and still belong to one clone
+MAX_GAP = 3 * K_GRAM
+# Share of their fingerprints two regions must have in common to be clones
+MIN_SIMILARITY = 0.6
+# Generated and minified files above this size are not fingerprinted
+MAX_FILE_BYTES = 1024 * 1024
+MAX_CLUSTERS = 20
+
+# Data and markup formats are not code
+CODE_LANGUAGES = frozenset(workspace.LANGUAGES.values()) - {"Markdown", "JSON", "XML", "YAML"}
+
+_KEYWORDS = frozenset("""
+    and as async await break case catch class const continue def default del do elif else enum except
+    export extends final finally fn for from func function go if impl implements import in instanceof
+    interface is lambda let match mod new nil none not null or package pass private protected pub public
+    raise return self static struct super switch this throw throws trait try type typeof var void while
+    with yield true false True False None
+""".split())
+
+_TOKEN = re.compile(r'''
+     (?P<comment>\#[^\n]*|//[^\n]*|/\*.*?\*/)
+    |(?P<string>"""(?:\\.|[^\\])*?"""|\'\'\'(?:\\.|[^\\])*?\'\'\'
+                |"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+    |(?P<number>\d[\w.]*)
+    |(?P<name>[A-Za-z_$][\w$]*)
+    |(?P<newline>\n)
+    |(?P<op>[^\s\w])
+''', re.S | re.X)
+
+# Polynomial rolling hash modulo 2**64 (a mask is cheaper than a prime modulus)
+_BASE = 1000003
+_MASK = (1 << 64) - 1
+_TOP = pow(_BASE, K_GRAM - 1, 1 << 64)
+_token_values = {}
+
+def _value(token):
+    value = _token_values.get(token)
+    if value is None:
+        value = _token_values[token] = zlib.crc32(token.encode("utf-8")) + 1
+    return value
+
+def tokenize(text):
+    """Return (normalized token values, line number of each token)."""
+    values = []
+    lines = []
+    line = 1
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == "newline":
+            line += 1
+            continue
+        token = match.group()
+        if kind == "comment":
+            line += token.count("\n")
+            continue
+        if kind == "name":
+            token = token if token in _KEYWORDS else "I"
+        elif kind == "string":
+            newlines = token.count("\n")
+            values.append(_value("S"))
+            lines.append(line)
+            line += newlines
+            continue
+        elif kind == "number":
+            token = "N"
+        values.append(_value(token))
+        lines.append(line)
+    return values, lines
+
+def winnow(values):
+    """Return the winnowed fingerprints of a token stream as [(hash, token index)].
+
+    The token index is where the fingerprinted K_GRAM run starts.
+    """
+    if len(values) < K_GRAM:
+        return []
+    hashes = []
+    h = 0
+    for value in values[:K_GRAM]:
+        h = (h * _BASE + value) & _MASK
+    hashes.append(h)
+    for out, value in zip(values, values[K_GRAM:]):
+        h = ((h - out * _TOP) * _BASE + value) & _MASK
+        hashes.append(h)
+    fingerprints = []
+    chosen = -1
+    for end in range(min(WINDOW, len(hashes)) - 1, len(hashes)):
+        start = max(end - WINDOW + 1, 0)
+        if chosen < start:
+            # The previous minimum left the window: rescan it (rightmost minimum wins)
+            window = hashes[start:end + 1]
+            chosen = end - window[::-1].index(min(window))
+            fingerprints.append((hashes[chosen], chosen))
+        elif hashes[end] <= hashes[chosen]:
+            chosen = end
+            fingerprints.append((hashes[chosen], chosen))
+    return fingerprints
+
+def fingerprint_file(path):
+    """Return (content hash, [[hash, token index, first line, last line]]), or None."""
+    try:
+        with open(path, "rb", buffering=0) as f:
+            if os.fstat(f.fileno()).st_size > MAX_FILE_BYTES:
+                return None
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:8192]:
+        return None
+    values, lines = tokenize(data.decode("utf-8", "replace"))
+    fingerprints = [[h, index, lines[index], lines[index + K_GRAM - 1]] for h, index in winnow(values)]
+    return content_hash(data), fingerprints
+
+def fingerprint_batch(paths):
+    """Fingerprint a batch of files in a pool worker; returns [(path, result or None)]."""
+    return [(path, fingerprint_file(path)) for path in paths]
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+class CloneCluster:
+    """Code regions that are copies of each other."""
+
+    def __init__(self, locations, similarity, tokens):
+        # [(file name, first line, last line)], sorted
+        self.locations = locations
+        self.similarity = similarity
+        self.tokens = tokens
+
+    @property
+    def lines(self):
+        """Lines of the longest copy."""
+        return max(end - start + 1 for _, start, end in self.locations)
+
+class _Region:
+    __slots__ = ("node", "start", "end")
+
+    def __init__(self, node, start, end):
+        self.node = node
+        self.start = start
+        self.end = end
+
+class _Clusters:
+    """Union-find over clone regions; overlapping regions of one file are one node."""
+
+    def __init__(self):
+        self.parent = []
+        self.regions = defaultdict(list)
+        self.similarity = []
+        self.tokens = []
+
+    def node(self, file_id, start, end, tokens):
+        for region in self.regions[file_id]:
+            overlap = min(end, region.end) - max(start, region.start) + 1
+            if overlap * 2 >= min(end - start, region.end - region.start) + 1:
+                region.start = min(start, region.start)
+                region.end = max(end, region.end)
+                return self._find(region.node)
+        node = len(self.parent)
+        self.parent.append(node)
+        self.similarity.append(1.0)
+        self.tokens.append(tokens)
+        self.regions[file_id].append(_Region(node, start, end))
+        return node
+
+    def _find(self, node):
+        while self.parent[node] != node:
+            self.parent[node] = self.parent[self.parent[node]]
+            node = self.parent[node]
+        return node
+
+    def link(self, a, b, similarity, tokens):
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            self.parent[b] = a
+        self.similarity[a] = min(self.similarity[a], self.similarity[b], similarity)
+        self.tokens[a] = max(self.tokens[a], self.tokens[b], tokens)
+
+    def clusters(self, names):
+        members = defaultdict(list)
+        for file_id, regions in self.regions.items():
+            for region in regions:
+                members[self._find(region.node)].append((names[file_id], region.start, region.end))
+        clusters = []
+        for root, locations in members.items():
+            locations = _merge_overlapping(sorted(locations))
+            if len(locations) > 1:
+                clusters.append(CloneCluster(locations, self.similarity[root], self.tokens[root]))
+        return clusters
+
+def _merge_overlapping(locations):
+    """Merge sorted (name, first line, last line) locations that overlap in one file."""
+    merged = []
+    for name, start, end in locations:
+        if merged and merged[-1][0] == name and start <= merged[-1][2]:
+            merged[-1] = (name, merged[-1][1], max(end, merged[-1][2]))
+        else:
+            merged.append((name, start, end))
+    return merged
+
+def find_clones(files):
+    """Group clone regions of fingerprinted files into clusters.
+
+    files is a list of (name, fingerprints); returns CloneClusters, the
+    largest duplication first.
+    """
+    index = defaultdict(list)
+    for file_id, (_, fingerprints) in enumerate(files):
+        for position, fingerprint in enumerate(fingerprints):
+            index[fingerprint[0]].append((file_id, position))
+
+    matches = defaultdict(list)
+    for postings in index.values():
+        if len(postings) < 2 or len(postings) > MAX_POSTINGS:
+            continue
+        for i, (file_a, position_a) in enumerate(postings):
+            for file_b, position_b in postings[i + 1:]:
+                if file_a == file_b:
+                    token_a = files[file_a][1][position_a][1]
+                    token_b = files[file_b][1][position_b][1]
+                    if abs(token_a - token_b) < K_GRAM:
+                        continue
+                matches[(file_a, file_b)].append((position_a, position_b))
+        deadline.check()
+
+    clusters = _Clusters()
+    positions = {}
+    for (file_a, file_b), pairs in matches.items():
+        prints_a, prints_b = files[file_a][1], files[file_b][1]
+        for file_id in (file_a, file_b):
+            if file_id not in positions:
+                positions[file_id] = [fingerprint[1] for fingerprint in files[file_id][1]]
+        for chain in _chains(pairs, prints_a, prints_b):
+            start_a, end_a = prints_a[chain[0][0]][1], prints_a[chain[-1][0]][1] + K_GRAM
+            start_b, end_b = prints_b[chain[0][1]][1], prints_b[chain[-1][1]][1] + K_GRAM
+            tokens = min(end_a - start_a, end_b - start_b)
+            if tokens < MIN_TOKENS:
+                continue
+            similarity = _similarity(chain, positions[file_a], positions[file_b], start_a, end_a, start_b, end_b)
+            if similarity < MIN_SIMILARITY:
+                continue
+            node_a = clusters.node(file_a, prints_a[chain[0][0]][2], prints_a[chain[-1][0]][3], tokens)
+            node_b = clusters.node(file_b, prints_b[chain[0][1]][2], prints_b[chain[-1][1]][3], tokens)
+            clusters.link(node_a, node_b, similarity, tokens)
+    result = clusters.clusters([name for name, _ in files])
+    result.sort(key=lambda cluster: (-cluster.tokens * (len(cluster.locations) - 1), cluster.locations))
+    return result
+
+def _chains(pairs, prints_a, prints_b):
+    """Split matched fingerprint pairs into runs that advance together in both files."""
+    chains = []
+    for pair in sorted(set(pairs)):
+        token_a, token_b = prints_a[pair[0]][1], prints_b[pair[1]][1]
+        for chain in reversed(chains[-4:]):
+            last_a, last_b = prints_a[chain[-1][0]][1], prints_b[chain[-1][1]][1]
+            if 0 < token_a - last_a <= MAX_GAP and 0 < token_b - last_b <= MAX_GAP:
+                chain.append(pair)
+                break
+        else:
+            chains.append([pair])
+    return chains
+
+def _similarity(chain, positions_a, positions_b, start_a, end_a, start_b, end_b):
+    """Dice coefficient of the two regions' fingerprint sets."""
+    count_a = _count_between(positions_a, start_a, end_a - K_GRAM)
+    count_b = _count_between(positions_b, start_b, end_b - K_GRAM)
+    shared = min(len({a for a, _ in chain}), len({b for _, b in chain}))
+    return min(1.0, 2 * shared / (count_a + count_b)) if count_a + count_b else 1.0
+
+def _count_between(positions, first, last):
+    return bisect_right(positions, last) - bisect_left(positions, first)
+
+class DuplicateReport:
+    """Clone clusters of a workspace, filled in by scan()."""
+
+    def __init__(self, roots):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.files_total = 0
+        self.files_done = 0
+        self.cached = 0
+        self.clusters = []
+
+    def progress(self):
+        """Return the scan progress as a JSON-ready dict."""
+        return {"files_done": self.files_done, "files_total": self.files_total, "cached": self.cached}
+
+def scan(report, cache_path=None, workers=None):
+    """Fingerprint the code files of report's folders, yielding progress, then find the clones.
+
+    Unchanged files (same size and modification time) keep their content
+    hash, and a content hash that is cached keeps its fingerprints; the
+    other files are fingerprinted in a process pool. The cache is rewritten
+    at the end, also when the scan is cancelled.
+    """
+    roots = report.roots
+    cache_path = cache_path or workspace.default_cache_path(roots, "duplicates")
+    cached = workspace.load_cache(cache_path, CACHE_VERSION)
+    # {path: [mtime_ns, size, content hash]} and {content hash: fingerprints}
+    cached_files = cached.get("files", {})
+    cached_prints = cached.get("fingerprints", {})
+    files = {}
+    prints = {}
+    names = {}
+    pending = {}
+    for root in roots:
+        for path in workspace.list_files(root):
+            deadline.check()
+            if path in names or workspace.language_of(path) not in CODE_LANGUAGES:
+                continue
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(info.st_mode) or info.st_size > MAX_FILE_BYTES:
+                continue
+            names[path] = workspace.display_name(path, root, roots)
+            entry = cached_files.get(path)
+            if entry is not None and entry[:2] == [info.st_mtime_ns, info.st_size] and entry[2] in cached_prints:
+                files[path] = entry
+                prints[entry[2]] = cached_prints[entry[2]]
+            else:
+                pending[path] = [info.st_mtime_ns, info.st_size]
+    report.files_total = len(names)
+    report.files_done = report.cached = len(files)
+    yield report.progress()
+
+    last = time.monotonic()
+    try:
+        for results in workspace.run_batches(fingerprint_batch, list(pending), workers):
+            for path, result in results:
+                report.files_done += 1
+                if result is None:
+                    del names[path]
+                    continue
+                digest, fingerprints = result
+                files[path] = pending[path] + [digest]
+                prints[digest] = fingerprints
+            if time.monotonic() - last >= workspace.PROGRESS_INTERVAL:
+                last = time.monotonic()
+                yield report.progress()
+    finally:
+        if pending or len(files) != len(cached_files):
+            workspace.save_cache(cache_path, {"files": files, "fingerprints": prints}, CACHE_VERSION)
+
+    report.clusters = find_clones([(names[path], prints[entry[2]]) for path, entry in files.items()])
@@ -0,0 +1,28 @@
+"""
+Language Frontends
+Language-specific answers for the explain and summarize responses. The
+generic Frontend suits any language; the modules of this package subclass it
+and are imported by dev_agent.languages only when their language is seen.
+"""
+
+class Frontend:
+    """Answers for one language; the defaults only use the language's name."""
+
+    # Language name, for plugin frontends registered through an entry point
+    language = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def overview(self, code):
+        """Complete "The code ..." with what the code does."""
+        return "implements functionality in " + self.name
+
+    def summary(self, content):
+        """Describe the file in one sentence."""
+        line_count = content.count('\n') + 1
+        return f"This is a {self.name} file containing approximately {line_count} lines of code."
+
+    def structure(self, content):
+        """Return the markdown list items describing the file's structure, if any."""
+        return []
@@ -0,0 +1,27 @@
+"""
+Document Frontends
+Markup and data formats, summarized by what the format is rather than by
+counting code.
+"""
+
+from dev_agent.frontends import Frontend
+
+class MarkdownFrontend(Frontend):
+
+    def summary(self, content):
+        return "This is a Markdown document that contains formatted text and possibly code examples."
+
+class JSONFrontend(Frontend):
+
+    def summary(self, content):
+        return "This is a JSON file that contains structured data in JavaScript Object Notation format."
+
+class XMLFrontend(Frontend):
+
+    def summary(self, content):
+        return "This is an XML file that contains structured data in Extensible Markup Language format."
+
+class YAMLFrontend(Frontend):
+
+    def summary(self, content):
+        return "This is a YAML file that contains structured data in YAML Ain't Markup Language format."
@@ -0,0 +1,38 @@
+"""
+JavaScript and TypeScript Frontends
+"""
+
+from dev_agent.frontends.outlined import OutlinedFrontend
+from dev_agent.lines import stripped_lines
+
+class JavaScriptFrontend(OutlinedFrontend):
+
+    def overview(self, code):
+        if "class " in code:
+            return "defines one or more JavaScript/TypeScript classes"
+        elif "function " in code:
+            return "contains one or more JavaScript/TypeScript functions"
+        elif "import " in code or "require(" in code:
+            return "imports modules and performs operations"
+        else:
+            return "contains JavaScript/TypeScript script code"
+
+    def summary(self, content):
+        line_count = content.count('\n') + 1
+        function_count = content.count('function ')
+        return f"This is a JavaScript file containing approximately {line_count} lines of code and {function_count} function definitions."
+
+    def structure(self, content):
+        imports = list(stripped_lines(content, 'import '))
+        structure = []
+        if imports:
+            structure.append(f"- Imports ({len(imports)}): {', '.join(imports[:3])}{'...' if len(imports) > 3 else ''}")
+        return structure + super().structure(content)
+
+class TypeScriptFrontend(JavaScriptFrontend):
+
+    def summary(self, content):
+        line_count = content.count('\n') + 1
+        function_count = content.count('function ')
+        interface_count = content.count('interface ')
+        return f"This is a TypeScript file containing approximately {line_count} lines of code, {function_count} function definitions, and {interface_count} interfaces."
@@ -0,0 +1,13 @@
+"""
+Outlined Frontend
+For the languages of dev_agent.outline: the structure is their symbol tree.
+"""
+
+from dev_agent import outline
+from dev_agent.frontends import Frontend
+
+class OutlinedFrontend(Frontend):
+
+    def structure(self, content):
+        symbols = outline.outline(content, self.name)
+        return [outline.render_outline(symbols)] if symbols else []
@@ -0,0 +1,46 @@
+"""
+Python Frontend
+"""
+
+from dev_agent.frontends import Frontend
+from dev_agent.lines import stripped_lines
+
+class PythonFrontend(Frontend):
+
+    def overview(self, code):
+        if "class " in code:
+            return "defines one or more Python classes"
+        elif "def " in code:
+            return "contains one or more Python functions"
+        elif "import " in code:
+            return "imports modules and performs operations"
+        else:
+            return "contains Python script code"
+
+    def summary(self, content):
+        line_count = content.count('\n') + 1
+        class_count = content.count('class ')
+        def_count = content.count('def ')
+        return f"This is a Python file containing approximately {line_count} lines of code, {class_count} classes, and {def_count} function definitions."
+
+    def structure(self, content):
+        imports = []
+        classes = []
+        functions = []
+        structure = []
+
+        for line in stripped_lines(content, 'import ', 'from ', 'class ', 'def '):
+            if line.startswith('import ') or line.startswith('from '):
+                imports.append(line)
+            elif line.startswith('class '):
+                classes.append(line.split('class ')[1].split('(')[0].split(':')[0])
+            elif line.startswith('def '):
+                functions.append(line.split('def ')[1].split('(')[0])
+
+        if imports:
+            structure.append(f"- Imports ({len(imports)}): {', '.join(imports[:3])}{'...' if len(imports) > 3 else ''}")
+        if classes:
+            structure.append(f"- Classes ({len(classes)}): {', '.join(classes)}")
+        if functions:
+            structure.append(f"- Functions ({len(functions)}): {', '.join(functions[:5])}{'...' if len(functions) > 5 else ''}")
+        return structure
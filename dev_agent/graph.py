@@ -0,0 +1,553 @@
+"""
+Module Graph
+Import and call graph of the Python modules in the workspace.
+
+Each module is summarized once from its AST: what it imports, what it
+defines and, per function, the calls it makes, resolved through the
+module's imports where possible. Summaries are cached by file size and
+modification time, so rebuilding the graph after an edit re-parses only the
+changed modules, and a graph kept in memory (by the resident agent) is
+updated one module at a time.
+
+Call edges are approximate: calls of local names, imported names, module
+attributes and methods on self are resolved; any other method call is
+matched by name, as a possible call, when only one definition in the
+workspace has that name.
+"""
+
+import ast
+import os
+import stat
+import threading
+from collections import defaultdict, deque
+
+from dev_agent import deadline
+from dev_agent import workspace
+
+CACHE_VERSION = 1
+MAX_FILE_BYTES = 4 * 1024 * 1024
+# Call target of a method call on an object of unknown type
+UNRESOLVED = "?."
+
+def module_name(path, packages=None):
+    """Return (dotted module name, whether it is a package, import root) for a Python file.
+
+    The import root is the first directory above the file that is not a
+    package (has no __init__.py): the directory that must be on sys.path to
+    import the module. packages caches the __init__.py lookups.
+    """
+    packages = {} if packages is None else packages
+    directory, filename = os.path.split(path)
+    stem = os.path.splitext(filename)[0]
+    is_package = stem == "__init__"
+    parts = [] if is_package else [stem]
+    while True:
+        has_init = packages.get(directory)
+        if has_init is None:
+            has_init = packages[directory] = os.path.exists(os.path.join(directory, "__init__.py"))
+        parent = os.path.dirname(directory)
+        if not has_init or parent == directory:
+            break
+        parts.insert(0, os.path.basename(directory))
+        directory = parent
+    return ".".join(parts), is_package, directory
+
+# --- Summaries (run in pool workers) ---
+
+class _Summarizer(ast.NodeVisitor):
+    """Collects the definitions and resolved calls of one module."""
+
+    def __init__(self, module, is_package):
+        self.module = module
+        self.is_package = is_package
+        self.package = module if is_package else module.rpartition(".")[0]
+        self.imports = []
+        self.bindings = {}
+        self.top_level = set()
+        # "Class.attribute" -> class of the object assigned to self.attribute
+        self.attributes = {}
+        self.defs = []
+        self.calls = []
+        self.scope = []
+
+    def summarize(self, tree):
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.top_level.add(node.name)
+        # Imports first, so calls before a function-level import still resolve
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.imports.append([alias.name, None, node.lineno])
+                    if alias.asname:
+                        self.bindings[alias.asname] = alias.name
+                    else:
+                        head = alias.name.split(".")[0]
+                        self.bindings[head] = head
+            elif isinstance(node, ast.ImportFrom):
+                module = self._absolute(node.module, node.level)
+                for alias in node.names:
+                    if alias.name == "*":
+                        self.imports.append([module, None, node.lineno])
+                        continue
+                    self.imports.append([module, alias.name, node.lineno])
+                    self.bindings[alias.asname or alias.name] = f"{module}.{alias.name}" if module else alias.name
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                self._collect_attributes(node)
+        self.visit(tree)
+        return {"module": self.module, "package": self.is_package,
+                "imports": self.imports, "defs": self.defs, "calls": self.calls}
+
+    def _collect_attributes(self, node):
+        """Record `self.x = SomeClass(...)` assignments in the methods of a top-level class."""
+        for child in ast.walk(node):
+            if not isinstance(child, ast.Assign) or not isinstance(child.value, ast.Call):
+                continue
+            for target in child.targets:
+                if (isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name)
+                        and target.value.id == "self"):
+                    resolved = self._resolve(child.value.func)
+                    if resolved and not resolved.startswith(UNRESOLVED):
+                        self.attributes[f"{node.name}.{target.attr}"] = resolved
+
+    def _absolute(self, module, level):
+        if not level:
+            return module or ""
+        parts = self.package.split(".") if self.package else []
+        if level > 1:
+            parts = parts[:max(0, len(parts) - (level - 1))]
+        return ".".join(parts + ([module] if module else []))
+
+    def _qualname(self, name):
+        return ".".join([entry[1] for entry in self.scope] + [name])
+
+    def _visit_def(self, node, kind):
+        qualname = self._qualname(node.name)
+        self.defs.append([qualname, kind, node.lineno])
+        self.scope.append((kind, node.name, qualname))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        self._visit_def(node, "method" if self.scope and self.scope[-1][0] == "class" else "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._visit_def(node, "class")
+
+    def visit_Call(self, node):
+        target = self._resolve(node.func)
+        if target:
+            caller = self.scope[-1][2] if self.scope else "<module>"
+            self.calls.append([caller, target, node.lineno])
+        self.generic_visit(node)
+
+    def _resolve(self, func):
+        parts = []
+        while isinstance(func, ast.Attribute):
+            parts.insert(0, func.attr)
+            func = func.value
+        if not isinstance(func, ast.Name):
+            # A call on a call result, subscript, literal...
+            return UNRESOLVED + parts[-1] if parts else None
+        head = func.id
+        parts.insert(0, head)
+        if head in ("self", "cls") and len(parts) in (2, 3):
+            classes = [entry[2] for entry in self.scope if entry[0] == "class"]
+            if classes and len(parts) == 2:
+                return f"{self.module}.{classes[-1]}.{parts[1]}"
+            attribute = self.attributes.get(f"{classes[0]}.{parts[1]}") if classes else None
+            if attribute:
+                return f"{attribute}.{parts[2]}"
+        if head in self.bindings:
+            return ".".join([self.bindings[head]] + parts[1:])
+        if head in self.top_level:
+            return ".".join([self.module] + parts)
+        if len(parts) > 1:
+            return UNRESOLVED + parts[-1]
+        # Builtins and local variables
+        return None
+
+def summarize_module(path, module, is_package):
+    """Return the JSON-ready summary of one module; a file that does not parse has an empty one."""
+    summary = {"module": module, "package": is_package, "imports": [], "defs": [], "calls": []}
+    try:
+        with open(path, "rb") as f:
+            source = f.read(MAX_FILE_BYTES + 1)
+        if len(source) > MAX_FILE_BYTES:
+            return dict(summary, error="file too large")
+        tree = ast.parse(source, path)
+    except (OSError, SyntaxError, ValueError) as e:
+        return dict(summary, error=str(e))
+    return _Summarizer(module, is_package).summarize(tree)
+
+def summarize_batch(items):
+    """Summarize (path, module, is_package) items in a pool worker; returns [(path, summary)]."""
+    return [(path, summarize_module(path, module, is_package)) for path, module, is_package in items]
+
+# --- Graph ---
+
+class Definition:
+    """A function, method or class defined in the workspace."""
+
+    __slots__ = ("qualified", "module", "qualname", "kind", "path", "line")
+
+    def __init__(self, module, qualname, kind, path, line):
+        self.module = module
+        self.qualname = qualname
+        self.qualified = f"{module}.{qualname}" if module else qualname
+        self.kind = kind
+        self.path = path
+        self.line = line
+
+class Call:
+    """One call site: caller is the qualified name of the calling function, or the module."""
+
+    __slots__ = ("path", "caller", "line", "certain")
+
+    def __init__(self, path, caller, line, certain=True):
+        self.path = path
+        self.caller = caller
+        self.line = line
+        self.certain = certain
+
+class ModuleGraph:
+    """Import and call graph of the Python modules in a set of workspace folders.
+
+    refresh() brings the whole graph up to date with the files on disk;
+    update(path) re-reads a single module. Both are thread-safe, and so are
+    the queries. stale is set until the first refresh, and again whenever
+    the file watcher may have missed changes.
+    """
+
+    def __init__(self, roots, cache_path=None, workers=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.cache_path = cache_path or workspace.default_cache_path(self.roots, "graph")
+        self.workers = workers
+        self.summaries = {}
+        self.names = {}
+        self._stamps = {}
+        self._import_roots = {}
+        self._modules = defaultdict(list)
+        self._definitions = {}
+        self._by_name = defaultdict(set)
+        # call target -> {path: [(caller, line)]}
+        self._callers = defaultdict(dict)
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.RLock()
+        self.stale = True
+
+    # Building
+
+    def refresh(self):
+        """Re-read the modules that changed on disk; return how many were parsed."""
+        with self._lock:
+            if not self._loaded:
+                cached = workspace.load_cache(self.cache_path, CACHE_VERSION).get("files", {})
+                self._loaded = True
+            else:
+                cached = {}
+            packages = {}
+            listed = {}
+            for root in self.roots:
+                for path in workspace.list_files(root):
+                    deadline.check()
+                    if not path.endswith(".py") or path in listed:
+                        continue
+                    try:
+                        info = os.stat(path)
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(info.st_mode):
+                        listed[path] = ([info.st_mtime_ns, info.st_size], module_name(path, packages),
+                                        workspace.display_name(path, root, self.roots))
+            for path in set(self.summaries) - set(listed):
+                self._remove(path)
+                self._dirty = True
+            pending = []
+            for path, (stamp, (module, is_package, import_root), name) in listed.items():
+                self.names[path] = name
+                self._import_roots[path] = import_root
+                if self._stamps.get(path) == stamp and self.summaries[path]["module"] == module:
+                    continue
+                entry = cached.get(path)
+                if entry is not None and entry[0] == stamp and entry[1]["module"] == module:
+                    self._replace(path, stamp, entry[1])
+                else:
+                    pending.append((path, module, is_package))
+            try:
+                for results in workspace.run_batches(summarize_batch, pending, self.workers):
+                    for path, summary in results:
+                        self._replace(path, listed[path][0], summary)
+                        self._dirty = True
+            finally:
+                if self._dirty:
+                    self.save()
+            self.stale = False
+            return len(pending)
+
+    def update(self, path):
+        """Re-read one module (or drop it if it is gone) without looking at the others.
+
+        A path that is gone may also be a removed directory, whose modules are dropped.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            try:
+                info = os.stat(path)
+            except OSError:
+                prefix = os.path.join(path, "")
+                for removed in [known for known in self.summaries if known == path or known.startswith(prefix)]:
+                    self._remove(removed)
+                    self._dirty = True
+                return
+            if not path.endswith(".py") or not stat.S_ISREG(info.st_mode):
+                return
+            module, is_package, import_root = module_name(path)
+            root = next((root for root in self.roots if path.startswith(os.path.join(root, ""))), None)
+            if root is None:
+                return
+            self.names[path] = workspace.display_name(path, root, self.roots)
+            self._import_roots[path] = import_root
+            self._replace(path, [info.st_mtime_ns, info.st_size], summarize_module(path, module, is_package))
+            self._dirty = True
+
+    def save(self):
+        """Write the module summaries to the cache file."""
+        with self._lock:
+            files = {path: [self._stamps[path], summary] for path, summary in self.summaries.items()}
+            workspace.save_cache(self.cache_path, {"files": files}, CACHE_VERSION)
+            self._dirty = False
+
+    def _replace(self, path, stamp, summary):
+        if path in self.summaries:
+            self._remove(path)
+        self.summaries[path] = summary
+        self._stamps[path] = stamp
+        module = summary["module"]
+        self._modules[module].append(path)
+        for qualname, kind, line in summary["defs"]:
+            definition = Definition(module, qualname, kind, path, line)
+            self._definitions[definition.qualified] = definition
+            self._by_name[qualname.rpartition(".")[2]].add(definition.qualified)
+        for caller, target, line in summary["calls"]:
+            self._callers[target].setdefault(path, []).append((f"{module}.{caller}" if caller != "<module>" else module, line))
+
+    def _remove(self, path):
+        summary = self.summaries.pop(path)
+        del self._stamps[path]
+        module = summary["module"]
+        self._modules[module].remove(path)
+        if not self._modules[module]:
+            del self._modules[module]
+        for qualname, _, _ in summary["defs"]:
+            qualified = f"{module}.{qualname}" if module else qualname
+            definition = self._definitions.get(qualified)
+            if definition is not None and definition.path == path:
+                del self._definitions[qualified]
+                self._by_name[qualname.rpartition(".")[2]].discard(qualified)
+        for _, target, _ in summary["calls"]:
+            self._callers[target].pop(path, None)
+            if not self._callers[target]:
+                del self._callers[target]
+
+    # Queries
+
+    def find_definitions(self, symbol):
+        """Return the definitions a symbol names: `name`, `Class.method` or a dotted path."""
+        with self._lock:
+            symbol = symbol.strip()
+            if symbol in self._definitions:
+                return [self._definitions[symbol]]
+            last = symbol.rpartition(".")[2]
+            suffix = "." + symbol
+            found = [self._definitions[qualified] for qualified in self._by_name.get(last, ())
+                     if qualified == symbol or qualified.endswith(suffix)]
+            return sorted(found, key=lambda definition: definition.qualified)
+
+    def callers(self, definition):
+        """Return the Calls of a definition, certain ones first."""
+        with self._lock:
+            targets = {definition.qualified}
+            # Names re-exported by a parent package (`from pkg import name`)
+            parts = definition.module.split(".")
+            for depth in range(1, len(parts)):
+                targets.add(".".join(parts[:depth] + [definition.qualname]))
+            if definition.qualname.endswith(".__init__"):
+                targets.add(definition.qualified.rpartition(".")[0])
+            calls = []
+            for target in targets:
+                for path, sites in self._callers.get(target, {}).items():
+                    calls.extend(Call(path, caller, line) for caller, line in sites)
+            last = definition.qualname.rpartition(".")[2]
+            if definition.kind != "class" and len(self._by_name.get(last, ())) == 1:
+                for path, sites in self._callers.get(UNRESOLVED + last, {}).items():
+                    calls.extend(Call(path, caller, line, certain=False) for caller, line in sites)
+            # Recursion is not an interesting caller
+            calls = [call for call in calls if call.caller != definition.qualified]
+            return sorted(calls, key=lambda call: (not call.certain, self.names.get(call.path, call.path), call.line))
+
+    def definitions_in(self, path):
+        """Return the definitions of one module, in source order."""
+        with self._lock:
+            summary = self.summaries.get(os.path.abspath(path))
+            if summary is None:
+                return []
+            module = summary["module"]
+            found = (self._definitions.get(f"{module}.{qualname}" if module else qualname)
+                     for qualname, _, _ in summary["defs"])
+            return [definition for definition in found if definition is not None]
+
+    def module_path(self, module, importer=None):
+        """Return the path of a workspace module, preferring the importer's import root."""
+        paths = self._modules.get(module)
+        if not paths:
+            return None
+        if importer is not None and len(paths) > 1:
+            import_root = self._import_roots.get(importer)
+            for path in paths:
+                if self._import_roots.get(path) == import_root:
+                    return path
+        return min(paths)
+
+    def imports(self, path):
+        """Return (paths of imported workspace modules, names of external top-level modules)."""
+        with self._lock:
+            summary = self.summaries.get(path)
+            if summary is None:
+                return [], []
+            internal = {}
+            external = set()
+            for module, name, _ in summary["imports"]:
+                target = None
+                if name:
+                    target = self.module_path(f"{module}.{name}", path)
+                if target is None and module:
+                    target = self.module_path(module, path)
+                if target is not None:
+                    if target != path:
+                        internal[target] = None
+                elif module:
+                    external.add(module.split(".")[0])
+            return list(internal), sorted(external)
+
+    def transitive_imports(self, path):
+        """Return ([(depth, path)] of workspace modules path imports, directly or not, external names)."""
+        path = os.path.abspath(path)
+        with self._lock:
+            depths = {path: 0}
+            queue = deque([path])
+            external = set()
+            while queue:
+                current = queue.popleft()
+                internal, outside = self.imports(current)
+                external.update(outside)
+                for target in internal:
+                    if target not in depths:
+                        depths[target] = depths[current] + 1
+                        queue.append(target)
+            del depths[path]
+            found = sorted(depths.items(), key=lambda item: (item[1], self.names.get(item[0], item[0])))
+            return [(depth, target) for target, depth in found], sorted(external)
+
+    def import_cycles(self):
+        """Return the import cycles of the workspace, each as a list of paths ending where it starts."""
+        with self._lock:
+            edges = {path: self.imports(path)[0] for path in self.summaries}
+        cycles = []
+        for component in _strongly_connected(edges):
+            members = set(component)
+            if len(component) == 1 and component[0] not in edges[component[0]]:
+                continue
+            start = min(component, key=lambda path: self.names.get(path, path))
+            cycles.append(_cycle_through(start, edges, members))
+        cycles.sort(key=lambda cycle: (len(cycle), [self.names.get(path, path) for path in cycle]))
+        return cycles
+
+def _strongly_connected(edges):
+    """Tarjan's algorithm without recursion; yields components as lists of nodes."""
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    counter = 0
+    for start in edges:
+        if start in index:
+            continue
+        work = [(start, iter(edges[start]))]
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    yield component
+
+def _cycle_through(start, edges, members):
+    """Return a shortest import path from start back to itself within one component."""
+    previous = {}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for child in edges.get(node, ()):
+            if child not in members:
+                continue
+            if child == start:
+                path = [start]
+                while node != start:
+                    path.append(node)
+                    node = previous[node]
+                path.append(start)
+                return [start] + path[1:-1][::-1] + [start]
+            if child not in previous:
+                previous[child] = node
+                queue.append(child)
+    return [start, start]
+
+def _concerns(graph, path):
+    return path.endswith(".py") or path in graph.summaries or not os.path.exists(path)
+
+_graphs = workspace.IndexRegistry(ModuleGraph, _concerns)
+
+def get_graph(roots, workers=None):
+    """Return the up-to-date graph of these folders.
+
+    Graphs are kept in memory, so in the resident agent each query only
+    re-parses the modules that changed since the last one; see
+    workspace.IndexRegistry.
+    """
+    return _graphs.get(roots, workers)
+
+def files_changed(paths, rescan=()):
+    """Update the graphs in memory for changed files; return how many modules were re-read.
+
+    The cache file is only rewritten by the next full refresh; a module
+    changed since is re-parsed then. See workspace.IndexRegistry.files_changed().
+    """
+    return _graphs.files_changed(paths, rescan)
@@ -0,0 +1,125 @@
+"""
+IPC Framing
+Length-prefixed frames for the requests and replies exchanged by the
+extension, the agent and the workflow orchestrator over pipes and sockets.
+
+A frame is a 4-byte big-endian header length, a compact JSON header, then
+the raw payload segments the header lists. A message field that holds bytes,
+or text of at least SEGMENT_MIN_CHARS (file contents, markdown responses),
+is sent as a segment instead of a JSON string, so it is never escaped or
+parsed character by character. The header lists the segments under
+"_segments" as [field, length, flags]: "z" in flags marks a segment
+deflated with zlib, and "b" one that is read back as bytes rather than str.
+
+Compression is up to the writer, and off by default: deflating costs about
+15 ms a megabyte, far longer than a local pipe or socket takes to carry the
+bytes. A framed request to the server may set "compress": true to have the
+segments of its reply of COMPRESS_MIN_BYTES or more deflated, which pays
+over slower links.
+
+Headers are kept under 16 MB, so the first byte of a frame is always 0. A
+server tells a framed connection from a JSON-line one, whose first byte is
+"{", by peeking at it.
+"""
+
+import io
+import json
+import struct
+import zlib
+
+SEGMENT_MIN_CHARS = 1024
+COMPRESS_MIN_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = (1 << 24) - 1
+MAX_SEGMENT_BYTES = 1 << 30
+SEGMENTS_KEY = "_segments"
+
+_LENGTH = struct.Struct(">I")
+
+class FramingError(ValueError):
+    """A frame that is truncated, oversized or malformed."""
+
+def encode(message, compress_min=None):
+    """Return the frame for a message dict, as a list of buffers to write in order.
+
+    Segments of at least compress_min bytes are deflated; None never compresses.
+    """
+    header, segments, payloads = {}, [], []
+    for field, value in message.items():
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            payload, flags = value, "b"
+        elif isinstance(value, str) and len(value) >= SEGMENT_MIN_CHARS:
+            try:
+                payload, flags = value.encode("utf-8"), ""
+            except UnicodeEncodeError:
+                # Lone surrogates only survive as JSON escapes
+                header[field] = value
+                continue
+        else:
+            header[field] = value
+            continue
+        if compress_min is not None and len(payload) >= compress_min:
+            deflated = zlib.compress(payload, 1)
+            if len(deflated) < len(payload):
+                payload, flags = deflated, flags + "z"
+        segments.append([field, len(payload), flags])
+        payloads.append(payload)
+    if segments:
+        header[SEGMENTS_KEY] = segments
+    data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    if len(data) > MAX_HEADER_BYTES:
+        raise FramingError(f"frame header of {len(data)} bytes is over the {MAX_HEADER_BYTES} byte limit")
+    return [_LENGTH.pack(len(data)), data, *payloads]
+
+def write_frame(stream, message, compress_min=None):
+    """Write a message to a binary stream as one frame, and flush it."""
+    for buffer in encode(message, compress_min):
+        stream.write(buffer)
+    stream.flush()
+
+def read_frame(stream):
+    """Read one frame from a binary stream; return its message, or None at the end of the stream."""
+    prefix = stream.read(_LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < _LENGTH.size:
+        prefix += _read_exactly(stream, _LENGTH.size - len(prefix))
+    (length,) = _LENGTH.unpack(prefix)
+    if length > MAX_HEADER_BYTES:
+        raise FramingError(f"frame header of {length} bytes is over the {MAX_HEADER_BYTES} byte limit")
+    try:
+        message = json.loads(_read_exactly(stream, length))
+    except ValueError as e:
+        raise FramingError(f"invalid frame header: {str(e)}") from None
+    if not isinstance(message, dict):
+        raise FramingError("frame header must be a JSON object")
+    for segment in message.pop(SEGMENTS_KEY, ()):
+        try:
+            field, size, flags = segment
+        except (TypeError, ValueError):
+            raise FramingError(f"invalid segment {segment!r}") from None
+        if not isinstance(size, int) or not 0 <= size <= MAX_SEGMENT_BYTES:
+            raise FramingError(f"invalid length for segment {field!r}: {size!r}")
+        payload = _read_exactly(stream, size)
+        try:
+            if "z" in flags:
+                payload = zlib.decompress(payload)
+            message[field] = payload if "b" in flags else payload.decode("utf-8")
+        except (zlib.error, UnicodeDecodeError) as e:
+            raise FramingError(f"invalid segment {field!r}: {str(e)}") from None
+    return message
+
+def decode(data):
+    """Return the message of the frame at the start of data, or None if data is empty."""
+    return read_frame(io.BytesIO(data))
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) == size:
+        return data
+    buffer = bytearray(data)
+    while len(buffer) < size:
+        chunk = stream.read(size - len(buffer))
+        if not chunk:
+            raise FramingError(f"frame truncated after {len(buffer)} of {size} bytes")
+        buffer += chunk
+    return bytes(buffer)
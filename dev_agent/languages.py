@@ -0,0 +1,142 @@
+"""
+Language Registry
+Maps file extensions and content signatures to languages, and languages to
+the frontends that answer language-specific questions (overview, summary,
+structure).
+
+Both lookups are table-driven, and a frontend's module is imported the first
+time its language is seen, so a request only pays for the languages it
+touches. Other packages add frontends through the "dev_agent.frontends"
+entry point group: each entry point is named after the file extension it
+handles and points at a Frontend subclass, e.g.
+
+    [project.entry-points."dev_agent.frontends"]
+    ".kt" = "kotlin_frontend:KotlinFrontend"
+
+Entry points are only read when an extension is not built in.
+"""
+
+import importlib
+import os
+import threading
+
+ENTRY_POINT_GROUP = "dev_agent.frontends"
+
+# File extension -> language
+EXTENSIONS = {
+    ".py": "Python", ".pyi": "Python", ".pyw": "Python",
+    ".js": "JavaScript", ".jsx": "JavaScript", ".mjs": "JavaScript", ".cjs": "JavaScript",
+    ".ts": "TypeScript", ".tsx": "TypeScript",
+    ".html": "HTML", ".htm": "HTML", ".css": "CSS",
+    ".java": "Java",
+    ".c": "C", ".h": "C",
+    ".cpp": "C++", ".cc": "C++", ".cxx": "C++", ".hpp": "C++", ".hh": "C++",
+    ".cs": "C#", ".go": "Go", ".rb": "Ruby", ".php": "PHP",
+    ".swift": "Swift", ".kt": "Kotlin", ".rs": "Rust",
+    ".md": "Markdown", ".json": "JSON", ".xml": "XML", ".yaml": "YAML", ".yml": "YAML",
+}
+
+# Content signatures for text without a known extension, tried in order:
+# (language, substrings that must all occur, whether to ignore case)
+SIGNATURES = (
+    ("Python", ("def ", "import "), False),
+    ("JavaScript", ("function ", "var "), False),
+    ("Java or C#", ("class ", "public "), False),
+    ("HTML", ("<html>", "</html>"), True),
+    ("a C-family language (C, C++, Java, JavaScript, etc.)", ("{", "}", ";"), False),
+)
+UNKNOWN_LANGUAGE = "an unidentified programming language"
+
+# Language -> "module:Class" of its frontend; other languages get the generic Frontend
+FRONTENDS = {
+    "Python": "dev_agent.frontends.python:PythonFrontend",
+    "JavaScript": "dev_agent.frontends.javascript:JavaScriptFrontend",
+    "TypeScript": "dev_agent.frontends.javascript:TypeScriptFrontend",
+    "Java": "dev_agent.frontends.outlined:OutlinedFrontend",
+    "C": "dev_agent.frontends.outlined:OutlinedFrontend",
+    "C++": "dev_agent.frontends.outlined:OutlinedFrontend",
+    "Go": "dev_agent.frontends.outlined:OutlinedFrontend",
+    "Rust": "dev_agent.frontends.outlined:OutlinedFrontend",
+    "Markdown": "dev_agent.frontends.documents:MarkdownFrontend",
+    "JSON": "dev_agent.frontends.documents:JSONFrontend",
+    "XML": "dev_agent.frontends.documents:XMLFrontend",
+    "YAML": "dev_agent.frontends.documents:YAMLFrontend",
+}
+
+_lock = threading.Lock()
+# Language -> Frontend instance, filled on first use
+_frontends = {}
+# Extension -> entry point of an installed plugin, read once on the first unknown extension
+_plugins = None
+
+def register(extension, language, spec):
+    """Handle files with extension as language, answered by the frontend class named by spec ("module:Class")."""
+    with _lock:
+        EXTENSIONS[extension.lower()] = language
+        FRONTENDS[language] = spec
+        _frontends.pop(language, None)
+
+def detect(code, file_path=None):
+    """Return the language of a file by extension, else by its content."""
+    if file_path:
+        ext = os.path.splitext(file_path)[1].lower()
+        language = EXTENSIONS.get(ext)
+        if language is not None:
+            return language
+        if ext and _plugin(ext) is not None:
+            return EXTENSIONS[ext]
+    lowered = None
+    for language, needles, ignore_case in SIGNATURES:
+        text = code
+        if ignore_case:
+            if lowered is None:
+                lowered = code.lower()
+            text = lowered
+        if all(needle in text for needle in needles):
+            return language
+    return UNKNOWN_LANGUAGE
+
+def frontend(language):
+    """Return the frontend for a language, importing its module on first use."""
+    instance = _frontends.get(language)
+    if instance is None:
+        with _lock:
+            instance = _frontends.get(language)
+            if instance is None:
+                spec = FRONTENDS.get(language)
+                instance = _load(spec)(language) if spec else _generic()(language)
+                _frontends[language] = instance
+    return instance
+
+def _load(spec):
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+def _generic():
+    from dev_agent.frontends import Frontend
+    return Frontend
+
+def _plugin(ext):
+    """Register the plugin frontend for an unknown extension, if one is installed; return its language."""
+    global _plugins
+    with _lock:
+        if _plugins is None:
+            _plugins = {entry_point.name.lower(): entry_point for entry_point in _entry_points()}
+        entry_point = _plugins.pop(ext, None)
+    if entry_point is None:
+        return None
+    try:
+        cls = entry_point.load()
+    except Exception:
+        return None
+    language = getattr(cls, "language", None) or entry_point.name.lstrip(".").capitalize()
+    register(ext, language, entry_point.value)
+    return language
+
+def _entry_points():
+    from importlib import metadata
+    try:
+        return metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10: entry_points() takes no arguments and returns a dict of groups
+        return metadata.entry_points().get(ENTRY_POINT_GROUP, ())
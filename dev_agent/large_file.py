@@ -0,0 +1,355 @@
+"""
+Large File Analysis
+Single-pass, memory-bounded analysis for files too large to split into lists.
+
+The regular agent_v2.py helpers each call content.split('\n') and rescan the
+whole string, which makes several full-size copies of a file. Here the text
+is processed in line-aligned chunks (read from disk or sliced from the
+in-memory string): substring counts run over a whole chunk at C speed, a
+multiline regex picks out only the lines that matter, and only a bounded
+number of components and sampled key points are retained. Peak memory
+therefore depends on the budget rather than on the file size.
+"""
+
+import os
+import random
+import re
+
+from dev_agent import deadline, outline
+
+DEFAULT_THRESHOLD_BYTES = 8 * 1024 * 1024
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+# Lines that can become a component, a structure entry or a key point
+_LINE_PREFIXES = r"(?:class |def |import |from |# |// |/\* |function )"
+_INTERESTING = re.compile(r"^[ \t\f\v]*" + _LINE_PREFIXES + r"[^\n]*", re.M)
+# JS/TS also lists functions declared mid-line, e.g. `export function f(` or `const f = function (`
+_INTERESTING_JS = re.compile(r"^[ \t\f\v]*" + _LINE_PREFIXES + r"[^\n]*|^[^\n]* function [^\n]*", re.M)
+
+class Limits:
+    """Caps derived from a memory budget in bytes."""
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        # Characters processed at a time; splitting a chunk into lines costs
+        # several times its size, so it is kept to a small share of the budget
+        self.chunk_chars = min(max(budget_bytes // 32, 64 * 1024), 4 * 1024 * 1024)
+        # A line longer than a whole chunk is cut to this many characters
+        self.max_line_chars = min(max(budget_bytes // 1024, 256), 64 * 1024)
+        # Entries kept per list (components, key points, ...) for display
+        self.max_items = min(max(budget_bytes // (64 * 1024), 16), 1000)
+
+def is_large(file_content, file_path=None, threshold_bytes=DEFAULT_THRESHOLD_BYTES):
+    """Return True if the request should be analyzed in large-file mode."""
+    if file_content:
+        return len(file_content) > threshold_bytes
+    return bool(file_path) and os.path.isfile(file_path) and os.path.getsize(file_path) > threshold_bytes
+
+def iter_string_chunks(text, limits):
+    """Yield line-aligned chunks of text.
+
+    Chunks are separated by exactly one newline, so joining them with '\n'
+    gives back the text (less any truncated overlong lines) and splitting
+    each chunk on '\n' gives the same lines as text.split('\n').
+    """
+    start = 0
+    length = len(text)
+    while True:
+        if length - start <= limits.chunk_chars:
+            yield text[start:]
+            return
+        cut = text.rfind('\n', start, start + limits.chunk_chars)
+        if cut != -1:
+            yield text[start:cut]
+            start = cut + 1
+            continue
+        # A single line longer than a chunk: keep only its beginning
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:start + limits.max_line_chars]
+            return
+        yield text[start:min(end, start + limits.max_line_chars)]
+        start = end + 1
+
+def iter_file_chunks(path, limits):
+    """Yield line-aligned chunks of a file, like iter_string_chunks.
+
+    The file is read a block at a time, so neither a large file nor a single
+    multi-megabyte line (e.g. minified code) ever has to fit in memory.
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        carry = ''
+        skipping = False
+        while True:
+            block = f.read(limits.chunk_chars)
+            if not block:
+                yield carry
+                return
+            if skipping:
+                # Drop the rest of a line that was already cut short
+                newline = block.find('\n')
+                if newline == -1:
+                    continue
+                block = block[newline:]
+                skipping = False
+            cut = block.rfind('\n')
+            if cut == -1:
+                carry += block
+                if len(carry) > limits.max_line_chars:
+                    carry = carry[:limits.max_line_chars]
+                    skipping = True
+                continue
+            yield carry + block[:cut]
+            carry = block[cut + 1:]
+
+def iter_chunks(file_content, file_path, limits):
+    """Yield chunks of the in-memory content if present, else of the file on disk.
+
+    The current request's cancel token is checked before each chunk.
+    """
+    if file_content:
+        return deadline.checked(iter_string_chunks(file_content, limits))
+    return deadline.checked(iter_file_chunks(file_path, limits))
+
+def iter_source_lines(file_content, file_path, limits):
+    """Yield lines one chunk at a time, matching content.split('\n')."""
+    for chunk in iter_chunks(file_content, file_path, limits):
+        yield from chunk.split('\n')
+
+def read_head(file_content, file_path, size=64 * 1024):
+    """Return the first size characters, used for content-based language detection."""
+    if file_content:
+        return file_content[:size]
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read(size)
+
+class _Bounded:
+    """Keeps the first max_items entries and counts the rest."""
+
+    __slots__ = ("items", "total", "max_items")
+
+    def __init__(self, max_items):
+        self.items = []
+        self.total = 0
+        self.max_items = max_items
+
+    def add(self, item):
+        self.total += 1
+        if len(self.items) < self.max_items:
+            self.items.append(item)
+
+    def truncated(self):
+        return self.total > len(self.items)
+
+class StreamAnalysis:
+    """Everything the explain/summary responses need, gathered in one pass."""
+
+    def __init__(self, limits, language, seed=0):
+        self.limits = limits
+        self.language = language
+        self.line_count = 0
+        # Chunks are separated by one newline each; there is none before the first
+        self.char_count = -1
+        self.counts = {"class ": 0, "def ": 0, "function ": 0, "interface ": 0, "import ": 0, "require(": 0}
+        self.components = _Bounded(limits.max_items)
+        self.imports = _Bounded(limits.max_items)
+        self.classes = _Bounded(limits.max_items)
+        self.functions = _Bounded(limits.max_items)
+        self.key_points = []
+        self.key_point_total = 0
+        self.has_bare_except = False
+        self.has_except_exception = False
+        self.has_print = False
+        self.has_todo = False
+        self.has_comments = False
+        self._is_js = language in ("JavaScript", "TypeScript")
+        self._pattern = _INTERESTING_JS if self._is_js else _INTERESTING
+        self._rng = random.Random(seed)
+
+    def _sample_key_point(self, line_number, text):
+        # Reservoir sampling keeps a uniform sample of all comment lines
+        self.key_point_total += 1
+        if len(self.key_points) < self.limits.max_items:
+            self.key_points.append((line_number, text))
+        else:
+            slot = self._rng.randrange(self.key_point_total)
+            if slot < self.limits.max_items:
+                self.key_points[slot] = (line_number, text)
+
+    def feed(self, chunk):
+        """Account for one line-aligned chunk of the file."""
+        first_line = self.line_count + 1
+        self.line_count += chunk.count('\n') + 1
+        self.char_count += len(chunk) + 1
+        for token in self.counts:
+            self.counts[token] += chunk.count(token)
+        self.has_bare_except = self.has_bare_except or "except:" in chunk
+        self.has_except_exception = self.has_except_exception or "except Exception:" in chunk
+        self.has_print = self.has_print or "print(" in chunk
+        self.has_todo = self.has_todo or "TODO" in chunk or "FIXME" in chunk
+        self.has_comments = self.has_comments or "# " in chunk or '"""' in chunk or "'''" in chunk
+
+        line_number, position = first_line, 0
+        for match in self._pattern.finditer(chunk):
+            line_number += chunk.count('\n', position, match.start())
+            position = match.start()
+            self._feed_line(match.group().strip(), line_number)
+
+    def _feed_line(self, stripped, line_number):
+        if stripped.startswith('# ') and len(stripped) > 3:
+            self._sample_key_point(line_number, stripped[2:])
+        elif stripped.startswith('// ') and len(stripped) > 4:
+            self._sample_key_point(line_number, stripped[3:])
+        elif stripped.startswith('/* ') and len(stripped) > 4:
+            self._sample_key_point(line_number, stripped[3:].rstrip('*/'))
+
+        if stripped.startswith('class '):
+            name = stripped.split('class ')[1]
+            if self._is_js:
+                self.classes.add(name.split(' {')[0].split(' extends')[0])
+            else:
+                self.classes.add(name.split('(')[0].split(':')[0])
+            self.components.add(f"- Class: `{name.split('(')[0].split(':')[0]}`")
+        elif stripped.startswith('def '):
+            name = stripped.split('def ')[1].split('(')[0]
+            self.functions.add(name)
+            self.components.add(f"- Function: `{name}`")
+        elif stripped.startswith('import ') or stripped.startswith('from '):
+            # The JS/TS structure only lists `import` statements
+            if stripped.startswith('import ') or not self._is_js:
+                self.imports.add(stripped)
+            self.components.add(f"- Import: `{stripped}`")
+        elif self._is_js:
+            if stripped.startswith('function '):
+                self.functions.add(stripped.split('function ')[1].split('(')[0])
+            elif ' function ' in stripped:
+                self.functions.add(stripped.split(' function ')[1].split('(')[0])
+
+    @property
+    def sampled(self):
+        return self.key_point_total > len(self.key_points)
+
+def analyze(chunks, language, limits):
+    """Run a StreamAnalysis over an iterable of line-aligned chunks."""
+    analysis = StreamAnalysis(limits, language)
+    for chunk in chunks:
+        analysis.feed(chunk)
+    return analysis
+
+def _more(bounded):
+    return f"\n- ... and {bounded.total - len(bounded.items)} more" if bounded.truncated() else ""
+
+def render_overview(analysis, language):
+    counts = analysis.counts
+    if language == "Python":
+        if counts["class "]:
+            return "defines one or more Python classes"
+        elif counts["def "]:
+            return "contains one or more Python functions"
+        elif counts["import "]:
+            return "imports modules and performs operations"
+        return "contains Python script code"
+    elif language == "JavaScript" or language == "TypeScript":
+        if counts["class "]:
+            return "defines one or more JavaScript/TypeScript classes"
+        elif counts["function "]:
+            return "contains one or more JavaScript/TypeScript functions"
+        elif counts["import "] or counts["require("]:
+            return "imports modules and performs operations"
+        return "contains JavaScript/TypeScript script code"
+    return "implements functionality in " + language
+
+def render_components(analysis):
+    if not analysis.components.total:
+        return "No distinct components identified. The code appears to be a script or simple program."
+    return "\n".join(analysis.components.items) + _more(analysis.components)
+
+def render_issues(analysis):
+    issues = []
+    if analysis.has_bare_except and not analysis.has_except_exception:
+        issues.append("- Bare except clause could catch unexpected exceptions")
+    if analysis.has_print:
+        issues.append("- Contains print statements which might be left from debugging")
+    if analysis.has_todo:
+        issues.append("- Contains TODO or FIXME comments indicating incomplete work")
+    if not analysis.has_comments:
+        issues.append("- Limited or no comments/documentation")
+    return "\n".join(issues) if issues else "No obvious issues detected in the code."
+
+def render_suggestions(analysis):
+    suggestions = []
+    if not analysis.has_comments:
+        suggestions.append("- Add comments or docstrings to improve code readability")
+    if analysis.has_print:
+        suggestions.append("- Consider replacing print statements with proper logging")
+    if analysis.has_bare_except and not analysis.has_except_exception:
+        suggestions.append("- Specify exception types in except clauses")
+    if analysis.line_count > 200:
+        suggestions.append("- Consider breaking down large files into smaller modules")
+    if suggestions:
+        return "\n".join(suggestions)
+    return "The code appears well-structured. No specific improvements suggested."
+
+def render_file_summary(analysis, language):
+    counts = analysis.counts
+    if language == "Python":
+        return (f"This is a Python file containing approximately {analysis.line_count} lines of code, "
+                f"{counts['class ']} classes, and {counts['def ']} function definitions.")
+    elif language == "JavaScript":
+        return (f"This is a JavaScript file containing approximately {analysis.line_count} lines of code "
+                f"and {counts['function ']} function definitions.")
+    elif language == "TypeScript":
+        return (f"This is a TypeScript file containing approximately {analysis.line_count} lines of code, "
+                f"{counts['function ']} function definitions, and {counts['interface ']} interfaces.")
+    return f"This is a {language} file containing approximately {analysis.line_count} lines of code."
+
+def render_key_points(analysis):
+    if not analysis.key_points:
+        return ("No explicit key points identified in comments. Consider adding descriptive comments "
+                "to highlight important aspects of the code.")
+    points = "\n".join(f"- {text}" for _, text in sorted(analysis.key_points))
+    if analysis.sampled:
+        points += f"\n\n_Sampled {len(analysis.key_points)} of {analysis.key_point_total} comment lines._"
+    return points
+
+def outline_symbols(file_content, file_path, language, limits):
+    """Return the source outline, or None if the language has none or the file is too large for it.
+
+    The outline engine needs the whole text: content already in memory is used as is, a file
+    on disk is read only if it fits the memory budget (at up to 4 bytes per character).
+    """
+    if not outline.has_outline(language):
+        return None
+    if not file_content:
+        if not file_path or os.path.getsize(file_path) > limits.budget_bytes // 4:
+            return None
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            file_content = f.read()
+    return outline.outline(file_content, language)
+
+def render_structure(analysis, language, symbols=None):
+    """Render the structure from the outline if there is one, else from the streamed lines."""
+    imports, classes, functions = analysis.imports, analysis.classes, analysis.functions
+    if symbols is not None:
+        structure = []
+        if language in ("JavaScript", "TypeScript") and imports.total:
+            structure.append(f"- Imports ({imports.total}): {', '.join(imports.items[:3])}{'...' if imports.total > 3 else ''}")
+        if symbols:
+            structure.append(outline.render_outline(symbols))
+        return "\n".join(structure) if structure else "The file structure could not be automatically analyzed."
+    if language not in ("Python", "JavaScript", "TypeScript"):
+        return "The file structure could not be automatically analyzed."
+    structure = []
+    if imports.total:
+        structure.append(f"- Imports ({imports.total}): {', '.join(imports.items[:3])}{'...' if imports.total > 3 else ''}")
+    if classes.total:
+        structure.append(f"- Classes ({classes.total}): {', '.join(classes.items)}{'...' if classes.truncated() else ''}")
+    if functions.total:
+        structure.append(f"- Functions ({functions.total}): {', '.join(functions.items[:5])}{'...' if functions.total > 5 else ''}")
+    return "\n".join(structure) if structure else "The file structure could not be automatically analyzed."
+
+def large_file_note(analysis):
+    """Explain why the response is abbreviated."""
+    return (f"> Large file mode: {analysis.line_count} lines ({analysis.char_count / 2**20:.1f} MB) were streamed "
+            f"with a {analysis.limits.budget_bytes // 2**20} MB memory budget; lists are truncated to "
+            f"{analysis.limits.max_items} entries and lines to {analysis.limits.max_line_chars} characters.")
@@ -0,0 +1,113 @@
+"""
+Line Index
+Line numbers for text held in one buffer, without splitting it into lines.
+
+content.split('\n') copies every line of a file into its own string object,
+and an analyzer that only needs a few of them, or the line number of a
+match, pays for all of them. A LineIndex keeps the start offset of every
+line in an array('Q') over the original buffer (a str, or bytes or an mmap
+read as UTF-8 or any ASCII-compatible encoding): about 8 bytes a line instead
+of a string object each. The text of a line is sliced out only when it is
+asked for, and from a bytes buffer as a memoryview, without a copy.
+
+Span is the line range that analyzer results (outline symbols, issue
+markers, changed regions, search hits) carry.
+"""
+
+import functools
+import re
+from array import array
+from bisect import bisect_right
+from itertools import islice
+
+_NEWLINE = re.compile("\n")
+_NEWLINE_BYTES = re.compile(b"\n")
+
+class Span:
+    """A range of lines, 1-based and inclusive."""
+
+    __slots__ = ("start_line", "end_line")
+
+    def __init__(self, start_line, end_line=None):
+        self.start_line = start_line
+        self.end_line = start_line if end_line is None else end_line
+
+    def __repr__(self):
+        return f"Span({self.start_line}, {self.end_line})"
+
+    @property
+    def line_count(self):
+        return self.end_line - self.start_line + 1
+
+    def overlaps(self, other):
+        return self.start_line <= other.end_line and other.start_line <= self.end_line
+
+class LineIndex:
+    """Start offsets of the lines of a buffer; lines are numbered from 1, as in split('\n')."""
+
+    __slots__ = ("buffer", "starts", "_view")
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.starts = array("Q", [0])
+        if isinstance(buffer, str):
+            self.starts.extend(map(re.Match.end, _NEWLINE.finditer(buffer)))
+            self._view = buffer
+        else:
+            self.starts.extend(map(re.Match.end, _NEWLINE_BYTES.finditer(buffer)))
+            self._view = memoryview(buffer)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return self.lines()
+
+    def start(self, line):
+        """Offset of the first character of a line."""
+        return self.starts[line - 1]
+
+    def end(self, line):
+        """Offset just past the last character of a line, before its newline."""
+        return self.starts[line] - 1 if line < len(self.starts) else len(self.buffer)
+
+    def line(self, line):
+        """The text of a line, without its newline; a memoryview for a bytes buffer."""
+        if not 1 <= line <= len(self.starts):
+            raise IndexError(f"line {line} out of range 1-{len(self.starts)}")
+        return self._view[self.starts[line - 1]:self.end(line)]
+
+    def line_of(self, offset):
+        """The number of the line holding an offset, found by binary search."""
+        return bisect_right(self.starts, offset)
+
+    def span(self, start, end):
+        """The Span of the lines holding the characters from start up to (not including) end."""
+        return Span(self.line_of(start), self.line_of(max(start, end - 1)))
+
+    def lines(self, first=1, last=None):
+        """Yield the text of lines first to last (inclusive), one at a time."""
+        starts, view = self.starts, self._view
+        last = len(starts) if last is None else min(last, len(starts))
+        if first > last:
+            return
+        for start, following in zip(islice(starts, first - 1, last - 1), islice(starts, first, last)):
+            yield view[start:following - 1]
+        yield view[starts[last - 1]:self.end(last)]
+
+def stripped_lines(text, *prefixes):
+    """Yield, in order, the stripped lines of text that start with one of prefixes.
+
+    The same as filtering line.strip() for line in text.split('\n'), but only
+    the matching lines are ever copied out of text.
+    """
+    for match in _prefix_pattern(prefixes).finditer(text):
+        line = match.group().strip()
+        # "import" alone matches "import " before its trailing blanks are stripped
+        if line.startswith(prefixes):
+            yield line
+
+@functools.lru_cache(maxsize=None)
+def _prefix_pattern(prefixes):
+    alternatives = "|".join(re.escape(prefix) for prefix in prefixes)
+    return re.compile(f"^[^\\S\\n]*(?:{alternatives})[^\\n]*", re.M)
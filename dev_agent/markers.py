@@ -0,0 +1,411 @@
+"""
+Issue Markers
+Index of the TODO, FIXME and HACK comments, bare `except:` clauses and
+leftover debugging prints in the workspace, with their file, line, text
+and, from git blame, author and date.
+
+Each file is scanned with one regular expression, and its markers are
+cached by file size and modification time like the module graph, so
+rebuilding the index after an edit re-reads only the changed files and an
+index kept in memory (by the resident agent) is updated one file at a time.
+Blame is only run when a query filters by age or author, only for files
+with markers, and is cached with the markers; lines that were not committed
+yet are blamed again at the next such query.
+"""
+
+import os
+import re
+import stat
+import threading
+import time
+
+from dev_agent import deadline, workspace
+from dev_agent.changes import GitError, git
+from dev_agent.lines import Span
+
+CACHE_VERSION = 2
+MAX_FILE_BYTES = 4 * 1024 * 1024
+MAX_TEXT = 200
+# Marker kinds, in display order
+KINDS = ("FIXME", "TODO", "HACK", "bare except", "print")
+# Data formats rarely carry markers, and their files can be large
+SKIPPED_LANGUAGES = frozenset({"JSON", "XML", "YAML"})
+
+# A marker word counts only after a comment start on its line, and not in quotes, so
+# code that looks for markers (`"TODO" in text`) is not one
+_COMMENT_MARKER = (r"(?:#|//|/\*|<!--|^[ \t]*\*)[^\r\n]*?(?<![\"'`])\b(?P<tag>TODO|FIXME|HACK)\b[ \t:(\-]*"
+                   r"(?P<text>[^\r\n]*)")
+# String literals are matched whole (and skipped), so that a `#` or `//` inside one starts no comment
+_DOUBLE_QUOTED = r'"[^"\\\r\n]*(?:\\.[^"\\\r\n]*)*"'
+_SINGLE_QUOTED = r"'[^'\\\r\n]*(?:\\.[^'\\\r\n]*)*'"
+_STRINGS = {
+    "Python": [r'"""[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*"""', r"'''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*'''",
+               _DOUBLE_QUOTED, _SINGLE_QUOTED],
+    "JavaScript": [_DOUBLE_QUOTED, _SINGLE_QUOTED, r"`[^`\\]*(?:\\[\s\S][^`\\]*)*`"],
+}
+# Other languages: double-quoted strings and character literals, not the apostrophes of prose
+_DEFAULT_STRINGS = [_DOUBLE_QUOTED, r"'(?:\\.|[^\\'\r\n])'"]
+
+def _pattern(language, *alternatives):
+    strings = "|".join(_STRINGS.get(language, _DEFAULT_STRINGS))
+    return re.compile("|".join((f"(?P<string>{strings})", _COMMENT_MARKER) + alternatives), re.M)
+
+_PATTERNS = {
+    "Python": _pattern("Python", r"^[ \t]*(?P<bare>except[ \t]*:)[^\r\n]*", r"^[ \t]*(?P<print>print[ \t]*\()[^\r\n]*"),
+    "JavaScript": _pattern("JavaScript", r"^[ \t]*(?P<print>console\.log[ \t]*\()[^\r\n]*"),
+}
+_PATTERNS["TypeScript"] = _PATTERNS["JavaScript"]
+_DEFAULT_PATTERN = _pattern(None)
+# Comment closers left at the end of a marker's text
+_CLOSERS = re.compile(r"\s*(?:\*/|-->|\*\)|#\})?\s*$")
+
+# Query phrases: "FIXMEs under src/ older than 90 days by alice"
+_QUERY_KINDS = (("fixme", "FIXME"), ("todo", "TODO"), ("hack", "HACK"), ("bare except", "bare except"),
+                ("print", "print"))
+# "in" only takes a path, so that "in the last 30 days" is not one
+_UNDER = re.compile(r"\bunder\s+[`'\"]?([^\s`'\"]+)|\bin\s+[`'\"]?([^\s`'\"]*[/.][^\s`'\"]*)")
+_AGE = re.compile(r"\b(older|newer|younger)\s+than\s+(\d+)\s*(day|week|month|year)s?\b", re.I)
+_LAST = re.compile(r"\bin\s+the\s+last\s+(\d+)\s*(day|week|month|year)s?\b", re.I)
+_AUTHOR = re.compile(r"\bby\s+[`'\"]?([^\s`'\"]+)")
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+# Author and time of a marker that was not blamed: its query did not filter
+# by age or author, or its file is not in a git checkout
+NOT_BLAMED = object()
+
+def scan_file(path, language):
+    """Return the [line, kind, text] markers of one file; None if it is unreadable, binary or oversized."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(MAX_FILE_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > MAX_FILE_BYTES or b"\0" in data[:8192]:
+        return None
+    text = data.decode("utf-8", "replace")
+    markers = []
+    line = 1
+    position = 0
+    for match in _PATTERNS.get(language, _DEFAULT_PATTERN).finditer(text):
+        if match.lastgroup == "string":
+            continue
+        line += text.count("\n", position, match.start())
+        position = match.start()
+        tag = match.group("tag")
+        if tag is not None:
+            markers.append([line, tag, _CLOSERS.sub("", match.group("text"))[:MAX_TEXT]])
+        elif match.lastgroup == "bare":
+            markers.append([line, "bare except", match.group().strip()[:MAX_TEXT]])
+        else:
+            markers.append([line, "print", match.group().strip()[:MAX_TEXT]])
+    return markers
+
+def scan_batch(items):
+    """Scan (path, language) items in a pool worker; returns [(path, markers)]."""
+    return [(path, scan_file(path, language)) for path, language in items]
+
+def blame_file(path, lines):
+    """Return [author, author time] (None for lines not committed yet) per line, or None outside git."""
+    directory, name = os.path.split(path)
+    ranges = []
+    for line in sorted(set(lines)):
+        ranges += ["-L", f"{line},{line}"]
+    try:
+        output = git(directory, "blame", "--line-porcelain", *ranges, "--", name)
+    except GitError as e:
+        # An untracked file of a checkout is as new as a line not committed yet
+        return None if "not a git repository" in str(e) else [None] * len(lines)
+    blamed = {}
+    commit = author = line = None
+    for row in output.split("\n"):
+        if row.startswith("\t"):
+            blamed[line] = None if commit == "0" * len(commit) else [author, author_time]
+        elif row.startswith("author "):
+            author = row[7:]
+        elif row.startswith("author-time "):
+            author_time = int(row[12:])
+        elif row and not row.startswith(("author", "committer", "summary", "previous", "filename", "boundary")):
+            fields = row.split()
+            if len(fields) >= 3 and len(fields[0]) >= 40:
+                commit, line = fields[0], int(fields[2])
+    return [blamed.get(line) for line in lines]
+
+def blame_batch(items):
+    """Blame (path, lines) items in a pool worker; returns [(path, blame)]."""
+    return [(path, blame_file(path, lines)) for path, lines in items]
+
+class Marker(Span):
+    """One issue marker, on one line.
+
+    author and time are NOT_BLAMED when the marker was not blamed, and None
+    when git blame found its line not committed yet.
+    """
+
+    __slots__ = ("path", "name", "kind", "text", "author", "time")
+
+    def __init__(self, path, name, line, kind, text, author=NOT_BLAMED, time=NOT_BLAMED):
+        super().__init__(line)
+        self.path = path
+        self.name = name
+        self.kind = kind
+        self.text = text
+        self.author = author
+        self.time = time
+
+    @property
+    def line(self):
+        return self.start_line
+
+    @property
+    def blamed(self):
+        return self.time is not NOT_BLAMED
+
+class Query:
+    """Filters for the markers of an index; None means any."""
+
+    def __init__(self, kinds=None, under=None, min_age_days=None, max_age_days=None, author=None):
+        self.kinds = kinds
+        self.under = under
+        self.min_age_days = min_age_days
+        self.max_age_days = max_age_days
+        self.author = author
+
+    @property
+    def needs_blame(self):
+        return self.min_age_days is not None or self.max_age_days is not None or self.author is not None
+
+    def describe(self):
+        """Return the filters as a phrase, e.g. " under `src/` older than 90 days"."""
+        parts = []
+        if self.under:
+            parts.append(f"under `{self.under}`")
+        if self.min_age_days is not None:
+            parts.append(f"older than {_days(self.min_age_days)}")
+        if self.max_age_days is not None:
+            parts.append(f"from the last {_days(self.max_age_days)}")
+        if self.author:
+            parts.append(f"by {self.author}")
+        return "".join(" " + part for part in parts)
+
+def _days(count):
+    return f"{count} day{'' if count == 1 else 's'}"
+
+def parse_query(command):
+    """Build a Query from a question such as "all FIXMEs under src/ older than 90 days"."""
+    lowered = command.lower()
+    kinds = {kind for phrase, kind in _QUERY_KINDS if phrase in lowered} or None
+    query = Query(kinds)
+    match = _UNDER.search(command)
+    if match:
+        query.under = (match.group(1) or match.group(2)).replace("\\", "/").strip("/").removeprefix("./")
+    match = _AGE.search(command)
+    if match:
+        days = int(match.group(2)) * _UNIT_DAYS[match.group(3).lower()]
+        if match.group(1).lower() == "older":
+            query.min_age_days = days
+        else:
+            query.max_age_days = days
+    match = _LAST.search(command)
+    if match:
+        query.max_age_days = int(match.group(1)) * _UNIT_DAYS[match.group(2).lower()]
+    match = _AUTHOR.search(command)
+    if match:
+        query.author = match.group(1)
+    return query
+
+class MarkerIndex:
+    """Issue markers of the files in a set of workspace folders.
+
+    refresh() brings the whole index up to date with the files on disk;
+    update(path) re-reads a single file. Both are thread-safe, and so are
+    queries. stale is set until the first refresh, and again whenever the
+    file watcher may have missed changes.
+    """
+
+    def __init__(self, roots, cache_path=None, workers=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.cache_path = cache_path or workspace.default_cache_path(self.roots, "markers")
+        self.workers = workers
+        # path -> [line, kind, text] markers
+        self.markers = {}
+        # path -> [author, time] or None per marker; missing until blamed
+        self.blame = {}
+        self.names = {}
+        self._stamps = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.RLock()
+        self.stale = True
+
+    # Building
+
+    def refresh(self):
+        """Re-scan the files that changed on disk; return how many were read."""
+        with self._lock:
+            if not self._loaded:
+                cached = workspace.load_cache(self.cache_path, CACHE_VERSION).get("files", {})
+                self._loaded = True
+            else:
+                cached = {}
+            listed = {}
+            for root in self.roots:
+                for path in workspace.list_files(root):
+                    deadline.check()
+                    language = workspace.language_of(path)
+                    if language is None or language in SKIPPED_LANGUAGES or path in listed:
+                        continue
+                    try:
+                        info = os.stat(path)
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(info.st_mode):
+                        listed[path] = ([info.st_mtime_ns, info.st_size], language,
+                                        workspace.display_name(path, root, self.roots))
+            for path in set(self._stamps) - set(listed):
+                self._remove(path)
+                self._dirty = True
+            pending = []
+            for path, (stamp, language, name) in listed.items():
+                self.names[path] = name
+                if self._stamps.get(path) == stamp:
+                    continue
+                entry = cached.get(path)
+                if entry is not None and entry[0] == stamp:
+                    self._replace(path, stamp, entry[1], entry[2])
+                else:
+                    pending.append((path, language))
+            try:
+                for results in workspace.run_batches(scan_batch, pending, self.workers):
+                    for path, markers in results:
+                        self._replace(path, listed[path][0], markers)
+                        self._dirty = True
+            finally:
+                if self._dirty:
+                    self.save()
+            self.stale = False
+            return len(pending)
+
+    def update(self, path):
+        """Re-read one file (or drop it if it is gone) without looking at the others.
+
+        A path that is gone may also be a removed directory, whose files are dropped.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            try:
+                info = os.stat(path)
+            except OSError:
+                prefix = os.path.join(path, "")
+                for removed in [known for known in self._stamps if known == path or known.startswith(prefix)]:
+                    self._remove(removed)
+                    self._dirty = True
+                return
+            language = workspace.language_of(path)
+            if language is None or language in SKIPPED_LANGUAGES or not stat.S_ISREG(info.st_mode):
+                return
+            root = next((root for root in self.roots if path.startswith(os.path.join(root, ""))), None)
+            if root is None:
+                return
+            self.names[path] = workspace.display_name(path, root, self.roots)
+            self._replace(path, [info.st_mtime_ns, info.st_size], scan_file(path, language))
+            self._dirty = True
+
+    def save(self):
+        """Write the markers, and the blame of blamed files, to the cache file."""
+        with self._lock:
+            files = {path: [stamp, self.markers.get(path), self.blame.get(path)] for path, stamp in self._stamps.items()}
+            workspace.save_cache(self.cache_path, {"files": files}, CACHE_VERSION)
+            self._dirty = False
+
+    def _replace(self, path, stamp, markers, blame=None):
+        self._stamps[path] = stamp
+        self.blame.pop(path, None)
+        if markers:
+            self.markers[path] = markers
+            if blame is not None:
+                self.blame[path] = blame
+        else:
+            self.markers.pop(path, None)
+
+    def _remove(self, path):
+        del self._stamps[path]
+        self.markers.pop(path, None)
+        self.blame.pop(path, None)
+        self.names.pop(path, None)
+
+    def _blame(self, paths):
+        """Blame the marker lines of files not blamed yet, or with lines not committed at the last blame."""
+        pending = []
+        for path in paths:
+            blame = self.blame.get(path, False)
+            if blame is False or (blame is not None and None in blame):
+                pending.append((path, [line for line, _, _ in self.markers[path]]))
+        for results in workspace.run_batches(blame_batch, pending, self.workers):
+            for path, blame in results:
+                if path in self.markers:
+                    self.blame[path] = blame
+                    self._dirty = True
+        if pending:
+            self.save()
+
+    # Queries
+
+    def query(self, query):
+        """Return the Markers matching a Query, oldest first when blamed, else by file and line."""
+        with self._lock:
+            prefix = query.under + "/" if query.under else None
+            paths = [path for path in self.markers
+                     if prefix is None or self.names[path] == query.under or self.names[path].startswith(prefix)]
+            if query.needs_blame:
+                self._blame(paths)
+            now = time.time()
+            found = []
+            for path in paths:
+                # Blame cached by an earlier query is left out, so that results do not depend on query history
+                blame = self.blame.get(path) if query.needs_blame else None
+                for number, (line, kind, text) in enumerate(self.markers[path]):
+                    if query.kinds is not None and kind not in query.kinds:
+                        continue
+                    if blame is None:
+                        author = committed = NOT_BLAMED
+                    elif number < len(blame) and blame[number]:
+                        author, committed = blame[number]
+                    else:
+                        author = committed = None
+                    if query.needs_blame:
+                        # Lines not committed yet, or outside git, are new and have no author to match
+                        age_days = (now - committed) / 86400 if isinstance(committed, int) else 0
+                        if query.min_age_days is not None and age_days <= query.min_age_days:
+                            continue
+                        if query.max_age_days is not None and age_days > query.max_age_days:
+                            continue
+                        if query.author is not None and (not isinstance(author, str)
+                                                         or query.author.lower() not in author.lower()):
+                            continue
+                    found.append(Marker(path, self.names[path], line, kind, text, author, committed))
+        if query.needs_blame:
+            found.sort(key=lambda marker: (marker.time if isinstance(marker.time, int) else now, marker.name, marker.line))
+        else:
+            found.sort(key=lambda marker: (marker.name, marker.line))
+        return found
+
+    def counts(self):
+        """Return {kind: number of markers} over the whole index."""
+        with self._lock:
+            counts = dict.fromkeys(KINDS, 0)
+            for markers in self.markers.values():
+                for _, kind, _ in markers:
+                    counts[kind] += 1
+            return counts
+
+_indexes = workspace.IndexRegistry(MarkerIndex)
+
+def get_index(roots, workers=None):
+    """Return the up-to-date marker index of these folders; see workspace.IndexRegistry."""
+    return _indexes.get(roots, workers)
+
+def files_changed(paths, rescan=()):
+    """Update the indexes in memory for changed files; return how many files were re-read.
+
+    See workspace.IndexRegistry.files_changed().
+    """
+    return _indexes.files_changed(paths, rescan)
@@ -0,0 +1,330 @@
+"""
+Metrics
+Counters, gauges and histograms exposed in the Prometheus text format.
+
+Hot-path updates never take a lock: every thread writes into its own shard
+(a plain dict) and a scrape sums the shards. Only the first update from a new
+thread, creating a labelled child and scraping touch the registry lock.
+"""
+
+import os
+import signal
+import sys
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request latency buckets in seconds, from sub-millisecond cache hits to slow workflows
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Registry:
+    """Collection of metrics plus the per-thread value shards they write to."""
+
+    def __init__(self):
+        self._metrics = []
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def shard(self):
+        """Return the calling thread's value dict, creating it on first use."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def totals(self):
+        """Sum all thread shards into one dict of values."""
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, unlike iterating a dict
+            # that its owner thread may be inserting into
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def exposition(self):
+        """Render every registered metric in the Prometheus text format."""
+        totals = self.totals()
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(totals))
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class _Metric:
+    """Base class handling names, help text and labelled children."""
+
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._registry = registry or REGISTRY
+        self._children = {}
+        self._registry.register(self)
+        if not self.labelnames:
+            self.labels()
+
+    def labels(self, *labelvalues):
+        """Return the child metric for the given label values."""
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+            with self._registry._lock:
+                child = self._children.setdefault(labelvalues, self._child(labelvalues))
+        return child
+
+    def _child(self, labelvalues):
+        raise NotImplementedError
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels()")
+        return self.labels()
+
+class _CounterChild:
+    __slots__ = ("_registry", "_key")
+
+    def __init__(self, registry, key):
+        self._registry = registry
+        self._key = key
+
+    def inc(self, amount=1):
+        values = self._registry.shard()
+        values[self._key] = values.get(self._key, 0) + amount
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests served."""
+
+    kind = "counter"
+
+    def _child(self, labelvalues):
+        return _CounterChild(self._registry, (self.name, labelvalues))
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def value(self, *labelvalues):
+        return self._registry.totals().get((self.name, labelvalues), 0)
+
+    def samples(self, totals):
+        for labelvalues in list(self._children):
+            value = totals.get((self.name, labelvalues), 0)
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Sample the gauge by calling function at scrape time."""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or sampled when scraped."""
+
+    kind = "gauge"
+
+    def _child(self, labelvalues):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def set_function(self, function):
+        self._unlabelled().set_function(function)
+
+    def get(self, *labelvalues):
+        return self.labels(*labelvalues).get()
+
+    def samples(self, totals):
+        for labelvalues, child in list(self._children.items()):
+            try:
+                value = child.get()
+            except Exception:
+                continue
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+class _HistogramChild:
+    __slots__ = ("_registry", "_buckets", "_bucket_keys", "_sum_key", "_count_key")
+
+    def __init__(self, registry, name, labelvalues, buckets):
+        self._registry = registry
+        self._buckets = buckets
+        self._bucket_keys = [(name, labelvalues, index) for index in range(len(buckets) + 1)]
+        self._sum_key = (name + "_sum", labelvalues)
+        self._count_key = (name + "_count", labelvalues)
+
+    def observe(self, value):
+        values = self._registry.shard()
+        # Buckets are stored non-cumulatively and summed up at scrape time
+        key = self._bucket_keys[bisect_left(self._buckets, value)]
+        values[key] = values.get(key, 0) + 1
+        values[self._sum_key] = values.get(self._sum_key, 0) + value
+        values[self._count_key] = values.get(self._count_key, 0) + 1
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed upper-bound buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _child(self, labelvalues):
+        return _HistogramChild(self._registry, self.name, labelvalues, self.buckets)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def samples(self, totals):
+        bounds = self.buckets + (float("inf"),)
+        for labelvalues in list(self._children):
+            cumulative = 0
+            for index, bound in enumerate(bounds):
+                cumulative += totals.get((self.name, labelvalues, index), 0)
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_value(float(bound))))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(totals.get((self.name + '_sum', labelvalues), 0))}"
+            yield f"{self.name}_count{labels} {totals.get((self.name + '_count', labelvalues), 0)}"
+
+def resident_memory_bytes():
+    """Return the current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. macOS): fall back to the peak RSS
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+# Default registry used by the agent and its resident server
+REGISTRY = Registry()
+
+REQUESTS = Counter("dev_agent_requests_total", "Requests handled, by command type and outcome.",
+                   ("command", "status"))
+REQUEST_LATENCY = Histogram("dev_agent_request_duration_seconds", "Time from receipt to response, by command type.",
+                            ("command",))
+CACHE_LOOKUPS = Counter("dev_agent_cache_lookups_total", "Result cache lookups, by result (hit or miss).",
+                        ("result",))
+COALESCED_REQUESTS = Counter("dev_agent_coalesced_requests_total",
+                             "Requests attached to an identical in-flight request, by command type.", ("command",))
+PREFETCHES = Counter("dev_agent_prefetch_requests_total",
+                     "Speculative requests from prefetch hints, by outcome (queued, in_flight, cached, rejected).",
+                     ("outcome",))
+PREFETCH_HITS = Counter("dev_agent_prefetch_hits_total", "Requests answered from a prefetched cache entry.")
+CACHE_HIT_RATIO = Gauge("dev_agent_cache_hit_ratio", "Fraction of result cache lookups that were hits.")
+QUEUE_DEPTH = Gauge("dev_agent_queue_depth", "Requests waiting for a worker, by priority class.", ("priority",))
+QUEUE_WAIT = Histogram("dev_agent_queue_wait_seconds", "Time from queueing to a worker picking a request up, by priority class.",
+                       ("priority",))
+WORKERS_BUSY = Gauge("dev_agent_workers_busy", "Workers processing a request, by priority class.", ("priority",))
+WORKER_RESTARTS = Counter("dev_agent_worker_restarts_total", "Worker threads restarted after dying.")
+EXECUTION_TIMEOUTS = Counter("dev_agent_execution_timeouts_total", "Requests that exceeded their time limit.")
+RESIDENT_MEMORY = Gauge("dev_agent_resident_memory_bytes", "Resident set size of the agent process.")
+
+def _cache_hit_ratio():
+    hits = CACHE_LOOKUPS.value("hit")
+    total = hits + CACHE_LOOKUPS.value("miss")
+    return hits / total if total else 0.0
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratio)
+RESIDENT_MEMORY.set_function(resident_memory_bytes)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def start_metrics_server(port=None, socket_path=None, registry=REGISTRY):
+    """Serve /metrics on 127.0.0.1:port or a Unix socket from a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, handler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+def install_snapshot_signal(stream=None, registry=REGISTRY):
+    """Dump a metrics snapshot to stream (stderr by default) on SIGUSR1."""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def dump(signum, frame):
+        out = stream or sys.stderr
+        out.write(registry.exposition())
+        out.flush()
+
+    signal.signal(signal.SIGUSR1, dump)
@@ -0,0 +1,469 @@
+"""
+Source Outline
+Builds the symbol tree (classes, functions, methods and other types, with
+their line ranges) of JavaScript, TypeScript, Java, C, C++, Go and Rust
+source in a single pass.
+
+One regular expression per language finds the only tokens that matter for
+structure: comments, string, character and template literals, braces,
+parentheses and statement ends. The text between them is skipped by the
+regex engine, so the Python loop runs once per token, not per character or
+line. When a brace opens, the declaration in front of it (the text since
+the previous statement end or brace, its header) is classified once; a
+brace inside parentheses, such as a destructured parameter or an object
+literal argument, is an expression and never starts a symbol.
+"""
+
+import re
+
+from dev_agent.lines import Span
+
+# Languages with an outline, by detect_language() name
+LANGUAGES = {
+    "JavaScript": "js", "TypeScript": "js",
+    "Java": "java",
+    "C": "c", "C++": "c",
+    "Go": "go",
+    "Rust": "rust",
+}
+
+# Headers longer than this are cut to their end before classification
+MAX_HEADER = 2000
+
+# Symbol kinds whose functions are listed as methods
+TYPE_KINDS = {"class", "interface", "struct", "enum", "union", "record", "trait", "impl"}
+
+def _tokens(literals, starts, terminators):
+    """Compile a pattern matching the text up to and including the next terminator character.
+
+    literals (comments, strings) are skipped whole inside the match; starts are the characters
+    that may begin one, each also accepted alone when no literal begins there. The match stops
+    at the end of the text when no terminator is left: a match that could fail would backtrack
+    through every way of splitting the literals before giving up.
+    """
+    run = f"[^{terminators}{starts}]*"
+    return re.compile(f"{run}(?:(?:{'|'.join(literals)}|[{starts}]){run})*(?:(?P<end>[{terminators}])|\\Z)")
+
+_LINE_COMMENT = r"//[^\n]*"
+_BLOCK_COMMENT = r"/\*[\s\S]*?(?:\*/|\Z)"
+# Unrolled (`[^"\\]*(?:\\.[^"\\]*)*`) rather than an alternation per character, which is slower
+_STRING = r'"[^"\\\n]*(?:\\[\s\S][^"\\\n]*)*"?'
+_CHAR = r"'(?:\\.[^'\n]{0,9}|[^\\'\n])'"
+
+# Template literals and regular expression literals (JavaScript) and preprocessor lines (C)
+# end a match and are handled by the scanner
+_TOKENS = {
+    "js": _tokens([_LINE_COMMENT, _BLOCK_COMMENT, _STRING, r"'[^'\\\n]*(?:\\[\s\S][^'\\\n]*)*'?"],
+                  "\"'", "{}();`/"),
+    "java": _tokens([_LINE_COMMENT, _BLOCK_COMMENT, r'"""[\s\S]*?(?:"""|\Z)', _STRING, _CHAR], "\"'/", "{}();"),
+    "c": _tokens([_LINE_COMMENT, _BLOCK_COMMENT, r'(?<=R)"([^()\\\s]{0,16})\([\s\S]*?\)\1"', _STRING, _CHAR],
+                 "\"'/", "{}();#"),
+    "go": _tokens([_LINE_COMMENT, _BLOCK_COMMENT, r"`[^`]*`?", _STRING, _CHAR], "\"'/`", "{}();"),
+    # Raw strings (`r#"..."#`) are recognized from their first `#`, as the `r` is an ordinary character
+    "rust": _tokens([_LINE_COMMENT, _BLOCK_COMMENT, r'(#+)"[\s\S]*?(?:"\1|\Z)', r'"[^"\\]*(?:\\[\s\S][^"\\]*)*"?',
+                     _CHAR], "\"'/#", "{}();"),
+}
+_PREPROCESSOR_LINE = re.compile(r"#[^\n\\]*(?:\\[\s\S][^\n\\]*)*")
+
+# Go groups type declarations in parentheses: `type ( A struct { ... } )`
+_DECLARATIONS_IN_PARENS = {"go"}
+
+# When the first branch of a preprocessor conditional leaves braces open (`#if A` `if (x) {`
+# `#else` `if (y) {` `#endif`), the other branches are skipped so the braces stay balanced
+_DIRECTIVE = re.compile(r"#\s*(if|ifdef|ifndef|elif|else|endif)\b")
+_CONDITIONAL = re.compile(r"^[ \t]*#[ \t]*(if|ifdef|ifndef|endif)\b", re.MULTILINE)
+
+_TEMPLATE_BODY = re.compile(r"(?:[^`\\$]|\\[\s\S]|\$(?!\{))*")
+_REGEX_LITERAL = re.compile(r"/(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*")
+# A `/` after one of these (or these words) starts a regular expression, not a division
+_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_AFTER_WORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw",
+                      "yield", "await", "instanceof"}
+
+# Comments inside a header, with the strings that may contain `//` or `/*`
+_HEADER_NOISE = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|' + _LINE_COMMENT + "|" + _BLOCK_COMMENT)
+
+# Blocks of control statements, judged on the last line of the header
+_CONTROL = {
+    "js": re.compile(r"\s*(?:if|for|while|switch|catch|try|finally|do|else|case|with|return)\b"),
+    "java": re.compile(r"\s*(?:if|for|while|switch|catch|try|finally|do|else|case|synchronized|return)\b"),
+    "c": re.compile(r"\s*(?:if|for|while|switch|catch|try|do|else|case|return)\b"),
+    "go": re.compile(r"\s*(?:if|for|switch|select|else|case|go|defer|return)\b"),
+    "rust": re.compile(r"\s*(?:if|for|while|loop|match|else|return)\b"),
+}
+
+_KEYWORDS = {"if", "for", "while", "switch", "catch", "with", "return", "function", "do", "else", "try",
+             "finally", "synchronized", "foreach", "sizeof", "typeof", "new", "throw", "case", "defined",
+             "alignof", "decltype", "static_assert", "using", "await", "yield"}
+
+_PARAMS = r"\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)"
+
+_JS_TYPE = re.compile(r"\b(class|interface|enum|namespace|module)\s+([A-Za-z_$][\w$.]*)[^{};=]*$")
+_JS_TYPE_ALIAS = re.compile(r"\btype\s+([A-Za-z_$][\w$]*)\s*(?:<[^=]*>)?\s*=\s*$")
+_JS_FUNCTION = re.compile(r"function\s*\*?\s*([\w$]*)\s*(?:<[^()]*>)?\s*\(")
+_JS_FUNCTION_NAME = re.compile(r"([A-Za-z_$][\w$]*)\s*[:=]\s*(?:async\s+)?$")
+_JS_ARROW = re.compile(r"([A-Za-z_$#][\w$]*)\s*[:=]\s*(?:async\s*)?(?:<[^<>]*>\s*)?(?:\([^;]*?\)|[\w$]+)"
+                       r"(?:\s*:[^;=]*?)?\s*=>\s*$")
+_JS_METHOD = re.compile(r"(?:^|[\s;,{}*])(#?[A-Za-z_$][\w$]*|\[[^\[\]]*\])\s*\??\s*(?:<[^<>()]*>)?\s*" + _PARAMS
+                        + r"\s*(?::[^{};=]*)?$")
+
+_JAVA_TYPE = re.compile(r"\b(class|interface|enum|record)\s+([A-Za-z_$][\w$]*)[^{};=]*$")
+
+_C_TYPE = re.compile(r"(?:^|[\s;])(class|struct|union|enum(?:\s+class|\s+struct)?|namespace)\b"
+                     r"(?:\s*\[\[[^\]]*\]\]|\s+alignas\s*\([^()]*\)|\s+__attribute__\s*\(\([^()]*\)\))*"
+                     r"\s*((?:[A-Za-z_]\w*\s*::\s*)*[A-Za-z_]\w*)?(?:\s*<[^{};()]*>)?\s*(?:final\b)?"
+                     r"\s*(?::[^(){};]*)?$")
+# Also used for Java: its `throws` clause is part of the tail
+_C_FUNCTION = re.compile(r"(?<![\w$~:])((?:[A-Za-z_]\w*(?:\s*<[^<>;{}()]*>)?\s*::\s*)*(?:~\s*)?[A-Za-z_$][\w$]*"
+                         r"|operator\s*(?:\(\s*\)|[^\s\w(]+|[A-Za-z_][\w\s:*&<>]*?))\s*" + _PARAMS
+                         + r"\s*([^(){};=]*(?:\([^()]*\)[^(){};=]*)*)$")
+_NEW_BEFORE = re.compile(r"\bnew\s*$")
+
+_GO_FUNCTION = re.compile(r"func\s*(?:\(([^()]*)\)\s*)?([A-Za-z_]\w*)\s*(?:\[(?:[^\[\]]|\[[^\[\]]*\])*\])?\s*\(")
+_GO_TYPE = re.compile(r"\s*(?:type\s+)?([A-Za-z_]\w*)(?:\[[^\]]*\])?\s+(struct|interface)\s*$")
+
+_RUST_FUNCTION = re.compile(r"\bfn\s+(\$?[A-Za-z_]\w*)")
+_RUST_TYPE = re.compile(r"\b(struct|enum|union|trait|mod)\s+([A-Za-z_]\w*)")
+_RUST_IMPL = re.compile(r"\bimpl\b\s*(?:<[^{}]*?>\s*)?([^{}]*?)\s*(?:\bwhere\b[^{}]*)?$")
+_RUST_MACRO = re.compile(r"\bmacro_rules!\s*([A-Za-z_]\w*)")
+
+class Symbol(Span):
+    """A declaration with a brace-delimited body; its span ends at the closing brace."""
+
+    __slots__ = ("kind", "name", "children")
+
+    def __init__(self, kind, name, start_line, end_line=None):
+        super().__init__(start_line, end_line)
+        self.kind = kind
+        self.name = name
+        self.children = []
+
+    def __repr__(self):
+        return f"Symbol({self.kind!r}, {self.name!r}, {self.start_line}, {self.end_line})"
+
+    def to_dict(self):
+        return {"kind": self.kind, "name": self.name, "start_line": self.start_line, "end_line": self.end_line,
+                "children": [child.to_dict() for child in self.children]}
+
+def has_outline(language):
+    return language in LANGUAGES
+
+def _js_symbol(header, parent_kind):
+    if "class" in header or "interface" in header or "enum" in header or "namespace" in header or \
+            "module" in header:
+        match = _JS_TYPE.search(header)
+        if match:
+            kind = "namespace" if match.group(1) == "module" else match.group(1)
+            return kind, match.group(2), match.start(2)
+    if "type" in header:
+        match = _JS_TYPE_ALIAS.search(header)
+        if match:
+            return "type", match.group(1), match.start(1)
+    index = _rfind_word(header, "function")
+    if index >= 0:
+        match = _JS_FUNCTION.match(header, index)
+        if match and match.group(1):
+            return "function", match.group(1), match.start(1)
+        # An anonymous function is named by what it is assigned to
+        match = _JS_FUNCTION_NAME.search(header, max(0, index - 200), index)
+        if match:
+            return _function_kind(parent_kind), match.group(1), match.start(1)
+        return None
+    if header.rstrip().endswith("=>"):
+        match = _JS_ARROW.search(header, max(0, len(header) - 500))
+        if match:
+            return _function_kind(parent_kind), match.group(1), match.start(1)
+        return None
+    if ")" in header:
+        match = _JS_METHOD.search(header, max(0, len(header) - 500))
+        if match and match.group(1) not in _KEYWORDS:
+            return _function_kind(parent_kind), match.group(1), match.start(1)
+    return None
+
+def _java_symbol(header, parent_kind):
+    if "class" in header or "interface" in header or "enum" in header or "record" in header:
+        match = _JAVA_TYPE.search(header)
+        if match:
+            return match.group(1), match.group(2), match.start(2)
+    # Java has no free functions: those in anonymous classes and lambdas are methods too
+    return _c_function(header, "class")
+
+def _c_symbol(header, parent_kind):
+    if "class" in header or "struct" in header or "union" in header or "enum" in header or \
+            "namespace" in header:
+        match = _C_TYPE.search(header)
+        if match:
+            kind = match.group(1).split()[0]
+            name = match.group(2)
+            if not name:
+                return kind, "(anonymous)", match.start(1)
+            return kind, "".join(name.split()), match.start(2)
+    return _c_function(header, parent_kind)
+
+def _c_function(header, parent_kind):
+    if ")" not in header:
+        return None
+    match = _C_FUNCTION.search(header)
+    if not match:
+        return None
+    name = match.group(1)
+    if not name.startswith("operator"):
+        name = "".join(name.split())
+    if name in _KEYWORDS or _NEW_BEFORE.search(header, 0, match.start()):
+        return None
+    kind = "method" if "::" in name else _function_kind(parent_kind)
+    return kind, name, match.start(1)
+
+def _go_symbol(header, parent_kind):
+    # Go has no statement ends, so a header may hold several statements: the declaration is the
+    # last `func` with a name (earlier ones in the same header are parameter or result types)
+    index = _rfind_word(header, "func")
+    while index >= 0:
+        match = _GO_FUNCTION.match(header, index)
+        # A brace inside the parameters (`x interface{}`) is not the body
+        if match and header.count("(", match.end()) < header.count(")", match.end()):
+            receiver = match.group(1)
+            if receiver is None:
+                return "function", match.group(2), match.start(2)
+            words = receiver.split()
+            receiver_type = words[-1].lstrip("*").split("[")[0] if words else "?"
+            return "method", f"{receiver_type}.{match.group(2)}", match.start(2)
+        index = _rfind_word(header, "func", index)
+    if parent_kind in ("struct", "interface") or not header.rstrip().endswith(("struct", "interface")):
+        return None
+    match = _GO_TYPE.match(header, header.rfind("\n") + 1)
+    if match:
+        return match.group(2), match.group(1), match.start(1)
+    return None
+
+def _rust_symbol(header, parent_kind):
+    if "fn" in header:
+        match = _RUST_FUNCTION.search(header)
+        if match:
+            return _function_kind(parent_kind), match.group(1), match.start(1)
+    if "struct" in header or "enum" in header or "union" in header or "trait" in header or "mod" in header:
+        match = _RUST_TYPE.search(header)
+        if match:
+            kind = "module" if match.group(1) == "mod" else match.group(1)
+            return kind, match.group(2), match.start(2)
+    if "impl" in header:
+        match = _RUST_IMPL.search(header)
+        if match and match.group(1):
+            return "impl", " ".join(match.group(1).split()), match.start(1)
+    if "macro_rules" in header:
+        match = _RUST_MACRO.search(header)
+        if match:
+            return "macro", match.group(1), match.start(1)
+    return None
+
+def _rfind_word(text, word, end=None):
+    """Return the index of the last occurrence of word in text[:end] as a whole word, or -1."""
+    index = text.rfind(word, 0, len(text) if end is None else end)
+    while index >= 0:
+        after = index + len(word)
+        if (index == 0 or not _is_word_char(text[index - 1])) and \
+                (after == len(text) or not _is_word_char(text[after])):
+            return index
+        index = text.rfind(word, 0, index)
+    return -1
+
+def _is_word_char(char):
+    return char.isalnum() or char in "_$"
+
+def _function_kind(parent_kind):
+    return "method" if parent_kind in TYPE_KINDS else "function"
+
+_CLASSIFIERS = {"js": _js_symbol, "java": _java_symbol, "c": _c_symbol, "go": _go_symbol, "rust": _rust_symbol}
+
+# Marks the `${` of a template literal on the brace stack
+_TEMPLATE = object()
+
+def outline(text, language):
+    """Return the top-level symbols of the source text, or None if the language has no outline."""
+    family = LANGUAGES.get(language)
+    if family is None:
+        return None
+    tokens = _TOKENS[family]
+    # A scanner continues from its previous match; it is replaced only when the scan jumps ahead
+    next_token = tokens.scanner(text).search
+    classify = _CLASSIFIERS[family]
+    control = _CONTROL[family].match
+    is_js = family == "js"
+    in_parens = family in _DECLARATIONS_IN_PARENS
+    symbols = []
+    # One entry per open brace: its symbol (or None, or the template marker), then the children
+    # list, parent symbol, paren depth and header start of the enclosing context
+    stack = []
+    # Brace nesting at each open preprocessor conditional
+    conditionals = []
+    children = symbols
+    parent = None
+    depth = 0
+    header_start = 0
+    line = 1
+    line_pos = 0
+    length = len(text)
+    count = text.count
+    while True:
+        match = next_token()
+        if match is None:
+            break
+        pos = match.end()
+        if pos == length and match.group("end") is None:
+            break
+        start = pos - 1
+        char = text[start]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "{":
+            symbol = None
+            if depth <= 0 or in_parens:
+                header_pos = max(header_start, start - MAX_HEADER)
+                header = text[header_pos:start]
+                if "/" in header:
+                    header = _HEADER_NOISE.sub(_blank_comment, header)
+                # Blanked doc comments would otherwise be scanned by every classifier pattern
+                stripped = header.lstrip()
+                header_pos += len(header) - len(stripped)
+                header = stripped
+                if control(header, header.rfind("\n") + 1):
+                    found = None
+                else:
+                    found = classify(header, parent.kind if parent is not None else None)
+                if found is not None:
+                    kind, name, offset = found
+                    offset += header_pos
+                    line += count("\n", line_pos, offset)
+                    line_pos = offset
+                    symbol = Symbol(kind, name, line)
+                    children.append(symbol)
+            stack.append((symbol, children, parent, depth, header_start))
+            if symbol is not None:
+                children = symbol.children
+                parent = symbol
+            depth = 0
+            header_start = pos
+        elif char == "}":
+            if not stack:
+                header_start = pos
+                depth = 0
+                continue
+            symbol, children, parent, depth, header_start = stack.pop()
+            if symbol is _TEMPLATE:
+                pos = _skip_template(text, pos)
+                next_token = tokens.scanner(text, pos).search
+                if text.startswith("${", pos - 2):
+                    stack.append((_TEMPLATE, children, parent, depth, header_start))
+                    depth = 0
+                    header_start = pos
+                continue
+            if symbol is not None:
+                line += count("\n", line_pos, start)
+                line_pos = start
+                symbol.end_line = line
+            if depth <= 0:
+                header_start = pos
+        elif char == ";":
+            # Not inside parentheses (a for loop) or brackets (a Rust array type `[u8; 4]`)
+            if depth <= 0 and count("[", header_start, start) <= count("]", header_start, start):
+                header_start = pos
+        elif char == "#":
+            pos = _PREPROCESSOR_LINE.match(text, start).end()
+            next_token = tokens.scanner(text, pos).search
+            header_start = pos
+            directive = _DIRECTIVE.match(text, start)
+            if directive is None:
+                continue
+            directive = directive.group(1)
+            if directive.startswith("if"):
+                conditionals.append(len(stack))
+            elif not conditionals:
+                continue
+            elif directive == "endif":
+                conditionals.pop()
+            elif conditionals[-1] != len(stack):
+                pos = _skip_branch(text, pos)
+                next_token = tokens.scanner(text, pos).search
+                header_start = pos
+                conditionals.pop()
+        elif is_js:
+            if char == "`":
+                pos = _skip_template(text, pos)
+                next_token = tokens.scanner(text, pos).search
+                if text.startswith("${", pos - 2):
+                    # The substitution ends with a `}` that resumes the template
+                    stack.append((_TEMPLATE, children, parent, depth, header_start))
+                    depth = 0
+                    header_start = pos
+            elif char == "/" and _regex_allowed(text, start):
+                literal = _REGEX_LITERAL.match(text, start)
+                if literal:
+                    pos = literal.end()
+                    next_token = tokens.scanner(text, pos).search
+    if stack:
+        line += count("\n", line_pos, length)
+        for symbol, *_ in stack:
+            if symbol is not None and symbol is not _TEMPLATE:
+                symbol.end_line = line
+    return symbols
+
+def _skip_template(text, pos):
+    """Return the end of the template literal text from pos: after its closing backtick or a `${`."""
+    end = _TEMPLATE_BODY.match(text, pos).end()
+    if text.startswith("${", end):
+        return end + 2
+    return min(end + 1, len(text))
+
+def _skip_branch(text, pos):
+    """Return the position after the #endif that closes the conditional of the branch at pos."""
+    nesting = 0
+    for match in _CONDITIONAL.finditer(text, pos):
+        if match.group(1) != "endif":
+            nesting += 1
+        elif nesting:
+            nesting -= 1
+        else:
+            return match.end()
+    return len(text)
+
+def _regex_allowed(text, start):
+    index = start - 1
+    while index >= 0 and text[index] in " \t\r\n":
+        index -= 1
+    if index < 0:
+        return True
+    previous = text[index]
+    if previous in _REGEX_AFTER or previous == "}":
+        return True
+    if previous.isalpha():
+        word_start = index
+        while word_start > 0 and (text[word_start - 1].isalnum() or text[word_start - 1] in "_$"):
+            word_start -= 1
+        return text[word_start:index + 1] in _REGEX_AFTER_WORDS
+    return False
+
+def _blank_comment(match):
+    token = match.group()
+    return token if token[0] in "\"'" else " " * len(token)
+
+def iter_symbols(symbols, depth=0):
+    """Yield (depth, symbol) for a symbol tree in source order."""
+    for symbol in symbols:
+        yield depth, symbol
+        yield from iter_symbols(symbol.children, depth + 1)
+
+def render_outline(symbols, max_symbols=100, max_depth=3):
+    """Render a symbol tree as a nested markdown list with line ranges."""
+    lines = []
+    total = 0
+    for depth, symbol in iter_symbols(symbols):
+        total += 1
+        if depth >= max_depth or len(lines) >= max_symbols:
+            continue
+        lines.append(f"{'  ' * depth}- {symbol.kind.capitalize()} `{symbol.name}` "
+                     f"(lines {symbol.start_line}-{symbol.end_line})")
+    if total > len(lines):
+        lines.append(f"- ... and {total - len(lines)} more")
+    return "\n".join(lines)
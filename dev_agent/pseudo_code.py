@@ -0,0 +1,123 @@
+"""
+Pseudo Code
+Turns source code into pseudo code through a pipeline of generators: source
+lines, then the statements with the depth of the blocks they are in, then
+one line of pseudo code per statement.
+
+The depth of a statement comes from the indentation of the source. A block
+(a class, function, if, loop, or any line ending with ":") holds the lines
+indented deeper than its header, so a line at column 0 closes every open
+block and the pseudo code from there on does not depend on anything before
+it. A large text is therefore cut just before top-level lines into chunks
+that pool workers convert independently. The converted chunks are joined
+in order, giving the same output as converting the whole text in one pass.
+"""
+
+import re
+
+# Texts at least this long are converted in chunks of about CHUNK_CHARS, in parallel
+PARALLEL_MIN_CHARS = 4 * 1024 * 1024
+CHUNK_CHARS = 512 * 1024
+
+_BLOCK_STARTS = ('class ', 'def ', 'if ', 'elif ', 'else:', 'for ', 'while ')
+_SKIPPED = ('import ', 'from ')
+# A newline before a line that starts at column 0 and is not a comment
+_TOP_LEVEL = re.compile(r"\n(?=[^\s#])")
+
+def iter_statements(lines):
+    """Yield (depth, stripped line) for the lines that are not blank or comments.
+
+    depth is the number of blocks the line is in.
+    """
+    # Indentation of the header of each open block, innermost last
+    headers = []
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        indent = len(line) - len(line.lstrip())
+        while headers and indent <= headers[-1]:
+            headers.pop()
+        yield len(headers), stripped
+        if stripped.startswith(_BLOCK_STARTS) or stripped.endswith(':'):
+            headers.append(indent)
+
+def translate(stripped):
+    """Return the pseudo code for a stripped statement, or None if it is left out."""
+    if stripped.startswith(_SKIPPED):
+        return None
+    if stripped.startswith('class '):
+        return f"DEFINE CLASS {stripped.split('class ')[1].split('(')[0].split(':')[0]}"
+    if stripped.startswith('def '):
+        func_name = stripped.split('def ')[1].split('(')[0]
+        params = stripped.split('(')[1].split(')')[0] if '(' in stripped else ""
+        return f"FUNCTION {func_name}({params}):"
+    if stripped.startswith('if '):
+        return f"IF {stripped.split('if ')[1].split(':')[0]} THEN"
+    if stripped.startswith('elif '):
+        return f"ELSE IF {stripped.split('elif ')[1].split(':')[0]} THEN"
+    if stripped.startswith('else:'):
+        return "ELSE"
+    if stripped.startswith('for '):
+        return f"FOR {stripped.split('for ')[1].split(':')[0]} DO"
+    if stripped.startswith('while '):
+        return f"WHILE {stripped.split('while ')[1].split(':')[0]} DO"
+    if stripped.startswith('return '):
+        return f"RETURN {stripped.split('return ')[1]}"
+    if stripped.startswith(('break', 'continue')):
+        return stripped.upper()
+    # Other block headers and regular statements
+    return stripped
+
+def iter_pseudo_code(lines):
+    """Yield pseudo code lines for an iterable of source lines, one at a time."""
+    indents = [""]
+    for depth, stripped in iter_statements(lines):
+        text = translate(stripped)
+        if text is None:
+            continue
+        while depth >= len(indents):
+            indents.append(indents[-1] + "  ")
+        yield indents[depth] + text
+
+def convert(text):
+    """Return the pseudo code for a text as one string."""
+    return "\n".join(iter_pseudo_code(text.split('\n')))
+
+def top_level_chunks(chunks, min_chars=CHUNK_CHARS):
+    """Regroup line-aligned chunks of text into chunks that end just before a top-level line.
+
+    As with the input, joining the output with newlines gives back the text.
+    Every chunk but the last is at least min_chars long, and longer where a
+    top-level definition runs past that.
+    """
+    rest = None
+    for chunk in chunks:
+        text = chunk if rest is None else f"{rest}\n{chunk}"
+        start = 0
+        while True:
+            boundary = _TOP_LEVEL.search(text, start + min_chars)
+            if boundary is None:
+                break
+            yield text[start:boundary.start()]
+            start = boundary.end()
+        rest = text[start:]
+    if rest is not None:
+        yield rest
+
+def iter_converted(chunks, workers=None):
+    """Yield the pseudo code of each top-level chunk of line-aligned chunks, in order.
+
+    The chunks are converted by a process pool when workers > 1, with only a
+    few of them read ahead.
+    """
+    from dev_agent import workspace
+    for pseudo_code in workspace.map_ordered(convert, top_level_chunks(chunks), workers):
+        if pseudo_code:
+            yield pseudo_code
+
+def get_pseudo_code(text, workers=None):
+    """Return the pseudo code for a text, converting a large one in parallel chunks."""
+    if len(text) < PARALLEL_MIN_CHARS:
+        return convert(text)
+    return "\n".join(iter_converted((text,), workers))
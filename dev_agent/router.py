@@ -0,0 +1,194 @@
+"""
+Command Router
+Maps a prompt to the command that answers it, and runs the command's handler.
+
+Each command is registered with the prompt prefixes that select it. The
+prefixes of all commands are compiled into one regular expression shaped
+like a trie (shared prefixes are matched once, and each node tries its
+longer continuations before ending), so classifying a prompt is a single
+match whose cost depends on the prompt's first words, not on the number of
+commands. The longest matching prefix wins, and a space in a prefix matches
+any run of whitespace.
+
+Handlers are registered with the @command decorator where they are
+defined, or as "module:function" names, whose modules are imported on first
+dispatch. Other packages add commands through the "dev_agent.commands"
+entry point group: each entry point is named after the prefix that selects
+it and points at a handler taking a Request. Entry points are only read by
+load_plugins(): scanning them takes longer than starting the agent, so a
+one-shot run must opt in, while the resident agent reads them at startup.
+"""
+
+import importlib
+import os
+import re
+import threading
+
+ENTRY_POINT_GROUP = "dev_agent.commands"
+
+class Request:
+    """What a handler gets: the prompt, the file, the workspace and the request's other fields.
+
+    kind is the command the prompt resolved to, rest the prompt after the
+    matched prefix, and args what the command's parser made of the request.
+    """
+
+    __slots__ = ("command", "file_content", "file_path", "command_type", "workspace_folders", "include_callers",
+                 "data", "kind", "rest", "args")
+
+    def __init__(self, command, file_content="", file_path=None, command_type=None, workspace_folders=None,
+                 include_callers=False, data=None):
+        self.command = command
+        self.file_content = file_content
+        self.file_path = file_path
+        self.command_type = command_type
+        self.workspace_folders = workspace_folders
+        self.include_callers = include_callers
+        self.data = data or {}
+        self.kind = None
+        self.rest = command
+        self.args = None
+
+    @property
+    def folders(self):
+        """The request's workspace folders, or the current directory."""
+        return self.workspace_folders or [os.getcwd()]
+
+class Command:
+    """A registered command: handler is a callable or a "module:function" name."""
+
+    __slots__ = ("kind", "prefixes", "handler", "parse", "typed", "word")
+
+    def __init__(self, kind, prefixes, handler, parse=None, typed=True, word=False):
+        self.kind = kind
+        self.prefixes = tuple(prefixes)
+        self.handler = handler
+        self.parse = parse
+        self.typed = typed
+        self.word = word
+
+    def resolve(self):
+        """Return the handler, importing its module if it was registered by name."""
+        if isinstance(self.handler, str):
+            module_name, _, function_name = self.handler.partition(":")
+            self.handler = getattr(importlib.import_module(module_name), function_name)
+        return self.handler
+
+class Router:
+    """Registered commands, and the matcher compiled from their prefixes.
+
+    A prompt that matches no command resolves to default, which must be
+    registered too.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.commands = {}
+        self._lock = threading.Lock()
+        self._pattern = None
+        # Named group of each trie leaf -> command kind
+        self._leaves = {}
+        # Prefix -> entry point of an installed plugin, once load_plugins() has read them
+        self._plugins = None
+
+    def command(self, kind, *prefixes, parse=None, typed=True, word=False):
+        """Decorator registering a function as the handler of a command; see register()."""
+        def decorate(function):
+            self.register(kind, prefixes, function, parse, typed, word)
+            return function
+        return decorate
+
+    def register(self, kind, prefixes, handler, parse=None, typed=True, word=False):
+        """Register (or replace) a command.
+
+        prefixes select the command from a prompt, case-insensitively; with
+        word, a prefix must end at a word boundary. parse(request) builds
+        request.args before the handler runs. A typed command is also
+        selected by a request's command_type.
+        """
+        with self._lock:
+            self.commands[kind] = Command(kind, prefixes, handler, parse, typed, word)
+            self._pattern = None
+
+    def classify(self, command, command_type=None):
+        """Return the kind of command a prompt (or its command_type) resolves to."""
+        return self._match(command, command_type)[0]
+
+    def dispatch(self, request):
+        """Resolve a Request to its command, parse its arguments and return what the handler returns."""
+        kind, end = self._match(request.command, request.command_type)
+        command = self.commands[kind]
+        request.kind = kind
+        if end:
+            request.rest = request.command.lstrip()[end:].strip()
+        if command.parse is not None:
+            request.args = command.parse(request)
+        return command.resolve()(request)
+
+    def _match(self, command, command_type):
+        """Return (kind, end of the matched prefix in the left-stripped prompt, or 0)."""
+        if command_type is not None:
+            typed = self.commands.get(command_type)
+            if typed is not None and typed.typed:
+                return command_type, 0
+        prompt = command.lstrip().lower()
+        match = self._compiled().match(prompt)
+        if match is not None:
+            return self._leaves[match.lastgroup], match.end()
+        return self.default, 0
+
+    def _compiled(self):
+        pattern = self._pattern
+        if pattern is None:
+            with self._lock:
+                trie = {}
+                self._leaves = {}
+                for command in self.commands.values():
+                    for prefix in command.prefixes:
+                        node = trie
+                        for char in prefix.lower():
+                            node = node.setdefault(char, {})
+                        name = f"c{len(self._leaves)}"
+                        self._leaves[name] = command.kind
+                        # A later registration of the same prefix wins
+                        node[None] = (name, command.word)
+                pattern = self._pattern = re.compile(_trie_pattern(trie) or "(?!)")
+        return pattern
+
+    def load_plugins(self):
+        """Register the commands of installed plugins, once; return whether there were any.
+
+        Built-in commands keep their prefixes: a plugin only adds new ones.
+        """
+        with self._lock:
+            if self._plugins is not None:
+                return bool(self._plugins)
+            self._plugins = {}
+            for entry_point in _entry_points():
+                self._plugins[entry_point.name] = entry_point
+        for prefix, entry_point in self._plugins.items():
+            kind = prefix.strip().lower()
+            if kind not in self.commands:
+                self.register(kind, (prefix,), entry_point.value)
+        return bool(self._plugins)
+
+def _trie_pattern(node):
+    """Regex source matching the keys of a trie; a leaf is an empty named group."""
+    branches = []
+    for char, child in sorted((char, child) for char, child in node.items() if char is not None):
+        branches.append((r"\s+" if char == " " else re.escape(char)) + _trie_pattern(child))
+    if None in node:
+        name, word = node[None]
+        # Tried last, so that a longer prefix wins
+        branches.append((r"\b" if word else "") + f"(?P<{name}>)")
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+def _entry_points():
+    from importlib import metadata
+    try:
+        return metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10: entry_points() takes no arguments and returns a dict of groups
+        return metadata.entry_points().get(ENTRY_POINT_GROUP, ())
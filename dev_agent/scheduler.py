@@ -0,0 +1,149 @@
+"""
+Priority Scheduler
+Hands queued jobs of the resident agent to workers by priority class.
+
+Classes, most urgent first:
+  interactive - chat commands a user is waiting for
+  prefetch    - speculative analysis of files the user is likely to ask about
+  batch       - workflows, workspace-wide summaries and index rebuilds
+
+Each class has its own bounded FIFO queue (admission control: a full queue
+rejects new work instead of growing without limit) and a worker quota. One
+worker is kept free of background work so that an interactive request never
+waits behind a long batch job. Waiting background jobs age: every
+aging_seconds a job has waited counts as one class more urgent, so batch
+work keeps moving while interactive traffic is heavy.
+"""
+
+import threading
+import time
+from collections import deque
+
+from dev_agent import metrics
+
+PRIORITY_CLASSES = ("interactive", "prefetch", "batch")
+DEFAULT_MAX_QUEUED = 1024
+DEFAULT_AGING_SECONDS = 5.0
+
+class Overloaded(Exception):
+    """Raised by Scheduler.put() when the class's queue is full."""
+
+def default_quotas(workers):
+    """Return per-class worker limits for a pool of this size."""
+    background = max(1, workers - 1)
+    return {
+        "interactive": workers,
+        "prefetch": background,
+        "batch": max(1, (background + 1) // 2),
+    }
+
+class _Entry:
+    __slots__ = ("item", "priority", "enqueued")
+
+    def __init__(self, item, priority):
+        self.item = item
+        self.priority = priority
+        self.enqueued = time.monotonic()
+
+class Scheduler:
+    """Thread-safe priority queue with per-class quotas and aging.
+
+    Workers call get(), which blocks until a job may run and returns
+    (priority class, item), then call done(priority class) when it finishes.
+    """
+
+    def __init__(self, workers, quotas=None, max_queued=None, aging_seconds=DEFAULT_AGING_SECONDS):
+        self.workers = workers
+        self.quotas = dict(default_quotas(workers), **(quotas or {}))
+        self.max_queued = {priority: DEFAULT_MAX_QUEUED for priority in PRIORITY_CLASSES}
+        self.max_queued.update(max_queued or {})
+        self.aging_seconds = aging_seconds
+        # Background work may not take the last idle worker
+        self.reserved = 1 if workers > 1 else 0
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._closed = False
+        self._condition = threading.Condition()
+        for priority in PRIORITY_CLASSES:
+            metrics.QUEUE_DEPTH.labels(priority).set_function(lambda priority=priority: len(self._queues[priority]))
+            metrics.WORKERS_BUSY.labels(priority).set_function(lambda priority=priority: self._running[priority])
+
+    def put(self, item, priority="interactive"):
+        """Queue item in its priority class; raise Overloaded if that queue is full."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._condition:
+            queue = self._queues[priority]
+            if len(queue) >= self.max_queued[priority]:
+                raise Overloaded(f"{priority} queue is full ({len(queue)} requests waiting)")
+            queue.append(_Entry(item, priority))
+            self._condition.notify()
+
+    def promote(self, item, priority):
+        """Move a still-queued item to a more urgent class; return whether it was found."""
+        with self._condition:
+            for queue in self._queues.values():
+                for entry in queue:
+                    if entry.item is item:
+                        if PRIORITY_CLASSES.index(priority) >= PRIORITY_CLASSES.index(entry.priority):
+                            return True
+                        queue.remove(entry)
+                        entry.priority = priority
+                        target = self._queues[priority]
+                        # Keep the target queue ordered by arrival
+                        index = len(target)
+                        while index > 0 and target[index - 1].enqueued > entry.enqueued:
+                            index -= 1
+                        target.insert(index, entry)
+                        self._condition.notify()
+                        return True
+        return False
+
+    def get(self):
+        """Block until a job may run and return (priority class, item), or None once closed."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                entry = self._select()
+                if entry is not None:
+                    break
+                self._condition.wait()
+            self._queues[entry.priority].popleft()
+            self._running[entry.priority] += 1
+        metrics.QUEUE_WAIT.labels(entry.priority).observe(time.monotonic() - entry.enqueued)
+        return entry.priority, entry.item
+
+    def done(self, priority):
+        """Release the worker slot taken by a job of this class."""
+        with self._condition:
+            self._running[priority] -= 1
+            self._condition.notify_all()
+
+    def close(self):
+        """Wake all workers; get() returns None from now on."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def depth(self, priority=None):
+        if priority is not None:
+            return len(self._queues[priority])
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _select(self):
+        """Return the head entry with the best aged rank among classes within quota."""
+        now = time.monotonic()
+        busy = sum(self._running.values())
+        best, best_rank = None, None
+        for rank, priority in enumerate(PRIORITY_CLASSES):
+            queue = self._queues[priority]
+            if not queue or self._running[priority] >= self.quotas[priority]:
+                continue
+            if priority != "interactive" and busy >= self.workers - self.reserved:
+                continue
+            entry = queue[0]
+            aged_rank = rank - (now - entry.enqueued) / self.aging_seconds
+            if best_rank is None or aged_rank < best_rank:
+                best, best_rank = entry, aged_rank
+        return best
@@ -0,0 +1,176 @@
+"""
+Response Sections
+Typed, addressable pieces of an agent response and their markdown rendering.
+
+Every command handler is a generator of sections, in the order they are
+computed, instead of one f-string. A client can receive them as they are
+produced (iter_frames), collected as JSON with stable ids and byte sizes
+(Response.to_dict), or as the classic markdown document, which is rendered
+from the same sections.
+"""
+
+import json
+
+SECTION_TYPES = ("heading", "text", "list", "code", "table")
+
+class Section:
+    """One block of a response: a heading, paragraph, list, code block or table."""
+
+    __slots__ = ("id", "type", "text", "level", "items", "language", "header", "rows", "_markdown")
+
+    def __init__(self, id, type, text=None, level=None, items=None, language=None, header=None, rows=None):
+        if type not in SECTION_TYPES:
+            raise ValueError(f"Unknown section type: {type}")
+        self.id = id
+        self.type = type
+        self.text = text
+        self.level = level
+        self.items = items
+        self.language = language
+        self.header = header
+        self.rows = rows
+        self._markdown = None
+
+    def to_markdown(self):
+        """Render this section on its own, without surrounding blank lines."""
+        if self._markdown is None:
+            if self.type == "heading":
+                self._markdown = f"{'#' * self.level} {self.text}"
+            elif self.type == "list":
+                self._markdown = "\n".join(f"- {item}" for item in self.items)
+            elif self.type == "code":
+                self._markdown = f"```{self.language or ''}\n{self.text}\n```"
+            elif self.type == "table":
+                lines = ["| " + " | ".join(str(cell) for cell in self.header) + " |",
+                         "|" + "|".join(" --- " for _ in self.header) + "|"]
+                lines.extend("| " + " | ".join(str(cell) for cell in row) + " |" for row in self.rows)
+                self._markdown = "\n".join(lines)
+            else:
+                self._markdown = self.text
+        return self._markdown
+
+    @property
+    def byte_size(self):
+        return len(self.to_markdown().encode("utf-8", "surrogatepass"))
+
+    def to_dict(self):
+        """Return the JSON form of this section, including its markdown size in bytes."""
+        data = {"id": self.id, "type": self.type}
+        if self.type == "heading":
+            data["level"] = self.level
+            data["text"] = self.text
+        elif self.type == "list":
+            data["items"] = self.items
+        elif self.type == "code":
+            data["language"] = self.language or ""
+            data["text"] = self.text
+        elif self.type == "table":
+            data["header"] = self.header
+            data["rows"] = self.rows
+        else:
+            data["text"] = self.text
+        data["bytes"] = self.byte_size
+        return data
+
+def separator_after(section):
+    """Return the whitespace that follows a section in the markdown document.
+
+    A sub-heading is directly followed by its body; everything else, including
+    the document title, is followed by a blank line.
+    """
+    return "\n" if section.type == "heading" and section.level > 1 else "\n\n"
+
+def render_markdown(sections):
+    """Render sections as the markdown document the agent has always printed."""
+    parts = ["\n"]
+    for section in sections:
+        parts.append(section.to_markdown())
+        parts.append(separator_after(section))
+    if len(parts) > 1:
+        parts[-1] = "\n"
+    return "".join(parts)
+
+class Progress:
+    """Interim state of a long-running handler, e.g. partial totals.
+
+    Handlers may yield these between sections. Streaming clients receive
+    them as "progress" frames; they are not part of the response itself.
+    """
+
+    __slots__ = ("id", "data")
+
+    def __init__(self, id, data):
+        self.id = id
+        self.data = data
+
+    def to_dict(self):
+        return dict(self.data, id=self.id)
+
+def iter_frames(sections):
+    """Yield one JSON-ready frame per section as it is produced, then a "done" frame.
+
+    Each frame carries the section and the markdown it adds to the document,
+    so concatenating the "markdown" of all frames gives render_markdown().
+    Progress items become "progress" frames, which add no markdown.
+    """
+    separator = "\n"
+    count = 0
+    for section in sections:
+        if isinstance(section, Progress):
+            yield {"event": "progress", "progress": section.to_dict()}
+            continue
+        yield {"event": "section", "seq": count, "section": section.to_dict(),
+               "markdown": separator + section.to_markdown()}
+        separator = separator_after(section)
+        count += 1
+    yield {"event": "done", "sections": count, "markdown": "\n"}
+
+def heading(id, text, level=2):
+    return Section(id, "heading", text=text, level=level)
+
+def paragraph(id, text):
+    return Section(id, "text", text=text)
+
+def bullet_list(id, items):
+    return Section(id, "list", items=list(items))
+
+def code_block(id, text, language=""):
+    return Section(id, "code", text=text, language=language)
+
+def table(id, header, rows):
+    return Section(id, "table", header=list(header), rows=[list(row) for row in rows])
+
+def helper_output(id, markdown):
+    """Wrap helper output: a list section if every line is a `- ` bullet, else text."""
+    lines = markdown.split("\n")
+    if lines and all(line.startswith("- ") for line in lines):
+        return bullet_list(id, (line[2:] for line in lines))
+    return paragraph(id, markdown)
+
+def subsection(id, title, markdown):
+    """Yield a level-2 heading (id "<id>-heading") followed by helper output."""
+    yield heading(f"{id}-heading", title)
+    yield helper_output(id, markdown)
+
+class Response:
+    """Ordered sections of one agent response."""
+
+    def __init__(self, sections=()):
+        self.sections = [section for section in sections if not isinstance(section, Progress)]
+
+    def add(self, section):
+        self.sections.append(section)
+        return section
+
+    def to_markdown(self):
+        return render_markdown(self.sections)
+
+    def to_dict(self, include_markdown=False):
+        """Return the structured response, optionally with the markdown rendering."""
+        data = {"format": "sections", "sections": [section.to_dict() for section in self.sections]}
+        if include_markdown:
+            data["markdown"] = self.to_markdown()
+        return data
+
+    def to_json(self, include_markdown=False):
+        return json.dumps(self.to_dict(include_markdown), separators=(",", ":"))
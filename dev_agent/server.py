@@ -0,0 +1,503 @@
+"""
+Resident Agent Server
+Keeps agent_v2.py running and answers requests over a Unix socket or a local TCP port.
+
+Protocol: each line sent by a client is one JSON request in the same format
+as the --input-file JSON, optionally with an "id". Each request is answered
+with one JSON line: {"id": ..., "status": "ok" | "error" | "timeout" | "cancelled" | "rejected",
+"response": "<markdown>" | {sections}, "cached": bool, "coalesced": bool}, where the
+response is a sections object when the request asked for
+"response_format": "sections". A connection may send any number
+of requests; they are answered in order.
+
+A connection whose first byte is 0 speaks the framed protocol of
+dev_agent.ipc instead: requests and replies are the same dicts, sent as
+length-prefixed frames with file contents and responses as raw segments.
+Framed requests are multiplexed: each is answered as soon as it is done,
+so replies may come out of order and are matched to requests by "id".
+A framed request with "compress": true gets the long fields of its reply
+deflated.
+
+A request may carry a "timeout" (seconds) or "deadline" (Unix time); the
+server's --request-timeout caps both. Once it passes, or once another
+connection sends {"cancel": <id>}, the request is answered immediately and
+its worker is released at its next cancellation check, killing any child
+process it is waiting on.
+
+Identical requests (same fingerprint) that arrive while one is still queued
+or running are attached to it rather than run again ("coalesced"); the
+computation is only cancelled once every caller waiting for it has gone.
+
+Requests are scheduled by "priority": "interactive" (the default),
+"prefetch" or "batch" (the default for workflows); see dev_agent.scheduler.
+A request whose class queue is full is answered with status "rejected".
+
+{"prefetch": {"file_path": ..., "file_content"?: ..., "commands"?: [...]}}
+is a hint that the user is likely to ask about a file soon: it is answered
+at once, and the default responses for that file are computed at prefetch
+priority and cached within a separate speculative budget.
+
+Requests of one chat conversation may share a "session_id"; the agent
+keeps their files and analyses between turns (see dev_agent.sessions).
+
+With a file watcher (see dev_agent.watcher), the server watches the
+"workspace_folders" of the requests it receives. When files change, the
+requests expand_changes(paths, rescan) returns (incremental index updates)
+are queued at batch priority, and the default responses of recently
+requested files that changed are computed again, as for a prefetch.
+"""
+
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from socketserver import StreamRequestHandler, ThreadingMixIn, ThreadingTCPServer, UnixStreamServer
+
+from dev_agent import deadline, metrics
+from dev_agent.cache import ResultCache
+from dev_agent.scheduler import DEFAULT_AGING_SECONDS, PRIORITY_CLASSES, Overloaded, Scheduler
+from dev_agent.watcher import Watcher
+
+# Priority class of requests that do not ask for one, by command kind
+DEFAULT_PRIORITIES = {"workflow": "batch", "workspace": "batch", "duplicates": "batch", "reindex": "batch"}
+# Files whose responses are recomputed when they change
+RECENT_FILES = 64
+
+def request_priority(request, kind):
+    """Return the request's "priority" if it names a class, else the default for its kind."""
+    priority = request.get("priority")
+    if priority in PRIORITY_CLASSES:
+        return priority
+    return DEFAULT_PRIORITIES.get(kind, "interactive")
+
+class _Waiter:
+    """One caller waiting for a job, with its own deadline."""
+
+    __slots__ = ("token", "event")
+
+    def __init__(self, token):
+        self.token = token
+        self.event = threading.Event()
+
+class _Job:
+    """A request waiting for, or being processed by, a worker.
+
+    Identical requests that arrive while it is pending or running are
+    attached as additional waiters instead of being queued again.
+    """
+
+    __slots__ = ("request", "kind", "key", "token", "done", "response", "error", "waiters", "speculative")
+
+    def __init__(self, request, kind, key, token, speculative=False):
+        self.request = request
+        self.kind = kind
+        self.key = key
+        self.token = token
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.waiters = []
+        # Prefetched with nobody asking (yet): cached within the speculative budget
+        self.speculative = speculative
+
+class AgentServer:
+    """Worker pool, result cache and metrics around an agent request handler.
+
+    handler(request) returns the response for a request dict: a markdown
+    string or a JSON-ready sections dict.
+    describe(request) returns (command kind, request fingerprint or None).
+    The fingerprint keys both the result cache and the table of in-flight
+    jobs, so a request identical to one still being computed shares its
+    result; requests with no fingerprint (e.g. code execution) are always
+    run on their own and never cached.
+    expand_prefetch(hint), if given, returns the requests a prefetch hint
+    stands for; they are run at prefetch priority and cached speculatively.
+    expand_changes(paths, rescan), if given, returns the requests that
+    bring indexes up to date after files changed; see files_changed().
+    prepare(request), if given, returns the request to answer in place of
+    one a client sent (e.g. with the file of its chat session filled in);
+    it runs before describe().
+    """
+
+    def __init__(self, handler, describe, workers=4, cache=None, request_timeout=None,
+                 quotas=None, max_queued=None, aging_seconds=DEFAULT_AGING_SECONDS, expand_prefetch=None,
+                 expand_changes=None, prepare=None):
+        self.handler = handler
+        self.describe = describe
+        self.prepare = prepare
+        self.expand_prefetch = expand_prefetch
+        self.expand_changes = expand_changes
+        self.watcher = None
+        self._recent_files = OrderedDict()
+        self.cache = cache if cache is not None else ResultCache()
+        self.request_timeout = request_timeout
+        self._scheduler = Scheduler(workers, quotas, max_queued, aging_seconds)
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        self._worker_count = workers
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the worker threads and the supervisor that restarts them."""
+        for index in range(self._worker_count):
+            self._workers.append(self._spawn_worker(index))
+        threading.Thread(target=self._supervise, name="agent-supervisor", daemon=True).start()
+
+    def stop(self):
+        self._stopping.set()
+        self._scheduler.close()
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    def watch(self, watcher):
+        """Start a watcher that reports changed files to files_changed()."""
+        self.watcher = watcher
+        watcher.start()
+
+    def _spawn_worker(self, index):
+        worker = threading.Thread(target=self._work, name=f"agent-worker-{index}", daemon=True)
+        worker.start()
+        return worker
+
+    def _supervise(self):
+        while not self._stopping.wait(1.0):
+            for index, worker in enumerate(self._workers):
+                if not worker.is_alive():
+                    metrics.WORKER_RESTARTS.inc()
+                    self._workers[index] = self._spawn_worker(index)
+
+    def _work(self):
+        while True:
+            ticket = self._scheduler.get()
+            if ticket is None:
+                return
+            priority, job = ticket
+            try:
+                # Expired or cancelled while queued: nobody is waiting any more
+                if not job.token.cancelled:
+                    with deadline.activate(job.token):
+                        job.response = self.handler(job.request)
+            except deadline.Cancelled:
+                pass
+            except Exception:
+                job.error = traceback.format_exc()
+            finally:
+                self._finish(job)
+                self._scheduler.done(priority)
+
+    def _finish(self, job):
+        """Publish a job's result to the cache and wake everyone waiting for it."""
+        if job.key is not None and job.response is not None:
+            self.cache.put(job.key, job.response, speculative=job.speculative)
+        with self._lock:
+            job.done.set()
+            if job.key is not None and self._pending.get(job.key) is job:
+                del self._pending[job.key]
+            waiters = list(job.waiters)
+        for waiter in waiters:
+            waiter.event.set()
+
+    def _join(self, request, kind, key, priority, waiter):
+        """Attach waiter to an identical in-flight job, or queue a new one.
+
+        waiter is None for a prefetch, which only queues a job if there is
+        none yet. Returns (job, coalesced); raises Overloaded if the job's
+        class is full.
+        """
+        with self._lock:
+            job = self._pending.get(key) if key is not None else None
+            if job is not None:
+                if waiter is not None:
+                    job.waiters.append(waiter)
+                    job.token.extend(waiter.token)
+                    job.speculative = False
+                    # An interactive caller must not wait in the batch or prefetch queue
+                    self._scheduler.promote(job, priority)
+                return job, True
+            job = _Job(request, kind, key, deadline.CancelToken.from_request(request, self.request_timeout),
+                       speculative=waiter is None)
+            self._scheduler.put(job, priority)
+            if waiter is not None:
+                job.waiters.append(waiter)
+            if key is not None:
+                self._pending[key] = job
+        return job, False
+
+    def _leave(self, job, waiter):
+        """Detach waiter; cancel the job once nobody is waiting for it any more."""
+        with self._lock:
+            job.waiters.remove(waiter)
+            abandoned = not job.waiters and not job.done.is_set()
+            if abandoned and job.key is not None and self._pending.get(job.key) is job:
+                del self._pending[job.key]
+        if abandoned:
+            job.token.cancel(waiter.token.reason or "cancelled")
+
+    def submit(self, request):
+        """Answer one request dict and return the response dict."""
+        started = time.perf_counter()
+        request_id = request.get("id")
+        if self.prepare is not None:
+            request = self.prepare(request)
+        kind, key = self.describe(request)
+        self._observe(request.get("file_path"), request.get("workspace_folders"))
+        status = "ok"
+        cached = coalesced = False
+
+        response, prefetched = self.cache.lookup(key) if key is not None else (None, False)
+        if key is not None:
+            metrics.CACHE_LOOKUPS.labels("hit" if response is not None else "miss").inc()
+        if prefetched:
+            metrics.PREFETCH_HITS.inc()
+
+        if response is not None:
+            cached = True
+        else:
+            waiter = _Waiter(deadline.CancelToken.from_request(request, self.request_timeout))
+            try:
+                job, coalesced = self._join(request, kind, key, request_priority(request, kind), waiter)
+            except Overloaded as e:
+                metrics.REQUESTS.labels(kind, "rejected").inc()
+                return {"id": request_id, "status": "rejected", "response": f"Error: server busy, {str(e)}",
+                        "cached": False, "coalesced": False}
+            if coalesced:
+                metrics.COALESCED_REQUESTS.labels(kind).inc()
+            self._track(request_id, waiter)
+            try:
+                if not waiter.event.wait(waiter.token.remaining()):
+                    waiter.token.cancel("deadline exceeded")
+            finally:
+                self._untrack(request_id, waiter)
+                self._leave(job, waiter)
+            if not job.done.is_set() or (job.response is None and job.error is None):
+                if waiter.token.timed_out or job.token.timed_out:
+                    metrics.EXECUTION_TIMEOUTS.inc()
+                    status = "timeout"
+                    response = "Error: request deadline exceeded"
+                else:
+                    status = "cancelled"
+                    response = "Error: request cancelled"
+            elif job.error is not None:
+                status = "error"
+                response = f"Error processing input: {job.error}"
+            else:
+                response = job.response
+
+        metrics.REQUESTS.labels(kind, status).inc()
+        metrics.REQUEST_LATENCY.labels(kind).observe(time.perf_counter() - started)
+        return {"id": request_id, "status": status, "response": response, "cached": cached, "coalesced": coalesced}
+
+    def prefetch(self, hint):
+        """Queue the requests a prefetch hint stands for; return how many were queued.
+
+        Requests already cached or in flight are skipped, and a full prefetch
+        queue simply drops the rest.
+        """
+        if self.expand_prefetch is None:
+            return 0
+        self._observe(hint.get("file_path"))
+        queued = 0
+        for request in self.expand_prefetch(hint):
+            kind, key = self.describe(request)
+            if key is None or key in self.cache:
+                metrics.PREFETCHES.labels("cached").inc()
+                continue
+            try:
+                _, coalesced = self._join(request, kind, key, "prefetch", None)
+            except Overloaded:
+                metrics.PREFETCHES.labels("rejected").inc()
+                break
+            metrics.PREFETCHES.labels("in_flight" if coalesced else "queued").inc()
+            queued += 0 if coalesced else 1
+        return queued
+
+    def _observe(self, file_path, folders=None):
+        """Remember a requested file, and watch the request's workspace folders."""
+        if isinstance(file_path, str) and file_path:
+            path = os.path.abspath(file_path)
+            with self._lock:
+                self._recent_files[path] = True
+                self._recent_files.move_to_end(path)
+                while len(self._recent_files) > RECENT_FILES:
+                    self._recent_files.popitem(last=False)
+        if self.watcher is not None and isinstance(folders, list):
+            for folder in folders:
+                if isinstance(folder, str) and os.path.isdir(folder):
+                    self.watcher.watch(folder)
+
+    def files_changed(self, paths, rescan=()):
+        """Queue the work that brings derived data up to date after files changed.
+
+        Called by the watcher, with debounced changes. Index updates run at
+        batch priority (in the watcher's thread when the batch queue is
+        full, so that no change is lost); changed files the user asked about
+        recently get their default responses computed again, at prefetch
+        priority.
+        """
+        requests = self.expand_changes(paths, rescan) if self.expand_changes is not None else []
+        for request in requests:
+            kind, key = self.describe(request)
+            try:
+                self._join(request, kind, key, "batch", None)
+            except Overloaded:
+                self.handler(request)
+        with self._lock:
+            recent = [path for path in paths if path in self._recent_files]
+        for path in recent:
+            if os.path.isfile(path):
+                self.prefetch({"file_path": path})
+
+    def cancel(self, request_id):
+        """Cancel the in-flight request with this id; return whether there was one.
+
+        The computation itself is cancelled only if no identical request is
+        still waiting for it.
+        """
+        with self._lock:
+            waiter = self._inflight.get(request_id)
+        if waiter is None:
+            return False
+        waiter.token.cancel()
+        waiter.event.set()
+        return True
+
+    def _track(self, request_id, waiter):
+        if request_id is not None:
+            with self._lock:
+                self._inflight[request_id] = waiter
+
+    def _untrack(self, request_id, waiter):
+        if request_id is not None:
+            with self._lock:
+                if self._inflight.get(request_id) is waiter:
+                    del self._inflight[request_id]
+
+class _RequestHandler(StreamRequestHandler):
+    agent = None
+
+    def handle(self):
+        # A frame starts with a 0 byte (see dev_agent.ipc), a JSON line never does
+        if self.rfile.peek(1)[:1] == b"\0":
+            self.handle_frames()
+            return
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                reply = _parse_error(e)
+            else:
+                reply = self.reply(request)
+            self.wfile.write(json.dumps(reply, separators=(",", ":")).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+    def handle_frames(self):
+        """Answer framed requests, each in its own thread, writing each reply as soon as it is ready."""
+        from dev_agent import ipc
+        write_lock = threading.Lock()
+        threads = []
+
+        def answer(request):
+            reply = self.reply(request)
+            compress_min = ipc.COMPRESS_MIN_BYTES if request.get("compress") else None
+            try:
+                with write_lock:
+                    ipc.write_frame(self.wfile, reply, compress_min)
+            except OSError:
+                pass  # the client has gone
+
+        while True:
+            try:
+                request = ipc.read_frame(self.rfile)
+            except ipc.FramingError as e:
+                # The stream cannot be resynchronized after a bad frame
+                with write_lock:
+                    ipc.write_frame(self.wfile, _parse_error(e))
+                break
+            if request is None:
+                break
+            if "prefetch" in request or "cancel" in request:
+                answer(request)
+                continue
+            thread = threading.Thread(target=answer, args=(request,), name="agent-connection", daemon=True)
+            thread.start()
+            threads = [thread for thread in threads if thread.is_alive()]
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    def reply(self, request):
+        """Return the reply dict for a request, prefetch hint or cancellation."""
+        if "prefetch" in request:
+            queued = self.agent.prefetch(request["prefetch"])
+            return {"id": request.get("id"), "status": "ok", "response": f"Prefetching {queued} responses",
+                    "cached": False, "coalesced": False}
+        if "cancel" in request:
+            found = self.agent.cancel(request["cancel"])
+            return {"id": request["cancel"], "status": "ok" if found else "error",
+                    "response": "Cancelled" if found else "Error: no such request in flight",
+                    "cached": False, "coalesced": False}
+        return self.agent.submit(request)
+
+def _parse_error(error):
+    return {"id": None, "status": "error", "response": f"Error parsing request: {str(error)}",
+            "cached": False, "coalesced": False}
+
+class _UnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(handler, describe, socket_path=None, port=None, workers=4, request_timeout=None,
+          cache_entries=256, cache_bytes=64 * 1024 * 1024, metrics_port=None, metrics_socket=None,
+          quotas=None, max_queued=None, aging_seconds=DEFAULT_AGING_SECONDS, expand_prefetch=None,
+          prefetch_bytes=16 * 1024 * 1024, expand_changes=None, watch=True, watch_polling=False, verbose=False,
+          prepare=None):
+    """Run the resident agent until interrupted."""
+    agent = AgentServer(handler, describe, workers=workers,
+                        cache=ResultCache(cache_entries, cache_bytes, prefetch_bytes), request_timeout=request_timeout,
+                        quotas=quotas, max_queued=max_queued, aging_seconds=aging_seconds,
+                        expand_prefetch=expand_prefetch, expand_changes=expand_changes, prepare=prepare)
+    agent.start()
+    if watch:
+        agent.watch(Watcher(agent.files_changed, polling=watch_polling))
+    request_handler = type("RequestHandler", (_RequestHandler,), {"agent": agent})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixServer(socket_path, request_handler)
+        address = socket_path
+    else:
+        server = _TCPServer(("127.0.0.1", port or 0), request_handler)
+        address = "%s:%d" % server.server_address
+
+    if metrics_port is not None or metrics_socket:
+        metrics.start_metrics_server(port=metrics_port, socket_path=metrics_socket)
+    metrics.install_snapshot_signal()
+    # shutdown() blocks until serve_forever() returns, so it cannot run in the
+    # signal handler on the serving thread itself
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+    if verbose:
+        print(f"Dev Agent server listening on {address} with {workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.stop()
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,225 @@
+"""
+Chat Sessions
+State the resident server keeps between the turns of one chat conversation,
+so that follow-up questions about a file reuse the work done for earlier ones.
+
+A request names its conversation with "session_id". The session holds the
+files the conversation has sent, keyed by a hash of their content, with the
+results of the analysis helpers already run on each, and its most recent
+responses. Helpers wrapped with reuse() return the stored result when they
+are called, in the thread of a request of the session, on the exact string
+object the session holds for a file: the agent swaps the content of each
+request for that object, so a follow-up turn about the same file skips
+every analysis an earlier turn ran.
+
+Each session has a memory cap (content, analysis results and responses,
+counted in characters); beyond it the least recently used files are
+dropped, then the oldest responses. Sessions idle for longer than
+idle_seconds are dropped, as are the least recently used ones beyond
+max_sessions.
+"""
+
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+DEFAULT_MAX_SESSIONS = 64
+DEFAULT_SESSION_BYTES = 32 * 1024 * 1024
+DEFAULT_IDLE_SECONDS = 30 * 60
+RECENT_RESPONSES = 8
+
+class SessionFile:
+    """A file a session has seen: its content, path and analysis results."""
+
+    __slots__ = ("digest", "content", "path", "analyses")
+
+    def __init__(self, digest, content, path):
+        self.digest = digest
+        self.content = content
+        self.path = path
+        # (helper name, arguments after the content) -> result
+        self.analyses = {}
+
+class Session:
+    """The files, analyses and recent responses of one chat conversation."""
+
+    def __init__(self, session_id, max_bytes=DEFAULT_SESSION_BYTES):
+        self.session_id = session_id
+        self.max_bytes = max_bytes
+        self.last_used = time.monotonic()
+        # Content hash -> SessionFile, least recently used first
+        self.files = OrderedDict()
+        # (response key, response, size), oldest first
+        self.responses = deque()
+        self.current = None
+        self._by_id = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def add_file(self, content, path=None):
+        """Return the session's SessionFile for a file's content, adding it if new.
+
+        The file becomes the session's current one. Content larger than the
+        session's cap is not kept, and None is returned.
+        """
+        # Imported here: agent_v2 imports this module on startup, and hashlib is slow to load
+        import hashlib
+        digest = hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            file = self.files.get(digest)
+            if file is None:
+                if len(content) > self.max_bytes:
+                    return None
+                file = self.files[digest] = SessionFile(digest, content, path)
+                self._by_id[id(content)] = file
+                self._bytes += len(content)
+                self.current = file
+                self._evict()
+            else:
+                self.files.move_to_end(digest)
+                if path:
+                    file.path = path
+                self.current = file
+            return file
+
+    def current_file(self):
+        """Return the SessionFile the conversation last sent, or None."""
+        with self._lock:
+            return self.current
+
+    def file_of(self, content):
+        """Return the SessionFile holding this very string object, or None."""
+        file = self._by_id.get(id(content))
+        return file if file is not None and file.content is content else None
+
+    def reuse(self, function, args, kwargs):
+        """Return function(*args, **kwargs), computed at most once per session file."""
+        file = self.file_of(args[0]) if args else None
+        if file is None:
+            return function(*args, **kwargs)
+        key = (function.__name__, args[1:], tuple(sorted(kwargs.items())))
+        with self._lock:
+            if key in file.analyses:
+                return file.analyses[key]
+        result = function(*args, **kwargs)
+        with self._lock:
+            if self.files.get(file.digest) is file and key not in file.analyses:
+                file.analyses[key] = result
+                self._bytes += _size(result)
+                self._evict()
+        return result
+
+    def response(self, key):
+        """Return the recent response stored under key, or None."""
+        with self._lock:
+            for stored_key, response, _ in self.responses:
+                if stored_key == key:
+                    return response
+        return None
+
+    def add_response(self, key, response):
+        """Remember a response, dropping the oldest beyond RECENT_RESPONSES."""
+        size = _size(response)
+        with self._lock:
+            self.responses.append((key, response, size))
+            self._bytes += size
+            while len(self.responses) > RECENT_RESPONSES:
+                self._bytes -= self.responses.popleft()[2]
+            self._evict()
+
+    def _evict(self):
+        """Drop the least recently used files, then the oldest responses, until within the cap."""
+        while self._bytes > self.max_bytes and len(self.files) > 1:
+            _, file = self.files.popitem(last=False)
+            self._drop(file)
+        while self._bytes > self.max_bytes and self.responses:
+            self._bytes -= self.responses.popleft()[2]
+        if self._bytes > self.max_bytes and self.files:
+            _, file = self.files.popitem(last=False)
+            self._drop(file)
+
+    def _drop(self, file):
+        self._by_id.pop(id(file.content), None)
+        self._bytes -= len(file.content) + sum(map(_size, file.analyses.values()))
+        if self.current is file:
+            self.current = None
+
+class SessionStore:
+    """Thread-safe map of session ids to Sessions, with idle and count limits."""
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, session_bytes=DEFAULT_SESSION_BYTES,
+                 idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.session_bytes = session_bytes
+        self.idle_seconds = idle_seconds
+        # Session id -> Session, least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id):
+        """Return the session with this id, starting a new one if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, self.session_bytes)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def find(self, session_id):
+        """Return the session with this id, or None; does not start one."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _expire(self, now):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+_local = threading.local()
+
+def current():
+    """Return the session of the request being processed by this thread, or None."""
+    return getattr(_local, "session", None)
+
+@contextmanager
+def activate(session):
+    """Make session the current session of this thread for the duration of the block."""
+    previous = current()
+    _local.session = session
+    try:
+        yield session
+    finally:
+        _local.session = previous
+
+def reuse(func):
+    """Decorator for analysis helpers taking a file's content first: reuse results within a session."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = getattr(_local, "session", None)
+        if session is None:
+            return func(*args, **kwargs)
+        return session.reuse(func, args, kwargs)
+    return wrapper
+
+def _size(value):
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, separators=(",", ":"), default=str))
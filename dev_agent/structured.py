@@ -0,0 +1,675 @@
+"""
+Structured Data Summary
+Schema inference for JSON, JSON Lines and YAML files of any size.
+
+Files are read in chunks and never held in memory whole: JSON Lines records
+are decoded one line at a time, JSON documents by an event scanner (whole
+elements of the top-level array or object are decoded at C speed when they
+fit in the buffer), and YAML through PyYAML's event API. Every value is
+merged into one Schema tree that records, per position, the types seen,
+object keys and how often each is present, array lengths, number ranges and
+a few sample values; its size depends on the number of distinct keys, not on
+the number of records. Past SAMPLE_AFTER records only a thinning sample of
+records is merged (all are still counted), so a multi-gigabyte dump is
+summarized at close to the speed it is read.
+"""
+
+import codecs
+import json
+import os
+import re
+
+from dev_agent import deadline
+
+FORMATS = {".json": "JSON", ".jsonl": "JSON Lines", ".ndjson": "JSON Lines", ".yaml": "YAML", ".yml": "YAML"}
+
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+DEFAULT_BUFFER_BYTES = 16 * 1024 * 1024
+# Records merged in full before sampling starts; the sampling stride then
+# doubles each time the record count does
+SAMPLE_AFTER = 20000
+MAX_SAMPLES = 3
+# Sample values are only looked for among the first values at a position
+SAMPLE_VALUES = 100
+MAX_SAMPLE_CHARS = 60
+# Distinct keys kept per object position; more are counted, not described
+MAX_PROPERTIES = 256
+MAX_DEPTH = 32
+MAX_RENDER_LINES = 200
+MAX_RENDER_DEPTH = 8
+
+_TYPE_NAMES = {dict: "object", list: "array", str: "string", int: "integer", float: "number", bool: "boolean",
+               type(None): "null"}
+# JSON Schema has no separate float type, and an integer is a number
+_JSON_SCHEMA_TYPES = {"object": "object", "array": "array", "string": "string", "integer": "integer",
+                      "number": "number", "boolean": "boolean", "null": "null"}
+
+def format_of(file_path):
+    """Return the structured format of a file by extension ("JSON", "JSON Lines" or "YAML"), or None."""
+    if not file_path:
+        return None
+    return FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+def is_sampled(index):
+    """Whether the record at this index is merged: all of the first SAMPLE_AFTER, then every 2nd, 4th, ..."""
+    if index < SAMPLE_AFTER:
+        return True
+    return index % (1 << (index // SAMPLE_AFTER).bit_length()) == 0
+
+class Schema:
+    """Merged description of every value seen at one position of the data."""
+
+    __slots__ = ("count", "types", "properties", "other_keys", "items", "min_length", "max_length",
+                 "minimum", "maximum", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.types = {}
+        # key -> Schema of its values; a key's count is how many objects had it
+        self.properties = None
+        self.other_keys = 0
+        self.items = None
+        self.min_length = None
+        self.max_length = None
+        self.minimum = None
+        self.maximum = None
+        self.samples = []
+
+    @property
+    def objects(self):
+        return self.types.get("object", 0)
+
+    def property(self, name):
+        """Return the Schema of a key's values, or IGNORED past MAX_PROPERTIES keys."""
+        properties = self.properties
+        if properties is None:
+            properties = self.properties = {}
+        child = properties.get(name)
+        if child is None:
+            if len(properties) >= MAX_PROPERTIES:
+                self.other_keys += 1
+                return IGNORED
+            child = properties[name] = Schema()
+        return child
+
+    def array_items(self):
+        if self.items is None:
+            self.items = Schema()
+        return self.items
+
+    def begin(self, kind):
+        """Count an object or array whose contents follow as events."""
+        self.count += 1
+        self.types[kind] = self.types.get(kind, 0) + 1
+
+    def length(self, length):
+        if self.min_length is None or length < self.min_length:
+            self.min_length = length
+        if self.max_length is None or length > self.max_length:
+            self.max_length = length
+
+    def scalar(self, kind, value):
+        """Count a scalar; value is its Python value, or None if unknown."""
+        self.count += 1
+        self.types[kind] = self.types.get(kind, 0) + 1
+        if value is None:
+            return
+        if kind == "integer" or kind == "number":
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        # Long strings are not kept as samples
+        if len(self.samples) < MAX_SAMPLES and self.count <= SAMPLE_VALUES:
+            self._sample(value)
+
+    def _sample(self, value):
+        # Long strings are not kept as samples
+        if not (isinstance(value, str) and len(value) > MAX_SAMPLE_CHARS):
+            if not any(type(sample) is type(value) and sample == value for sample in self.samples):
+                self.samples.append(value)
+
+    def add(self, value, depth=0):
+        """Merge a decoded Python value (the same as feeding its events, but faster)."""
+        kind = _TYPE_NAMES.get(type(value), "string")
+        self.count += 1
+        types = self.types
+        types[kind] = types.get(kind, 0) + 1
+        if kind == "object":
+            if depth < MAX_DEPTH:
+                properties = self.properties
+                for key, item in value.items():
+                    child = properties.get(key) if properties is not None else None
+                    if child is None:
+                        child = self.property(key)
+                        properties = self.properties
+                    child.add(item, depth + 1)
+        elif kind == "array":
+            self.length(len(value))
+            if depth < MAX_DEPTH and value:
+                items = self.array_items()
+                for item in value:
+                    items.add(item, depth + 1)
+        elif kind == "integer" or kind == "number":
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+            if len(self.samples) < MAX_SAMPLES and self.count <= SAMPLE_VALUES:
+                self._sample(value)
+        elif value is not None and len(self.samples) < MAX_SAMPLES and self.count <= SAMPLE_VALUES:
+            self._sample(value)
+
+class _Ignored(Schema):
+    """Absorbs values past the key or depth limits."""
+
+    __slots__ = ()
+
+    def property(self, name):
+        return self
+
+    def array_items(self):
+        return self
+
+    def begin(self, kind):
+        pass
+
+    def length(self, length):
+        pass
+
+    def scalar(self, kind, value):
+        pass
+
+    def add(self, value, depth=0):
+        pass
+
+IGNORED = _Ignored()
+
+class _Builder:
+    """Merges a stream of parse events into a Schema.
+
+    A frame per open container holds [schema, kind, pending key, length];
+    a scalar in an object frame with no pending key is that object's next key.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.stack = []
+
+    @property
+    def depth(self):
+        return len(self.stack)
+
+    def expects_key(self):
+        return bool(self.stack) and self.stack[-1][1] == "object" and self.stack[-1][2] is None
+
+    def key(self, name):
+        self.stack[-1][2] = name
+
+    def _target(self):
+        if not self.stack:
+            return self.root
+        frame = self.stack[-1]
+        if frame[1] == "object":
+            name, frame[2] = frame[2], None
+            return frame[0].property("" if name is None else name)
+        if frame[1] == "array":
+            frame[3] += 1
+            return frame[0].array_items()
+        return IGNORED
+
+    def start(self, kind):
+        target = self._target()
+        if self.depth >= MAX_DEPTH:
+            target = IGNORED
+        target.begin(kind)
+        self.stack.append([target, kind, None, 0])
+
+    def start_key(self):
+        """Open a container used as an object key (YAML complex keys); its contents are ignored."""
+        self.stack.append([IGNORED, "key", None, 0])
+
+    def end(self):
+        schema, kind, _, length = self.stack.pop()
+        if kind == "array":
+            schema.length(length)
+        elif kind == "key":
+            self.key("<complex key>")
+
+    def scalar(self, kind, value):
+        self._target().scalar(kind, value)
+
+    def value(self, value, merge=True):
+        """Merge a whole decoded value; with merge False it is only counted as an array element."""
+        target = self._target()
+        if merge:
+            target.add(value, self.depth)
+
+class StructureReport:
+    """Schema and counts of one structured file."""
+
+    def __init__(self, format_name):
+        self.format = format_name
+        self.root = Schema()
+        # Top-level values: JSON Lines lines, YAML documents, JSON documents
+        self.records = 0
+        # Top-level values, and elements of a top-level array, merged into the schema
+        self.merged = 0
+        self.merged_elements = 0
+        self.invalid = 0
+        self.oversized = 0
+        self.bytes = 0
+
+    @property
+    def record_schema(self):
+        """Schema of one record: the elements of a top-level array, else the top-level values."""
+        if self.format == "JSON" and self.records == 1 and set(self.root.types) == {"array"} and self.root.items:
+            return self.root.items
+        return self.root
+
+    @property
+    def record_count(self):
+        if self.record_schema is not self.root:
+            return self.root.max_length or 0
+        return self.records
+
+    @property
+    def merged_records(self):
+        return self.merged_elements if self.record_schema is not self.root else self.merged
+
+# --- Reading ---
+
+def iter_raw_chunks(file_content, file_path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Yield the in-memory content as str slices, or the file as bytes blocks."""
+    if file_content:
+        for start in range(0, len(file_content), chunk_bytes):
+            deadline.check()
+            yield file_content[start:start + chunk_bytes]
+        return
+    with open(file_path, "rb") as f:
+        while True:
+            deadline.check()
+            block = f.read(chunk_bytes)
+            if not block:
+                return
+            yield block
+
+def _sample_positions(start, count):
+    """Yield the offsets in range(count) of the records that are merged, the first being record start."""
+    offset = 0
+    while offset < count:
+        index = start + offset
+        if index < SAMPLE_AFTER:
+            yield offset
+            offset += 1
+            continue
+        stride = 1 << (index // SAMPLE_AFTER).bit_length()
+        offset = -(-index // stride) * stride - start
+        if offset < count:
+            yield offset
+            offset += 1
+
+def scan_json_lines(chunks, report, max_line=DEFAULT_BUFFER_BYTES):
+    """Merge the records of a JSON Lines stream; lines longer than max_line are skipped."""
+    carry = None
+    skipping = False
+    index = 0
+    for chunk in chunks:
+        report.bytes += len(chunk)
+        newline = b"\n" if isinstance(chunk, bytes) else "\n"
+        if skipping:
+            cut = chunk.find(newline)
+            if cut == -1:
+                continue
+            chunk = chunk[cut + 1:]
+            skipping = False
+        data = chunk if carry is None else carry + chunk
+        lines = data.split(newline)
+        carry = lines.pop()
+        if len(carry) > max_line:
+            report.oversized += 1
+            carry = None
+            skipping = True
+        index = _merge_lines(lines, index, report)
+    if carry and carry.strip():
+        _merge_lines([carry], index, report)
+
+def _merge_lines(lines, index, report):
+    if not lines:
+        return index
+    empty, carriage_return = (b"", b"\r") if isinstance(lines[0], bytes) else ("", "\r")
+    report.records += len(lines) - lines.count(empty) - lines.count(carriage_return)
+    for offset in _sample_positions(index, len(lines)):
+        line = lines[offset]
+        if not line.strip():
+            continue
+        try:
+            value = _DECODER.decode(line.decode("utf-8", "replace") if isinstance(line, bytes) else line)
+        except ValueError:
+            report.invalid += 1
+            continue
+        report.root.add(value)
+        report.merged += 1
+    return index + len(lines)
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_SEPARATOR = re.compile(r"[ \t\r\n]*,?[ \t\r\n]*")
+_VALUE_START = frozenset('{["-0123456789tfn')
+_TOKEN = re.compile(r'[ \t\r\n]*(?:([\[\]{}:,])|("(?:[^"\\]|\\.)*")|(-?[0-9][-+0-9.eE]*)|(true|false|null))')
+_LITERALS = {"true": ("boolean", True), "false": ("boolean", False), "null": ("null", None)}
+
+def _string(token):
+    return json.loads(token) if "\\" in token else token[1:-1]
+
+def _number(token):
+    try:
+        return ("number", float(token)) if any(c in token for c in ".eE") else ("integer", int(token))
+    except ValueError:
+        return "number", None
+
+def scan_json(chunks, report, max_buffer=DEFAULT_BUFFER_BYTES):
+    """Merge the values of a JSON document (or of several concatenated ones).
+
+    Tokens are read with a regular expression, so the scanner is lenient
+    about commas and colons. Elements of the top-level array or object are
+    decoded whole with the C decoder when they fit in the buffer; elements
+    of a top-level array past SAMPLE_AFTER are merged only when sampled.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")("replace")
+    chunks = iter(chunks)
+    builder = _Builder(report.root)
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            text = utf8.decode(b"", final=True)
+        else:
+            report.bytes += len(chunk)
+            text = utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        buffer = buffer[position:] + text
+        position = 0
+        if len(buffer) > max_buffer:
+            raise ValueError("a single JSON token is larger than the memory budget")
+
+    def count_value():
+        """Count a top-level value or top-level array element that is about to be merged."""
+        if builder.depth == 0:
+            report.records += 1
+            report.merged += 1
+        elif builder.depth == 1 and builder.stack[-1][1] == "array":
+            report.merged_elements += 1
+
+    def top_level_elements():
+        """Decode and merge elements of the top-level array until one does not fit in the buffer."""
+        nonlocal position
+        frame = builder.stack[-1]
+        items = frame[0].array_items()
+        raw_decode = decoder.raw_decode
+        while True:
+            position = _SEPARATOR.match(buffer, position).end()
+            if not eof and len(buffer) - position < DEFAULT_CHUNK_BYTES:
+                fill()
+                continue
+            if position >= len(buffer) or buffer[position] not in _VALUE_START:
+                return
+            try:
+                value, position = raw_decode(buffer, position)
+            except ValueError:
+                return
+            index = frame[3]
+            frame[3] = index + 1
+            if is_sampled(index):
+                report.merged_elements += 1
+                items.add(value, 1)
+
+    fill()
+    while True:
+        # Whole values at the top two levels are decoded at C speed when they fit
+        depth = builder.depth
+        if depth == 1 and builder.stack[-1][1] == "array":
+            top_level_elements()
+        if (depth == 1 or (depth == 0 and eof)) and not builder.expects_key():
+            position = _WHITESPACE.match(buffer, position).end()
+            if not eof and len(buffer) - position < DEFAULT_CHUNK_BYTES:
+                fill()
+                position = _WHITESPACE.match(buffer, position).end()
+            if position < len(buffer) and buffer[position] in '{["-0123456789tfn':
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    pass
+                else:
+                    top_element = depth == 1 and builder.stack[-1][1] == "array"
+                    merge = not top_element or is_sampled(builder.stack[-1][3])
+                    if merge:
+                        count_value()
+                    builder.value(value, merge)
+                    position = end
+                    continue
+        match = _TOKEN.match(buffer, position)
+        if match is None or (match.end() == len(buffer) and not eof):
+            if eof:
+                if _WHITESPACE.match(buffer, position).end() == len(buffer):
+                    break
+                raise ValueError(f"invalid JSON at character {report.bytes - len(buffer) + position}")
+            fill()
+            continue
+        position = match.end()
+        punctuation, string, number, literal = match.groups()
+        if punctuation:
+            if punctuation in "{[":
+                count_value()
+                builder.start("object" if punctuation == "{" else "array")
+            elif punctuation in "}]":
+                if builder.depth:
+                    builder.end()
+            continue
+        if string is not None and builder.expects_key():
+            builder.key(_string(string))
+            continue
+        count_value()
+        if string is not None:
+            builder.scalar("string", _string(string))
+        elif number is not None:
+            builder.scalar(*_number(number))
+        else:
+            builder.scalar(*_LITERALS[literal])
+    if builder.depth:
+        raise ValueError("the JSON document ends inside an unclosed object or array")
+
+def _yaml_scalar(event, resolver, yaml):
+    """Return (type, value) of a YAML scalar event, resolving plain scalars like the safe loader."""
+    if event.tag and event.tag != "!":
+        tag = event.tag
+    elif event.implicit[0]:
+        tag = resolver.resolve(yaml.ScalarNode, event.value, (True, False))
+    else:
+        return "string", event.value
+    kind = tag.rpartition(":")[2]
+    value = event.value
+    try:
+        if kind == "null":
+            return "null", None
+        if kind == "bool":
+            return "boolean", value.lower() in ("true", "yes", "on", "y")
+        if kind == "int":
+            return "integer", int(value.replace("_", ""), 0)
+        if kind == "float":
+            return "number", float(value.replace("_", ""))
+    except ValueError:
+        return ("integer" if kind == "int" else "number"), None
+    return "string", value
+
+def scan_yaml(stream, report):
+    """Merge the documents of a YAML stream (a file object or a string) using parse events."""
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    resolver = yaml.resolver.Resolver()
+    builder = _Builder(report.root)
+    starts = {yaml.MappingStartEvent: "object", yaml.SequenceStartEvent: "array"}
+    ends = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+    try:
+        for number, event in enumerate(yaml.parse(stream, Loader=loader)):
+            if number % 4096 == 0:
+                deadline.check()
+            event_type = type(event)
+            if event_type in ends:
+                builder.end()
+                continue
+            kind = starts.get(event_type)
+            if kind is None and event_type is not yaml.ScalarEvent and event_type is not yaml.AliasEvent:
+                continue
+            if builder.expects_key():
+                if kind is not None:
+                    builder.start_key()
+                else:
+                    builder.key(event.value if event_type is yaml.ScalarEvent else f"*{event.anchor}")
+                continue
+            if builder.depth == 0:
+                report.records += 1
+            if kind is not None:
+                builder.start(kind)
+            elif event_type is yaml.ScalarEvent:
+                builder.scalar(*_yaml_scalar(event, resolver, yaml))
+            else:
+                builder.scalar("alias", None)
+    except yaml.YAMLError as e:
+        raise ValueError(f"invalid YAML: {e}")
+    report.merged = report.records
+
+def summarize(file_content, file_path, format_name=None, chunk_bytes=DEFAULT_CHUNK_BYTES,
+              max_buffer=DEFAULT_BUFFER_BYTES):
+    """Infer the schema of a JSON, JSON Lines or YAML file; raise ValueError if it cannot be parsed.
+
+    file_content may be empty, in which case the file is streamed from disk.
+    """
+    format_name = format_name or format_of(file_path) or "JSON"
+    report = StructureReport(format_name)
+    if format_name == "YAML":
+        if file_content:
+            report.bytes = len(file_content)
+            scan_yaml(file_content, report)
+        else:
+            report.bytes = os.path.getsize(file_path)
+            with open(file_path, "rb") as f:
+                scan_yaml(f, report)
+    elif format_name == "JSON Lines":
+        scan_json_lines(iter_raw_chunks(file_content, file_path, chunk_bytes), report, max_buffer)
+    else:
+        scan_json(iter_raw_chunks(file_content, file_path, chunk_bytes), report, max_buffer)
+    return report
+
+# --- Rendering ---
+
+def _type_names(schema):
+    return [kind for kind, _ in sorted(schema.types.items(), key=lambda item: -item[1])]
+
+def _samples(schema):
+    if not schema.samples:
+        return ""
+    return ", e.g. " + ", ".join(f"`{json.dumps(sample, ensure_ascii=False)}`" for sample in schema.samples)
+
+def _range(low, high):
+    return f"{low}" if low == high else f"{low}–{high}"
+
+def describe(schema, note=""):
+    """One-line description of the values at a position: types, ranges, a note and samples."""
+    parts = []
+    for kind in _type_names(schema):
+        if kind == "array":
+            items = schema.items
+            if items is None or not items.count:
+                parts.append("array (always empty)")
+            else:
+                items_count = _range(schema.min_length, schema.max_length)
+                parts.append(f"array ({items_count} item{'' if items_count == '1' else 's'}) of "
+                             + " or ".join(_type_names(items)))
+        elif kind in ("integer", "number") and schema.minimum is not None:
+            parts.append(f"{kind} ({_range(schema.minimum, schema.maximum)})")
+        else:
+            parts.append(kind)
+    return " or ".join(parts) + note + _samples(schema)
+
+def _render_children(schema, depth, lines):
+    """Append the lines describing the keys (and array elements) under a position."""
+    if depth > MAX_RENDER_DEPTH:
+        return
+    indent = "  " * depth
+    if schema.properties:
+        objects = schema.objects
+        for name, child in schema.properties.items():
+            if len(lines) >= MAX_RENDER_LINES:
+                return
+            presence = "" if child.count >= objects else f", optional ({child.count / objects:.0%} of objects)"
+            lines.append(f"{indent}- `{name}`: {describe(child, presence)}")
+            _render_children(child, depth + 1, lines)
+        if schema.other_keys:
+            lines.append(f"{indent}- ... and {schema.other_keys} occurrences of other keys (more than {MAX_PROPERTIES} distinct)")
+    items = schema.items
+    if items is not None and (items.properties or (items.items is not None and items.items.count)):
+        lines.append(f"{indent}- `[]` elements: {describe(items)}")
+        _render_children(items, depth + 1, lines)
+
+def render_structure(report):
+    """Markdown outline of a record's keys, types, optionality and samples."""
+    schema = report.record_schema
+    lines = [f"- Record: {describe(schema)}"]
+    _render_children(schema, 1, lines)
+    if len(lines) >= MAX_RENDER_LINES:
+        lines.append(f"- ... (outline cut at {MAX_RENDER_LINES} lines)")
+    return "\n".join(lines)
+
+def render_summary(report, file_name=None):
+    """One paragraph: format, size, record count and the shape of a record."""
+    name = f"`{file_name}` is a" if file_name else "This is a"
+    size = f"{report.bytes / (1024 * 1024):.1f} MB" if report.bytes >= 1024 * 1024 else f"{report.bytes} bytes"
+    schema = report.record_schema
+    if report.format == "JSON" and schema is not report.root:
+        what = f"a top-level array of {report.record_count} record{'' if report.record_count == 1 else 's'}"
+    elif report.format == "JSON Lines":
+        what = f"{report.records} record{'' if report.records == 1 else 's'}"
+    elif report.format == "YAML":
+        what = f"{report.records} document{'' if report.records == 1 else 's'}"
+    else:
+        what = f"{report.records} top-level value{'' if report.records == 1 else 's'}"
+    text = f"{name} {report.format} file of {size} with {what}"
+    if schema.properties:
+        required = sum(1 for child in schema.properties.values() if child.count >= schema.objects)
+        keys = len(schema.properties)
+        text += f"; records have {keys} distinct key{'' if keys == 1 else 's'}, {required} present in every record"
+    text += "."
+    if report.merged_records + report.invalid < report.record_count:
+        text += f" The schema was inferred from a sample of {report.merged_records} records; all records were counted."
+    if report.invalid:
+        text += f" {report.invalid} line{' is' if report.invalid == 1 else 's are'} not valid JSON."
+    if report.oversized:
+        text += f" {report.oversized} line{' was' if report.oversized == 1 else 's were'} longer than the memory budget and skipped."
+    return text
+
+def to_json_schema(schema, root=True):
+    """Return a JSON Schema (draft 2020-12) that the merged values validate against."""
+    result = {"$schema": "https://json-schema.org/draft/2020-12/schema"} if root else {}
+    types = [_JSON_SCHEMA_TYPES[kind] for kind in _type_names(schema) if kind in _JSON_SCHEMA_TYPES]
+    if "integer" in types and "number" in types:
+        types.remove("integer")
+    if "alias" in schema.types or not types:
+        # A YAML alias may stand for anything
+        return result
+    result["type"] = types[0] if len(types) == 1 else types
+    if schema.properties:
+        result["properties"] = {name: to_json_schema(child, False) for name, child in schema.properties.items()}
+        required = [name for name, child in schema.properties.items() if child.count >= schema.objects]
+        if required:
+            result["required"] = required
+    if schema.items is not None and schema.items.count:
+        result["items"] = to_json_schema(schema.items, False)
+    if schema.samples:
+        result["examples"] = list(schema.samples)
+    return result
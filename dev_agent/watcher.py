@@ -0,0 +1,300 @@
+"""
+File Watcher
+Tells the resident agent which files of the workspace folders changed, so
+that indexes are updated one file at a time instead of being rebuilt.
+
+On Linux, directories are watched with inotify (through ctypes); elsewhere,
+or when a folder has more directories than the inotify watch limit allows,
+the folder's file list is polled. Bursts of events, such as an editor's
+save-by-rename or a branch checkout, are debounced: changes are reported
+once no new event has arrived for DEBOUNCE_SECONDS, and at the latest
+MAX_DELAY_SECONDS after the first one.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import traceback
+
+from dev_agent import workspace
+
+DEBOUNCE_SECONDS = 0.2
+MAX_DELAY_SECONDS = 1.0
+# Polling re-lists the folder, so large folders are polled less often
+POLL_SECONDS = 1.0
+POLL_COST_FACTOR = 10
+IDLE_SECONDS = 0.25
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")
+
+class WatchLimit(Exception):
+    """Raised when inotify cannot watch every directory of a folder."""
+
+class _Inotify:
+    """Watches every (not ignored) directory under the added folders."""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> (directory, folder)
+        self.watches = {}
+
+    def add(self, root):
+        """Watch root and the directories that hold its listed files."""
+        directories = {root}
+        for path in workspace.list_files(root):
+            directory = os.path.dirname(path)
+            while directory not in directories and len(directory) > len(root):
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+        added = []
+        try:
+            for directory in directories:
+                added.append(self._add_watch(directory, root))
+        except WatchLimit:
+            for wd in added:
+                self._remove_watch(wd)
+            raise
+
+    def _add_watch(self, directory, root):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOSPC, errno.ENOMEM):
+                raise WatchLimit(f"inotify watch limit reached watching {root}")
+            # Gone already, or not a directory: nothing to watch
+            return None
+        self.watches[wd] = (directory, root)
+        return wd
+
+    def _remove_watch(self, wd):
+        if wd is not None and self.watches.pop(wd, None) is not None:
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def _add_tree(self, directory, root, changed):
+        """Watch a directory that appeared, and report the files already in it."""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            self._add_watch(current, root)
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name in workspace.DEFAULT_EXCLUDES:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    changed.add(entry.path)
+
+    def _remove_tree(self, directory):
+        prefix = os.path.join(directory, "")
+        for wd, (path, _) in list(self.watches.items()):
+            if path == directory or path.startswith(prefix):
+                self._remove_watch(wd)
+
+    def read(self, timeout):
+        """Wait up to timeout seconds for events; return (changed paths, folders to rescan)."""
+        changed = set()
+        rescan = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed, rescan
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost: every folder has to be compared with the disk again
+                    rescan.update(root for _, root in self.watches.values())
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                if wd not in self.watches or not name:
+                    continue
+                directory, root = self.watches[wd]
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if os.path.basename(path) in workspace.DEFAULT_EXCLUDES:
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        try:
+                            self._add_tree(path, root, changed)
+                        except WatchLimit:
+                            rescan.add(root)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._remove_tree(path)
+                        changed.add(path)
+                elif not mask & IN_CREATE:
+                    # A new file is reported when it is closed after writing
+                    changed.add(path)
+        return changed, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+class _Poller:
+    """Compares the size and modification time of every listed file of the added folders."""
+
+    def __init__(self):
+        # folder -> ({path: (mtime_ns, size)}, time of the next poll)
+        self.roots = {}
+
+    def add(self, root):
+        snapshot, elapsed = self._snapshot(root)
+        self.roots[root] = (snapshot, time.monotonic() + self._interval(elapsed))
+
+    def _snapshot(self, root):
+        started = time.monotonic()
+        snapshot = {}
+        for path in workspace.list_files(root):
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (info.st_mtime_ns, info.st_size)
+        return snapshot, time.monotonic() - started
+
+    def _interval(self, elapsed):
+        return max(POLL_SECONDS, elapsed * POLL_COST_FACTOR)
+
+    def next_due(self):
+        return min((due for _, due in self.roots.values()), default=None)
+
+    def poll(self):
+        """Poll the folders that are due; return the paths that changed since their last poll."""
+        changed = set()
+        now = time.monotonic()
+        for root, (old, due) in list(self.roots.items()):
+            if due > now:
+                continue
+            new, elapsed = self._snapshot(root)
+            changed.update(path for path, stamp in new.items() if old.get(path) != stamp)
+            changed.update(path for path in old if path not in new)
+            self.roots[root] = (new, time.monotonic() + self._interval(elapsed))
+        return changed
+
+class Watcher:
+    """Reports changed files of the watched folders from a background thread.
+
+    on_change(paths, rescan) is called with the changed paths (files, or
+    directories that were removed) and the folders whose changes may have
+    been missed and need a full comparison with the disk: folders that
+    were just added (anything may have changed while they were being set
+    up) and folders whose events overflowed the kernel queue.
+    """
+
+    def __init__(self, on_change, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS, polling=False):
+        self.on_change = on_change
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.polling = polling or not sys.platform.startswith("linux")
+        self.roots = set()
+        self._new_roots = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def watch(self, root):
+        """Start watching a folder (from any thread); watching it again does nothing."""
+        root = os.path.abspath(root)
+        with self._lock:
+            if root in self.roots:
+                return
+            self.roots.add(root)
+            self._new_roots.append(root)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        inotify = None
+        if not self.polling:
+            try:
+                inotify = _Inotify()
+            except (OSError, AttributeError):
+                pass
+        poller = _Poller()
+        changed = set()
+        rescan = set()
+        first = last = None
+        try:
+            while not self._stopping.is_set():
+                with self._lock:
+                    new_roots, self._new_roots = self._new_roots, []
+                for root in new_roots:
+                    try:
+                        if inotify is None:
+                            raise WatchLimit(root)
+                        inotify.add(root)
+                    except WatchLimit:
+                        poller.add(root)
+                    rescan.add(root)
+                    first = first or time.monotonic()
+                    last = time.monotonic()
+
+                now = time.monotonic()
+                timeout = IDLE_SECONDS
+                if first is not None:
+                    timeout = max(0, min(last + self.debounce, first + self.max_delay) - now)
+                due = poller.next_due()
+                if due is not None:
+                    timeout = min(timeout, max(0, due - now))
+                if inotify is not None:
+                    paths, lost = inotify.read(timeout)
+                else:
+                    paths, lost = set(), set()
+                    self._stopping.wait(timeout)
+                paths |= poller.poll()
+                if paths or lost:
+                    changed |= paths
+                    rescan |= lost
+                    last = time.monotonic()
+                    first = first or last
+
+                now = time.monotonic()
+                if first is not None and (now - last >= self.debounce or now - first >= self.max_delay):
+                    try:
+                        self.on_change(sorted(changed), sorted(rescan))
+                    except Exception:
+                        traceback.print_exc()
+                    changed, rescan = set(), set()
+                    first = last = None
+        finally:
+            if inotify is not None:
+                inotify.close()
@@ -0,0 +1,491 @@
+"""
+Workspace Summary
+Line, class, function and TODO/FIXME totals for every source file in the
+workspace folders, computed in parallel and cached between runs.
+
+Files are listed with `git ls-files` where a folder is a git checkout, and by
+a directory walk that honours .gitignore files otherwise. Files whose size
+and modification time match the cache are not read again; the rest are
+analyzed in batches by a process pool, and scan() yields partial totals as
+the batches complete.
+"""
+
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import re
+import stat
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dev_agent import deadline, languages
+
+CACHE_VERSION = 1
+# Below this many files to analyze, starting a process pool costs more than it saves
+MIN_PARALLEL_FILES = 512
+MAX_BATCH_FILES = 256
+MAX_FILE_BYTES = 16 * 1024 * 1024
+PROGRESS_INTERVAL = 0.5
+TOP_FILES = 10
+# Never descended into by the directory walk, with or without a .gitignore
+DEFAULT_EXCLUDES = frozenset({".git", ".hg", ".svn", "node_modules", "__pycache__"})
+
+# Extension -> language, shared with single-file requests
+LANGUAGES = languages.EXTENSIONS
+
+# Per-file statistics, in the order analyze_file() returns them
+STAT_FIELDS = ("lines", "classes", "functions", "branches", "todo", "fixme")
+
+# Counted with bytes.count(), like the single-file summary counts "class "
+# and "def ": approximate, but fast enough for every file of a large checkout
+_CLASS_MARKERS = (b"class ",)
+_FUNCTION_MARKERS = (b"def ", b"function ", b"func ", b"fn ")
+# Decision points, an approximation of cyclomatic complexity ("if " also
+# counts "elif ")
+_BRANCH_MARKERS = (b"if ", b"if(", b"for ", b"for(", b"while ", b"while(", b"case ", b"catch", b"except",
+                   b"&&", b"||")
+
+def language_of(path):
+    """Return the language of a file by extension, or None if it is not analyzed."""
+    return LANGUAGES.get(os.path.splitext(path)[1].lower())
+
+def analyze_file(path):
+    """Return the STAT_FIELDS tuple for one file, or None if it is unreadable or binary."""
+    try:
+        # Unbuffered: one read of exactly the file's size, no 8 KiB copy
+        with open(path, "rb", buffering=0) as f:
+            if os.fstat(f.fileno()).st_size > MAX_FILE_BYTES:
+                return None
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:8192]:
+        return None
+    lines = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+    return (lines, _count(data, _CLASS_MARKERS), _count(data, _FUNCTION_MARKERS), _count(data, _BRANCH_MARKERS),
+            data.count(b"TODO"), data.count(b"FIXME"))
+
+def _count(data, markers):
+    return sum(data.count(marker) for marker in markers)
+
+def analyze_batch(paths):
+    """Analyze a batch of files in a pool worker; returns [(path, stats or None)]."""
+    return [(path, analyze_file(path)) for path in paths]
+
+# --- Listing files ---
+
+class _IgnoreRule:
+    """One pattern line of a .gitignore file."""
+
+    __slots__ = ("regex", "negate", "dir_only", "anchored")
+
+    def __init__(self, pattern):
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # A slash anywhere but the end ties the pattern to the .gitignore's directory
+        self.anchored = "/" in pattern
+        self.regex = re.compile(_translate(pattern.lstrip("/")), re.S)
+
+    def matches(self, relative, name, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        return self.regex.fullmatch(relative if self.anchored else name) is not None
+
+def _translate(pattern):
+    """Translate a gitignore glob into a regular expression."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                i += 2
+                if i < n and pattern[i] == "/":
+                    # "**/" matches zero or more directories
+                    i += 1
+                    out.append("(?:.*/)?")
+                else:
+                    out.append(".*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+                continue
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+def read_ignore_rules(path):
+    """Parse a .gitignore-style file; a missing file has no rules."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="surrogateescape") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    rules = []
+    for line in lines:
+        if line.endswith(" ") and not line.endswith("\\ "):
+            line = line.rstrip(" ")
+        if line and not line.startswith("#"):
+            rules.append(_IgnoreRule(line))
+    return rules
+
+def is_ignored(levels, relative, name, is_dir):
+    """Apply the rules of every .gitignore above a path; the last match wins.
+
+    levels is a list of (directory prefix relative to the root, rules),
+    outermost first.
+    """
+    ignored = False
+    for prefix, rules in levels:
+        sub = relative[len(prefix):]
+        for rule in rules:
+            if rule.negate == ignored and rule.matches(sub, name, is_dir):
+                ignored = not rule.negate
+    return ignored
+
+def walk_files(root):
+    """Yield the files under root that git would not ignore, without running git.
+
+    Ignored directories are not entered, so (as with git) a negated pattern
+    cannot re-include a file inside one.
+    """
+    exclude = read_ignore_rules(os.path.join(root, ".git", "info", "exclude"))
+    stack = [("", [("", exclude)] if exclude else [])]
+    while stack:
+        relative_dir, levels = stack.pop()
+        directory = os.path.join(root, relative_dir)
+        rules = read_ignore_rules(os.path.join(directory, ".gitignore"))
+        if rules:
+            levels = levels + [(relative_dir, rules)]
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name in DEFAULT_EXCLUDES:
+                    continue
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = not is_dir and entry.is_file(follow_symlinks=False)
+                except OSError:
+                    continue
+                relative = relative_dir + entry.name
+                if (is_dir or is_file) and not is_ignored(levels, relative, entry.name, is_dir):
+                    if is_dir:
+                        stack.append((relative + "/", levels))
+                    else:
+                        yield entry.path
+
+def list_files(root):
+    """Return the files of a workspace folder, tracked or untracked but not ignored."""
+    try:
+        process = subprocess.Popen(["git", "-C", root, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+    except OSError:
+        return walk_files(root)
+    stdout, _ = deadline.communicate(process)
+    if process.returncode != 0:
+        return walk_files(root)
+    # Unmerged files are listed once per stage
+    names = dict.fromkeys(stdout.decode("utf-8", "surrogateescape").split("\0"))
+    names.pop("", None)
+    return (os.path.join(root, name) for name in names)
+
+# --- Cache ---
+
+def default_cache_path(roots, name="workspace"):
+    """Return the cache file `name` for a set of workspace folders."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    digest = hashlib.sha256(json.dumps(sorted(roots)).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+    return os.path.join(base, "dev-agent", f"{name}-{digest}.json")
+
+def load_cache(path, version=CACHE_VERSION):
+    """Return the contents of a cache file, or {} if it is missing or of another version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != version:
+        return {}
+    return data
+
+def save_cache(path, data, version=CACHE_VERSION):
+    """Write a cache file atomically; failing to write it only costs the next run time."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(data, version=version), f, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+# --- Aggregation ---
+
+class WorkspaceSummary:
+    """Running totals over the analyzed files of a workspace."""
+
+    def __init__(self, roots):
+        self.roots = [os.path.abspath(root) for root in roots]
+        # language -> [files, lines, classes, functions]
+        self.languages = {}
+        self.files = 0
+        self.lines = 0
+        self.todo = 0
+        self.fixme = 0
+        self.other_files = 0
+        self.skipped = 0
+        self.cached = 0
+        self.total = 0
+        self._largest = []
+        self._complex = []
+
+    def add(self, name, language, stats):
+        """Count one file; name is how the file is shown in the report."""
+        if stats is None:
+            self.skipped += 1
+            return
+        lines, classes, functions, branches, todo, fixme = stats
+        totals = self.languages.setdefault(language, [0, 0, 0, 0])
+        totals[0] += 1
+        totals[1] += lines
+        totals[2] += classes
+        totals[3] += functions
+        self.files += 1
+        self.lines += lines
+        self.todo += todo
+        self.fixme += fixme
+        _keep_top(self._largest, (lines, name))
+        _keep_top(self._complex, (branches, name))
+
+    @property
+    def done(self):
+        return self.files + self.skipped
+
+    def largest_files(self):
+        """Return [(lines, name)] of the largest files, largest first."""
+        return sorted(self._largest, reverse=True)
+
+    def most_complex_files(self):
+        """Return [(branch points, name)] of the most complex files, most complex first."""
+        return sorted(self._complex, reverse=True)
+
+    def progress(self):
+        """Return the partial totals as a JSON-ready dict."""
+        return {"files_done": self.done, "files_total": self.total, "cached": self.cached,
+                "lines": self.lines, "todo": self.todo, "fixme": self.fixme,
+                "languages": {language: totals[1] for language, totals in self.languages.items()}}
+
+def _keep_top(heap, item):
+    if len(heap) < TOP_FILES:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+def display_name(path, root, roots):
+    """Return how a listed file is shown in reports: relative to its folder."""
+    # Listed paths are always os.path.join(root, relative path)
+    relative = path[len(os.path.join(root, "")):]
+    return os.path.join(os.path.basename(root), relative) if len(roots) > 1 else relative
+
+# --- Scanning ---
+
+def scan(summary, cache_path=None, workers=None):
+    """Analyze the workspace folders of summary, yielding partial totals as they grow.
+
+    Unchanged files are counted from the cache at cache_path (by default one
+    per set of folders under ~/.cache/dev-agent); the others are analyzed,
+    in a pool of `workers` processes when there are enough of them. The
+    cache is rewritten at the end, also when the scan is cancelled, so the
+    work done so far is kept.
+    """
+    roots = summary.roots
+    cache_path = cache_path or default_cache_path(roots)
+    # {file path: [mtime_ns, size, stats or None]}
+    cached = load_cache(cache_path).get("files", {})
+    entries = {}
+    pending = {}
+    for root in roots:
+        for path in list_files(root):
+            deadline.check()
+            language = language_of(path)
+            if language is None:
+                summary.other_files += 1
+                continue
+            if path in entries or path in pending:
+                continue
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(info.st_mode):
+                continue
+            name = display_name(path, root, roots)
+            entry = cached.get(path)
+            if entry is not None and entry[0] == info.st_mtime_ns and entry[1] == info.st_size:
+                entries[path] = entry
+                summary.add(name, language, entry[2])
+                summary.cached += 1
+            else:
+                pending[path] = (name, language, info.st_mtime_ns, info.st_size)
+    summary.total = len(entries) + len(pending)
+    yield summary.progress()
+
+    last = time.monotonic()
+    try:
+        for results in run_batches(analyze_batch, list(pending), workers):
+            for path, stats in results:
+                name, language, mtime, size = pending[path]
+                entries[path] = [mtime, size, stats]
+                summary.add(name, language, stats)
+            if time.monotonic() - last >= PROGRESS_INTERVAL:
+                last = time.monotonic()
+                yield summary.progress()
+    finally:
+        if pending or len(entries) != len(cached):
+            save_cache(cache_path, {"files": entries})
+
+def run_batches(function, paths, workers=None):
+    """Yield function(batch) for batches of paths, from a process pool for large workloads.
+
+    function must be a module-level function so that pool workers can
+    import it. Results come in completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < MIN_PARALLEL_FILES:
+        for start in range(0, len(paths), MAX_BATCH_FILES):
+            deadline.check()
+            yield function(paths[start:start + MAX_BATCH_FILES])
+        return
+    # Small enough batches that every worker gets several, for load balancing
+    size = max(1, min(MAX_BATCH_FILES, -(-len(paths) // (workers * 4))))
+    pool = process_pool(workers)
+    try:
+        futures = {pool.submit(function, paths[start:start + size]) for start in range(0, len(paths), size)}
+        while futures:
+            finished, futures = wait(futures, timeout=deadline.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            deadline.check()
+            for future in finished:
+                yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def map_ordered(function, items, workers=None):
+    """Yield function(item) for each item, in order, from a process pool when workers > 1.
+
+    items may be a generator: only about two items per worker are taken from
+    it ahead of the result being waited for, so the items and results held at
+    a time do not grow with the input. function must be module-level.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for item in items:
+            deadline.check()
+            yield function(item)
+        return
+    pool = process_pool(workers)
+    try:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(function, item))
+            if len(pending) >= 2 * workers:
+                yield _wait_for(pending.popleft())
+        while pending:
+            yield _wait_for(pending.popleft())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def process_pool(workers):
+    # Forking a threaded process (the resident server) is unsafe
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method))
+
+def _wait_for(future):
+    while not future.done():
+        wait((future,), timeout=deadline.POLL_INTERVAL)
+        deadline.check()
+    return future.result()
+
+# --- Indexes kept in memory ---
+
+class IndexRegistry:
+    """Indexes of one kind (module graphs, marker indexes) kept in memory per set of workspace folders.
+
+    factory(roots, workers=workers) builds an index, which must have roots
+    and stale attributes and refresh() and update(path) methods. In the
+    resident agent each query then only re-reads the files that changed
+    since the last one. Once the file watcher reports on all of an index's
+    folders (see files_changed()), the index is kept up to date by the
+    watcher, and its folders are only listed again when it is stale.
+    concerns(index, path) tells whether a changed path under the index's
+    folders is one it must re-read; by default all of them are.
+    """
+
+    def __init__(self, factory, concerns=None):
+        self.factory = factory
+        self.concerns = concerns
+        self._indexes = {}
+        self._lock = threading.Lock()
+        # Folders the file watcher reports on
+        self._watched_roots = set()
+
+    def get(self, roots, workers=None):
+        """Return the up-to-date index of these folders."""
+        key = tuple(sorted(os.path.abspath(root) for root in roots))
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = self.factory(key, workers=workers)
+        if index.stale or not self._watched_roots.issuperset(key):
+            index.refresh()
+        return index
+
+    def files_changed(self, paths, rescan=()):
+        """Update the indexes in memory for changed files; return how many files they re-read.
+
+        Called with the changes the file watcher reports. rescan names the
+        folders whose changes it may have missed, among them every folder it
+        has just started watching: their indexes are marked stale, so that
+        the next query lists their files again.
+        """
+        with self._lock:
+            self._watched_roots.update(rescan)
+            indexes = list(self._indexes.values())
+        updated = 0
+        for index in indexes:
+            if any(root in index.roots for root in rescan):
+                index.stale = True
+                continue
+            prefixes = tuple(os.path.join(root, "") for root in index.roots)
+            for path in paths:
+                deadline.check()
+                if path.startswith(prefixes) and (self.concerns is None or self.concerns(index, path)):
+                    index.update(path)
+                    updated += 1
+        return updated
@@ -3,6 +3,38 @@ import sys
 import json
 import argparse
 import os
+import re
+
+# dev_agent lives next to this script when it runs from the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Language family used for pseudo code, by file extension
+PSEUDO_CODE_LANGUAGES = {
+    '.py': "python", '.pyw': "python",
+    '.js': "javascript/typescript", '.jsx': "javascript/typescript",
+    '.ts': "javascript/typescript", '.tsx': "javascript/typescript",
+    '.java': "java",
+    '.c': "c/c++", '.cpp': "c/c++", '.h': "c/c++", '.hpp': "c/c++",
+    '.cs': "c#", '.go': "go", '.rb': "ruby", '.php': "php", '.swift': "swift", '.rs': "rust",
+}
+
+# Language named in explanations, by file extension
+EXPLAIN_LANGUAGES = {
+    '.py': "Python", '.pyw': "Python",
+    '.js': "JavaScript", '.ts': "TypeScript",
+    '.java': "Java", '.c': "C", '.cpp': "C++", '.cc': "C++",
+    '.cs': "C#", '.go': "Go", '.rb': "Ruby", '.php': "PHP", '.swift': "Swift", '.rs': "Rust",
+    '.html': "HTML", '.htm': "HTML", '.css': "CSS", '.json': "JSON", '.md': "Markdown",
+}
+
+# Languages whose declarations come from the dev_agent outline engine, as detect_language() names
+OUTLINE_LANGUAGES = {
+    "javascript/typescript": "TypeScript",
+    "java": "Java",
+    "c/c++": "C++",
+    "go": "Go",
+    "rust": "Rust",
+}
 
 def process_command(command_type, user_command, file_content, file_path):
     """
@@ -44,27 +76,7 @@ def generate_pseudo_code(code, file_path):
     result = f"# Pseudo Code for {file_name}\n\n"
     
     # Determine language based on file extension
-    language = "unknown"
-    if file_ext in ['.py', '.pyw']:
-        language = "python"
-    elif file_ext in ['.js', '.jsx', '.ts', '.tsx']:
-        language = "javascript/typescript"
-    elif file_ext in ['.java']:
-        language = "java"
-    elif file_ext in ['.c', '.cpp', '.h', '.hpp']:
-        language = "c/c++"
-    elif file_ext in ['.cs']:
-        language = "c#"
-    elif file_ext in ['.go']:
-        language = "go"
-    elif file_ext in ['.rb']:
-        language = "ruby"
-    elif file_ext in ['.php']:
-        language = "php"
-    elif file_ext in ['.swift']:
-        language = "swift"
-    elif file_ext in ['.rs']:
-        language = "rust"
+    language = PSEUDO_CODE_LANGUAGES.get(file_ext, "unknown")
     
     result += f"Language: {language}\n\n"
     
@@ -73,16 +85,15 @@ def generate_pseudo_code(code, file_path):
     
     # Process the code based on language
     if language == "python":
-        result += process_python_code(lines)
+        result += '\n'.join(process_python_code(lines))
     else:
         # Generic processing for other languages
-        result += process_generic_code(lines)
+        result += '\n'.join(process_generic_code(lines, outline_declarations(code, language)))
     
     return result
 
 def process_python_code(lines):
-    """Process Python code to generate pseudo code"""
-    pseudo_code = []
+    """Yield pseudo code lines for Python source lines"""
     indent_level = 0
     in_function = False
     in_class = False
@@ -101,65 +112,73 @@ def process_python_code(lines):
         if stripped.startswith('def '):
             in_function = True
             func_name = stripped[4:].split('(')[0]
-            pseudo_code.append(f"{'  ' * indent_level}FUNCTION {func_name}:")
+            yield f"{'  ' * indent_level}FUNCTION {func_name}:"
             indent_level += 1
         
         # Check for class definitions
         elif stripped.startswith('class '):
             in_class = True
             class_name = stripped[6:].split('(')[0].split(':')[0]
-            pseudo_code.append(f"{'  ' * indent_level}CLASS {class_name}:")
+            yield f"{'  ' * indent_level}CLASS {class_name}:"
             indent_level += 1
         
         # Check for if statements
         elif stripped.startswith('if ') or stripped.startswith('elif '):
             condition = stripped.split(':')[0][3:] if stripped.startswith('if ') else stripped.split(':')[0][5:]
-            pseudo_code.append(f"{'  ' * indent_level}IF {condition}:")
+            yield f"{'  ' * indent_level}IF {condition}:"
             indent_level += 1
         
         # Check for else statements
         elif stripped.startswith('else:'):
-            pseudo_code.append(f"{'  ' * indent_level}ELSE:")
+            yield f"{'  ' * indent_level}ELSE:"
             indent_level += 1
         
         # Check for loops
         elif stripped.startswith('for '):
             loop_var = stripped.split(':')[0][4:]
-            pseudo_code.append(f"{'  ' * indent_level}FOR {loop_var}:")
+            yield f"{'  ' * indent_level}FOR {loop_var}:"
             indent_level += 1
         
         elif stripped.startswith('while '):
             condition = stripped.split(':')[0][6:]
-            pseudo_code.append(f"{'  ' * indent_level}WHILE {condition}:")
+            yield f"{'  ' * indent_level}WHILE {condition}:"
             indent_level += 1
         
         # Check for return statements
         elif stripped.startswith('return '):
             return_val = stripped[7:]
-            pseudo_code.append(f"{'  ' * indent_level}RETURN {return_val}")
+            yield f"{'  ' * indent_level}RETURN {return_val}"
         
         # Check for assignments
         elif '=' in stripped and not '==' in stripped and not '>=' in stripped and not '<=' in stripped:
             var_name = stripped.split('=')[0].strip()
             value = stripped.split('=')[1].strip()
-            pseudo_code.append(f"{'  ' * indent_level}SET {var_name} = {value}")
+            yield f"{'  ' * indent_level}SET {var_name} = {value}"
         
         # Check for function calls
         elif '(' in stripped and ')' in stripped and not stripped.startswith(('if', 'elif', 'for', 'while', 'def', 'class')):
-            pseudo_code.append(f"{'  ' * indent_level}CALL {stripped}")
+            yield f"{'  ' * indent_level}CALL {stripped}"
         
         # Handle indentation changes
         if current_indent < indent_level * 4 and indent_level > 0:
             indent_level = max(0, current_indent // 4)
-    
-    return '\n'.join(pseudo_code)
 
-def process_generic_code(lines):
-    """Process generic code to generate pseudo code"""
-    pseudo_code = []
+def outline_declarations(code, language):
+    """Map line numbers to the kind of the declaration starting there, or None without an outline"""
+    if language not in OUTLINE_LANGUAGES:
+        return None
+    try:
+        from dev_agent import outline
+    except ImportError:
+        return None
+    symbols = outline.outline(code, OUTLINE_LANGUAGES[language])
+    return {symbol.start_line: symbol.kind for _, symbol in outline.iter_symbols(symbols)}
+
+def process_generic_code(lines, declarations=None):
+    """Yield pseudo code lines for source lines of other languages"""
     indent_level = 0
     
-    for line in lines:
+    for line_number, line in enumerate(lines, 1):
         stripped = line.strip()
         
         # Skip empty lines and comments
@@ -169,54 +188,57 @@ def process_generic_code(lines):
         # Calculate indentation level
         current_indent = len(line) - len(line.lstrip())
         
+        # Declarations found by the outline engine, which sees multi-line headers, strings and comments
+        if declarations is not None and line_number in declarations:
+            yield f"{'  ' * indent_level}{declarations[line_number].upper()}: {stripped}"
+            indent_level += 1
+        
         # Check for function definitions
-        if 'function' in stripped or 'def ' in stripped or 'void' in stripped or 'int ' in stripped or 'string ' in stripped:
+        elif declarations is None and ('function' in stripped or 'def ' in stripped or 'void' in stripped or 'int ' in stripped or 'string ' in stripped):
             if '{' in stripped or ':' in stripped:
-                pseudo_code.append(f"{'  ' * indent_level}FUNCTION: {stripped}")
+                yield f"{'  ' * indent_level}FUNCTION: {stripped}"
                 indent_level += 1
         
         # Check for class definitions
-        elif 'class ' in stripped:
+        elif declarations is None and 'class ' in stripped:
             if '{' in stripped or ':' in stripped:
-                pseudo_code.append(f"{'  ' * indent_level}CLASS: {stripped}")
+                yield f"{'  ' * indent_level}CLASS: {stripped}"
                 indent_level += 1
         
         # Check for if statements
         elif stripped.startswith('if ') or stripped.startswith('else if'):
-            pseudo_code.append(f"{'  ' * indent_level}CONDITION: {stripped}")
+            yield f"{'  ' * indent_level}CONDITION: {stripped}"
             if '{' in stripped:
                 indent_level += 1
         
         # Check for else statements
         elif stripped.startswith('else'):
-            pseudo_code.append(f"{'  ' * indent_level}ELSE:")
+            yield f"{'  ' * indent_level}ELSE:"
             if '{' in stripped:
                 indent_level += 1
         
         # Check for loops
         elif stripped.startswith('for ') or stripped.startswith('while ') or stripped.startswith('foreach'):
-            pseudo_code.append(f"{'  ' * indent_level}LOOP: {stripped}")
+            yield f"{'  ' * indent_level}LOOP: {stripped}"
             if '{' in stripped:
                 indent_level += 1
         
         # Check for return statements
         elif stripped.startswith('return '):
-            pseudo_code.append(f"{'  ' * indent_level}RETURN: {stripped}")
+            yield f"{'  ' * indent_level}RETURN: {stripped}"
         
         # Check for assignments
         elif '=' in stripped and not '==' in stripped and not '>=' in stripped and not '<=' in stripped:
-            pseudo_code.append(f"{'  ' * indent_level}ASSIGN: {stripped}")
+            yield f"{'  ' * indent_level}ASSIGN: {stripped}"
         
         # Check for closing braces
         elif stripped == '}' and indent_level > 0:
             indent_level -= 1
-            pseudo_code.append(f"{'  ' * indent_level}END BLOCK")
+            yield f"{'  ' * indent_level}END BLOCK"
         
         # Other statements
         elif stripped.endswith(';'):
-            pseudo_code.append(f"{'  ' * indent_level}STATEMENT: {stripped}")
-    
-    return '\n'.join(pseudo_code)
+            yield f"{'  ' * indent_level}STATEMENT: {stripped}"
 
 def explain_code(code, file_path):
     """
@@ -236,39 +258,7 @@ def explain_code(code, file_path):
     file_ext = os.path.splitext(file_path)[1].lower()
     
     # Determine language based on file extension
-    language = "unknown"
-    if file_ext in ['.py', '.pyw']:
-        language = "Python"
-    elif file_ext in ['.js']:
-        language = "JavaScript"
-    elif file_ext in ['.ts']:
-        language = "TypeScript"
-    elif file_ext in ['.java']:
-        language = "Java"
-    elif file_ext in ['.c']:
-        language = "C"
-    elif file_ext in ['.cpp', '.cc']:
-        language = "C++"
-    elif file_ext in ['.cs']:
-        language = "C#"
-    elif file_ext in ['.go']:
-        language = "Go"
-    elif file_ext in ['.rb']:
-        language = "Ruby"
-    elif file_ext in ['.php']:
-        language = "PHP"
-    elif file_ext in ['.swift']:
-        language = "Swift"
-    elif file_ext in ['.rs']:
-        language = "Rust"
-    elif file_ext in ['.html', '.htm']:
-        language = "HTML"
-    elif file_ext in ['.css']:
-        language = "CSS"
-    elif file_ext in ['.json']:
-        language = "JSON"
-    elif file_ext in ['.md']:
-        language = "Markdown"
+    language = EXPLAIN_LANGUAGES.get(file_ext, "unknown")
     
     # Count lines of code
     lines = code.split('\n')
@@ -352,12 +342,14 @@ def process_custom_command(command, file_content, file_path):
     file_ext = os.path.splitext(file_path)[1].lower() if file_path else ""
     
     # Process based on command keywords
-    if "summarize" in command.lower() or "summary" in command.lower():
+    lowered = command.lower()
+    if "summarize" in lowered or "summary" in lowered:
         return summarize_code(file_content, file_path)
-    elif "count" in command.lower() and "lines" in command.lower():
+    elif "count" in lowered and "lines" in lowered:
         return count_lines(file_content, file_path)
-    elif "find" in command.lower() or "search" in command.lower():
-        search_term = command.lower().split("find")[1].strip() if "find" in command.lower() else command.lower().split("search")[1].strip()
+    elif "find" in lowered or "search" in lowered:
+        keyword = "find" if "find" in lowered else "search"
+        search_term = lowered.split(keyword, 1)[1].strip()
         return search_in_code(file_content, search_term, file_path)
     else:
         # Default response for unknown commands
@@ -404,17 +396,22 @@ def count_lines(code, file_path):
     
     file_name = os.path.basename(file_path) if file_path else "No file"
     
+    from dev_agent.lines import LineIndex
     # Count different types of lines
-    lines = code.split('\n')
-    non_empty_lines = [line for line in lines if line.strip()]
-    comment_lines = [line for line in lines if line.strip().startswith('#') or line.strip().startswith('//')]
-    code_lines = [line for line in non_empty_lines if not line.strip().startswith('#') and not line.strip().startswith('//')]
+    lines = LineIndex(code)
+    blank_lines = comment_lines = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            blank_lines += 1
+        elif line.startswith(('#', '//')):
+            comment_lines += 1
     
     result = f"# Line Count for {file_name}\n\n"
     result += f"- Total lines: {len(lines)}\n"
-    result += f"- Code lines: {len(code_lines)}\n"
-    result += f"- Comment lines: {len(comment_lines)}\n"
-    result += f"- Blank lines: {len(lines) - len(non_empty_lines)}\n"
+    result += f"- Code lines: {len(lines) - blank_lines - comment_lines}\n"
+    result += f"- Comment lines: {comment_lines}\n"
+    result += f"- Blank lines: {blank_lines}\n"
     
     return result
 
@@ -429,13 +426,14 @@ def search_in_code(code, search_term, file_path):
     file_name = os.path.basename(file_path) if file_path else "No file"
     search_term = search_term.strip()
     
-    # Search for the term in each line
-    lines = code.split('\n')
+    from dev_agent.lines import LineIndex
+    # Search the whole buffer and copy out only the lines that match
+    lines = LineIndex(code)
     matches = []
-    
-    for i, line in enumerate(lines):
-        if search_term.lower() in line.lower():
-            matches.append((i+1, line.strip()))
+    for match in re.finditer(re.escape(search_term), code, re.IGNORECASE):
+        span = lines.span(match.start(), match.end())
+        if not matches or span.start_line > matches[-1].end_line:
+            matches.append(span)
     
     if not matches:
         return f"No matches found for '{search_term}' in {file_name}."
@@ -443,16 +441,22 @@ def search_in_code(code, search_term, file_path):
     result = f"# Search Results for '{search_term}' in {file_name}\n\n"
     result += f"Found {len(matches)} matches:\n\n"
     
-    for line_num, line_text in matches:
-        result += f"Line {line_num}: {line_text}\n"
+    for span in matches:
+        result += f"Line {span.start_line}: {lines.line(span.start_line).strip()}\n"
     
     return result
 
 def main():
     parser = argparse.ArgumentParser(description='Dev Agent Python Script')
     parser.add_argument('--input-file', type=str, help='Path to the input JSON file')
+    parser.add_argument('--framed', action='store_true',
+                        help='Read the request as a frame on stdin and write the reply as a frame on stdout')
     args = parser.parse_args()
     
+    if args.framed:
+        framed_main()
+        return
+    
     try:
         if args.input_file:
             # Read from input file
@@ -474,5 +478,19 @@ def main():
         print(f"Error in agent.py: {str(e)}")
         sys.exit(1)
 
+def framed_main():
+    """Answer one request framed as in dev_agent/ipc.py, with a {"status", "response"} frame."""
+    from dev_agent import ipc
+    try:
+        data = ipc.read_frame(sys.stdin.buffer)
+        if not isinstance(data, dict):
+            raise ValueError("no request frame on stdin")
+        response = process_command(data.get('command', 'custom'), data.get('content', ''),
+                                   data.get('fileContent', ''), data.get('filePath', ''))
+    except Exception as e:
+        ipc.write_frame(sys.stdout.buffer, {"status": "error", "response": f"Error in agent.py: {str(e)}"})
+        sys.exit(1)
+    ipc.write_frame(sys.stdout.buffer, {"status": "ok", "response": response})
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
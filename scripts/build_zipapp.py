@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Zipapp Builder
+Bundles agent_v2.py with the dev_agent package, and the workflow orchestrator,
+into executable zip archives of precompiled bytecode.
+
+Python compiles the script it is started with on every run, since the
+__main__ script never gets a cached .pyc; for agent_v2.py that is about as
+long as importing everything else. Started as `python dist/agent.pyz`, the
+agent only compiles a two-line stub and loads its modules from bytecode
+compiled once, here. The bytecode is hash-based and unchecked, so it is never
+compared with the sources; the sources are bundled too, and a Python of
+another version than the one that built the archive compiles them instead.
+"""
+
+import argparse
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import zipapp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def bundles():
+    """Return {archive name: (module the archive runs, {source path: path in the archive})}."""
+    agent = {os.path.join(REPO_ROOT, "agent_v2.py"): "agent_v2.py"}
+    for directory, dirnames, filenames in os.walk(os.path.join(REPO_ROOT, "dev_agent")):
+        dirnames[:] = sorted(name for name in dirnames if name != "__pycache__")
+        for name in sorted(filenames):
+            if name.endswith(".py"):
+                path = os.path.join(directory, name)
+                agent[path] = os.path.relpath(path, REPO_ROOT)
+    orchestrator = {os.path.join(REPO_ROOT, "workflow_engine", "orchestrator.py"): "orchestrator.py"}
+    return {"agent.pyz": ("agent_v2", agent), "orchestrator.pyz": ("orchestrator", orchestrator)}
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Bundle the agent and the workflow orchestrator as zipapps')
+    parser.add_argument('--output-dir', type=str, default=os.path.join(REPO_ROOT, 'dist'),
+                        help='Directory to write agent.pyz and orchestrator.pyz to (default: dist/)')
+    parser.add_argument('--python', type=str, default='/usr/bin/env python3',
+                        help='Interpreter for the archives\' shebang line')
+    parser.add_argument('--optimize', type=int, choices=[0, 1, 2], default=0,
+                        help='Bytecode optimization level, as for python -O (default: 0)')
+    parser.add_argument('--compress', action='store_true',
+                        help='Deflate the archives (smaller, but slower to load)')
+    return parser.parse_args()
+
+def stage(staging, main_module, files, optimize=0):
+    """Copy the sources into a staging directory, each with its .pyc next to it, and add a __main__.py."""
+    for source, name in files.items():
+        target = os.path.join(staging, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        # zipimport looks for module.pyc beside module.py, not in __pycache__
+        py_compile.compile(source, cfile=target + "c", dfile=name, doraise=True, optimize=optimize,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    with open(os.path.join(staging, "__main__.py"), "w") as f:
+        f.write(f"import {main_module}\n{main_module}.main()\n")
+
+def build(output_dir, interpreter='/usr/bin/env python3', optimize=0, compress=False):
+    """Write the archives to output_dir; return their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for archive, (main_module, files) in bundles().items():
+        path = os.path.join(output_dir, archive)
+        with tempfile.TemporaryDirectory() as staging:
+            stage(staging, main_module, files, optimize)
+            zipapp.create_archive(staging, path, interpreter, compressed=compress)
+        paths.append(path)
+    return paths
+
+def main():
+    """Main function to build the archives."""
+    args = parse_arguments()
+    try:
+        paths = build(args.output_dir, args.python, args.optimize, args.compress)
+    except (OSError, py_compile.PyCompileError) as e:
+        print(f"Error building the archives: {e}", file=sys.stderr)
+        sys.exit(1)
+    for path in paths:
+        print(f"{path} ({os.path.getsize(path) // 1024} KB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Load Generator
+Replays captured agent requests against agent_v2.py and reports throughput,
+latency percentiles, error rate and CPU/memory use over time.
+
+Targets:
+  spawn   - start one agent_v2.py process per request, like the extension does
+  server  - send requests to a resident agent_v2.py --serve over --socket/--port
+
+Load models:
+  --concurrency N   closed loop: N clients each send their next request as soon
+                    as the previous one is answered
+  --rate R          open loop: Poisson arrivals at R requests/second, latency
+                    measured from the scheduled arrival so queueing is counted
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from timings_report import percentile
+
+AGENT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent_v2.py")
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Replay agent requests at a configurable load')
+    parser.add_argument('inputs', nargs='+', help='Request files: JSON lines (requests.jsonl) or single JSON (test_input*.json)')
+    parser.add_argument('--mode', choices=['spawn', 'server'], default='spawn', help='How to reach the agent')
+    parser.add_argument('--python', type=str, default=sys.executable, help='Python executable for spawn mode')
+    parser.add_argument('--script', type=str, default=AGENT_SCRIPT, help='Agent script for spawn mode')
+    parser.add_argument('--socket', type=str, help='Unix socket of a resident agent (server mode)')
+    parser.add_argument('--port', type=int, help='Local TCP port of a resident agent (server mode)')
+    parser.add_argument('--server-pid', type=int, help='PID of the resident agent to sample CPU/RSS from')
+    parser.add_argument('--concurrency', type=int, default=1, help='Closed-loop clients')
+    parser.add_argument('--rate', type=float, help='Open-loop Poisson arrival rate in requests/second')
+    parser.add_argument('--max-inflight', type=int, default=256, help='Cap on outstanding requests in open-loop mode')
+    parser.add_argument('--requests', type=int, help='Total requests to send (default: one pass over the inputs)')
+    parser.add_argument('--duration', type=float, help='Stop sending after this many seconds')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='Seconds between CPU/memory samples')
+    parser.add_argument('--seed', type=int, help='Random seed for arrivals and request order')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args()
+
+def load_requests(paths):
+    """Load request dicts from JSON-lines or single-JSON files."""
+    requests = []
+    for path in paths:
+        with open(path, 'r') as f:
+            text = f.read()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = [json.loads(line) for line in text.splitlines() if line.strip()]
+        requests.extend(data if isinstance(data, list) else [data])
+    return [request for request in requests if isinstance(request, dict)]
+
+class SpawnTarget:
+    """Runs one agent process per request through a temporary input file."""
+
+    def __init__(self, python, script):
+        self.python = python
+        self.script = script
+
+    def send(self, request):
+        fd, path = tempfile.mkstemp(prefix="loadgen_", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(request, f)
+            process = subprocess.run([self.python, self.script, "--input-file", path],
+                                     capture_output=True, text=True)
+            return process.returncode == 0 and not process.stdout.startswith("Error")
+        finally:
+            os.remove(path)
+
+    def close(self):
+        pass
+
+class ServerTarget:
+    """Sends requests to a resident agent, one connection per client thread."""
+
+    def __init__(self, socket_path=None, port=None):
+        self.socket_path = socket_path
+        self.port = port
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.socket_path:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_path)
+            else:
+                sock = socket.create_connection(("127.0.0.1", self.port))
+            connection = self._local.connection = sock.makefile('rwb')
+            with self._lock:
+                self._connections.append((sock, connection))
+        return connection
+
+    def send(self, request):
+        connection = self._connection()
+        connection.write(json.dumps(request, separators=(",", ":")).encode("utf-8") + b"\n")
+        connection.flush()
+        line = connection.readline()
+        if not line:
+            self._local.connection = None
+            return False
+        return json.loads(line).get("status") == "ok"
+
+    def close(self):
+        with self._lock:
+            for sock, connection in self._connections:
+                try:
+                    connection.close()
+                    sock.close()
+                except OSError:
+                    pass
+
+def _cpu_seconds(pid=None):
+    """Return (user + system) CPU seconds for pid, or for this process's children."""
+    if pid is None:
+        usage = os.times()
+        return usage.children_user + usage.children_system
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return (int(fields[11]) + int(fields[12])) / ticks
+
+def _rss_bytes(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def _available_memory_bytes():
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    return None
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU utilisation and memory of the target at a fixed interval.
+
+    In spawn mode CPU is that of reaped agent processes, so it lags by one
+    request; in server mode it is read from /proc for --server-pid.
+    """
+
+    def __init__(self, interval, pid=None):
+        super().__init__(name="loadgen-sampler", daemon=True)
+        self.interval = interval
+        self.pid = pid
+        self.samples = []
+        self._halt = threading.Event()
+
+    def run(self):
+        started = time.monotonic()
+        last_time, last_cpu = started, self._cpu()
+        while not self._halt.wait(self.interval):
+            now, cpu = time.monotonic(), self._cpu()
+            sample = {
+                "t": round(now - started, 3),
+                "cpu_percent": None,
+            }
+            if cpu is not None and last_cpu is not None:
+                sample["cpu_percent"] = round(100.0 * (cpu - last_cpu) / max(now - last_time, 1e-9), 1)
+            try:
+                sample["available_memory_mb"] = round(_available_memory_bytes() / 2**20, 1)
+                if self.pid:
+                    sample["rss_mb"] = round(_rss_bytes(self.pid) / 2**20, 1)
+            except (OSError, TypeError):
+                pass
+            self.samples.append(sample)
+            last_time, last_cpu = now, cpu
+
+    def _cpu(self):
+        try:
+            return _cpu_seconds(self.pid)
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+class Recorder:
+    """Collects (latency, ok) results from client threads."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+
+def _timed_send(target, request, scheduled, recorder):
+    try:
+        ok = target.send(request)
+    except Exception:
+        ok = False
+    recorder.record(time.monotonic() - scheduled, ok)
+
+def run_closed_loop(target, requests, total, concurrency, deadline, recorder):
+    """Keep `concurrency` clients busy until total requests or the deadline."""
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def client():
+        while time.monotonic() < deadline:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            _timed_send(target, requests[index % len(requests)], time.monotonic(), recorder)
+
+    threads = [threading.Thread(target=client, name=f"loadgen-client-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def run_open_loop(target, requests, total, rate, max_inflight, deadline, recorder, rng):
+    """Issue requests with exponential inter-arrival times (Poisson process)."""
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        next_arrival = time.monotonic()
+        for index in range(total):
+            next_arrival += rng.expovariate(rate)
+            if next_arrival >= deadline:
+                break
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_timed_send, target, requests[index % len(requests)], next_arrival, recorder)
+
+def build_report(recorder, elapsed, samples, args):
+    """Summarize one run."""
+    latencies = sorted(recorder.latencies)
+    completed = len(latencies)
+    report = {
+        "mode": args.mode,
+        "load": f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}",
+        "requests": completed,
+        "errors": recorder.errors,
+        "error_rate": round(recorder.errors / completed, 4) if completed else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 2)
+            for name, fraction in (("p50", 0.50), ("p90", 0.90), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        "samples": samples,
+    }
+    if latencies:
+        report["latency_ms"]["mean"] = round(sum(latencies) / completed * 1000, 2)
+    return report
+
+def format_report(report):
+    """Format the report for a terminal."""
+    lines = [
+        f"Mode: {report['mode']} ({report['load']})",
+        f"Requests: {report['requests']} in {report['elapsed_s']}s -> {report['throughput_rps']} req/s",
+        f"Errors: {report['errors']} ({report['error_rate'] * 100:.2f}%)",
+        "Latency (ms): " + ", ".join(f"{name}={value}" for name, value in report["latency_ms"].items()),
+    ]
+    if report["samples"]:
+        lines.append("")
+        lines.append(f"{'t (s)':>8} {'cpu %':>8} {'rss MB':>10} {'avail MB':>10}")
+        for sample in report["samples"]:
+            lines.append(f"{sample['t']:>8} {str(sample.get('cpu_percent', '-')):>8} "
+                         f"{str(sample.get('rss_mb', '-')):>10} {str(sample.get('available_memory_mb', '-')):>10}")
+    return "\n".join(lines)
+
+def main():
+    """Main function to run the load test."""
+    args = parse_arguments()
+
+    try:
+        requests = load_requests(args.inputs)
+    except Exception as e:
+        print(f"Error loading requests: {str(e)}")
+        sys.exit(1)
+    if not requests:
+        print("Error: No requests found in the input files.")
+        sys.exit(1)
+
+    if args.mode == 'server':
+        if not args.socket and args.port is None:
+            print("Error: server mode needs --socket or --port.")
+            sys.exit(1)
+        target = ServerTarget(args.socket, args.port)
+    else:
+        target = SpawnTarget(args.python, args.script)
+
+    rng = random.Random(args.seed)
+    total = args.requests or len(requests)
+    if args.requests:
+        requests = list(requests)
+        rng.shuffle(requests)
+
+    recorder = Recorder()
+    sampler = ResourceSampler(args.sample_interval, args.server_pid if args.mode == 'server' else None)
+    sampler.start()
+    started = time.monotonic()
+    deadline = started + args.duration if args.duration else float("inf")
+    try:
+        if args.rate:
+            run_open_loop(target, requests, total, args.rate, args.max_inflight, deadline, recorder, rng)
+        else:
+            run_closed_loop(target, requests, total, max(1, args.concurrency), deadline, recorder)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.monotonic() - started
+        sampler.stop()
+        target.close()
+
+    report = build_report(recorder, elapsed, sampler.samples, args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    sys.exit(1 if report["requests"] == 0 else 0)
+
+if __name__ == "__main__":
+    main()
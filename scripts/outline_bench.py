@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Outline Benchmark
+Measures the throughput of the outline engine (dev_agent/outline.py) on
+generated sources of each supported language, and on files given on the
+command line.
+
+The generated corpora are deterministic, so numbers from two runs (or two
+versions of the engine) can be compared. Each corpus is outlined several
+times and the fastest run is reported, in MB of source per second.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from dev_agent import languages, outline
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the source outline engine')
+    parser.add_argument('files', nargs='*', help='Source files to outline as well as the generated corpora')
+    parser.add_argument('--size', type=float, default=4.0, help='Size of each generated corpus in MB')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per corpus; the fastest is reported')
+    parser.add_argument('--only', type=str, help='Comma-separated corpus names to run (see the table)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    return parser.parse_args()
+
+def _typescript(n):
+    return (f"/** Service number {n}, with a {{brace}} and a 'quote' in its comment. */\n"
+            f"export class Service{n}<T extends object> implements Handler {{\n"
+            f"    private cache: Map<string, T> = new Map();\n\n"
+            f"    constructor(private readonly client: Client, options: {{ retries: number }} = {{ retries: 3 }}) {{\n"
+            f"        this.retries = options.retries;\n"
+            f"    }}\n\n"
+            f"    async fetch(id: string): Promise<T | undefined> {{\n"
+            f"        const url = `${{this.base}}/items/${{id}}?v={n}`;\n"
+            f"        if (!/^[a-z0-9]+$/i.test(id)) {{ throw new Error(\"bad id {{\" + id); }}\n"
+            f"        return this.cache.get(id) ?? (await this.client.get(url));\n"
+            f"    }}\n"
+            f"}}\n\n"
+            f"export const handler{n} = (event: Event): void => {{\n"
+            f"    console.log(event.type);\n"
+            f"}};\n\n")
+
+def _minified(n):
+    # Dense generated JavaScript: no newlines, one token after another
+    return (f"function f{n}(a){{if(a>{n}){{return a/2}}var b={{k:'{n}',v:[1,2,3]}};return b.v.map(function(c){{return c*a}})}}"
+            f"var x{n}={{m:function(){{return/x{n}/.test(\"y\")}},n:{n}}};class C{n}{{m(){{return this.n}}}}")
+
+def _java(n):
+    return (f"/** Repository {n}. */\n"
+            f"public class Repository{n} extends Base implements Store<String> {{\n"
+            f"    private final Map<String, Integer> counts = new HashMap<>();\n\n"
+            f"    @Override\n"
+            f"    public Optional<String> find(String key) throws IOException {{\n"
+            f"        if (key.isEmpty()) {{\n"
+            f"            throw new IllegalArgumentException(\"empty {{key}}\");\n"
+            f"        }}\n"
+            f"        return Optional.ofNullable(lookup(key, '{{'));\n"
+            f"    }}\n\n"
+            f"    private static int count{n}(List<String> items) {{\n"
+            f"        return items.size();\n"
+            f"    }}\n"
+            f"}}\n\n")
+
+def _c(n):
+    return (f"#ifdef FEATURE_{n}\n"
+            f"static int helper_{n}(const char *name, size_t length) {{\n"
+            f"#else\n"
+            f"static int helper_{n}(const char *name) {{\n"
+            f"#endif\n"
+            f"    /* \"{{\" in a comment */\n"
+            f"    if (name[0] == '{{') {{\n"
+            f"        return {n};\n"
+            f"    }}\n"
+            f"    return strlen(name);\n"
+            f"}}\n\n"
+            f"struct record_{n} {{\n"
+            f"    int id;\n"
+            f"    char label[32];\n"
+            f"}};\n\n")
+
+def _go(n):
+    return (f"// Worker{n} processes jobs.\n"
+            f"type Worker{n} struct {{\n"
+            f"\tjobs chan Job\n"
+            f"}}\n\n"
+            f"func (w *Worker{n}) Run(ctx context.Context) error {{\n"
+            f"\tfor {{\n"
+            f"\t\tselect {{\n"
+            f"\t\tcase job := <-w.jobs:\n"
+            f"\t\t\tfmt.Printf(\"job {{%d}}\\n\", job.ID)\n"
+            f"\t\tcase <-ctx.Done():\n"
+            f"\t\t\treturn ctx.Err()\n"
+            f"\t\t}}\n"
+            f"\t}}\n"
+            f"}}\n\n")
+
+def _rust(n):
+    return (f"/// Parser number {n}.\n"
+            f"pub struct Parser{n}<'a> {{\n"
+            f"    input: &'a str,\n"
+            f"}}\n\n"
+            f"impl<'a> Parser{n}<'a> {{\n"
+            f"    pub fn next(&mut self) -> Option<char> {{\n"
+            f"        let raw = r#\"{{ not a brace }}\"#;\n"
+            f"        match self.input.chars().next() {{\n"
+            f"            Some('{{') => None,\n"
+            f"            other => other,\n"
+            f"        }}\n"
+            f"    }}\n"
+            f"}}\n\n")
+
+# Corpus name -> (language, generator of its n-th unit)
+CORPORA = {
+    "typescript": ("TypeScript", _typescript),
+    "minified-js": ("JavaScript", _minified),
+    "java": ("Java", _java),
+    "c": ("C", _c),
+    "go": ("Go", _go),
+    "rust": ("Rust", _rust),
+}
+
+def generate(unit, size_bytes):
+    """Return generated source of at least size_bytes bytes."""
+    parts = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        part = unit(n)
+        parts.append(part)
+        total += len(part)
+        n += 1
+    return "".join(parts)
+
+def measure(text, language, repeat):
+    """Outline text repeat times; return (fastest seconds, symbol count)."""
+    best = None
+    symbols = 0
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        tree = outline.outline(text, language)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        symbols = sum(1 for _ in outline.iter_symbols(tree))
+    return best, symbols
+
+def run(args):
+    """Benchmark the selected corpora and files; return a list of result dicts."""
+    names = args.only.split(",") if args.only else list(CORPORA)
+    unknown = [name for name in names if name not in CORPORA]
+    if unknown:
+        raise ValueError(f"unknown corpus {', '.join(unknown)}; choose from {', '.join(CORPORA)}")
+    inputs = []
+    for name in names:
+        language, unit = CORPORA[name]
+        inputs.append((name, language, generate(unit, int(args.size * 1024 * 1024))))
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        language = languages.detect(text, path)
+        if not outline.has_outline(language):
+            raise ValueError(f"{path}: {language} has no outline")
+        inputs.append((os.path.basename(path), language, text))
+
+    results = []
+    for name, language, text in inputs:
+        seconds, symbols = measure(text, language, args.repeat)
+        size_mb = len(text.encode('utf-8')) / (1024 * 1024)
+        results.append({
+            "corpus": name,
+            "language": language,
+            "size_mb": round(size_mb, 2),
+            "symbols": symbols,
+            "seconds": round(seconds, 3),
+            "mb_per_s": round(size_mb / seconds, 1) if seconds > 0 else None,
+        })
+    return results
+
+def format_table(results):
+    """Format the results as a plain text table."""
+    lines = [f"{'corpus':<20} {'language':<12} {'MB':>8} {'symbols':>9} {'seconds':>9} {'MB/s':>8}"]
+    for result in results:
+        lines.append(f"{result['corpus']:<20} {result['language']:<12} {result['size_mb']:>8} {result['symbols']:>9} "
+                     f"{result['seconds']:>9} {result['mb_per_s']:>8}")
+    return "\n".join(lines)
+
+def main():
+    """Main function to run the benchmark."""
+    args = parse_arguments()
+
+    try:
+        results = run(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results))
+
+if __name__ == "__main__":
+    main()
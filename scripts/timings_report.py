@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Timings Report
+Summarizes the per-request timing breakdowns written by agent_v2.py --timings / --timings-log.
+"""
+
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Summarize agent_v2.py timing logs')
+    parser.add_argument('logs', nargs='*', help='Timing log files (JSON lines); reads stdin if omitted')
+    parser.add_argument('--by-command', action='store_true', help='Break the summary down per command type')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON instead of a table')
+    return parser.parse_args()
+
+def read_records(streams):
+    """Yield timing records from the given streams, skipping unrelated lines.
+
+    Captured stderr may interleave timing lines with other output, so every
+    line that is not a JSON timings object is ignored.
+    """
+    for stream in streams:
+        for line in stream:
+            line = line.strip()
+            if not line.startswith('{'):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("event") == "timings":
+                yield record
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def collect(records, by_command=False):
+    """Group millisecond samples by (command type, metric name)."""
+    samples = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        group = (record.get("command_type") or "auto") if by_command else "all"
+        metrics = samples[group]
+        metrics["total"].append(record.get("total_ms", 0.0))
+        for name, value in record.get("phases", {}).items():
+            metrics[f"phase.{name}"].append(value)
+        for name, value in record.get("helpers", {}).items():
+            metrics[f"helper.{name}"].append(value["ms"])
+        for name, value in record.get("subprocess", {}).items():
+            metrics[f"subprocess.{name}"].append(value)
+    return samples
+
+def summarize(samples):
+    """Reduce each sample list to count, mean, p50, p95, p99 and max."""
+    summary = {}
+    for group, metrics in samples.items():
+        summary[group] = {}
+        for name, values in metrics.items():
+            values = sorted(values)
+            summary[group][name] = {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 3),
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": values[-1],
+            }
+    return summary
+
+def format_table(summary):
+    """Format the summary as a plain text table, slowest metric first."""
+    lines = []
+    for group in sorted(summary):
+        metrics = summary[group]
+        lines.append(f"== {group} ({metrics['total']['count']} requests) ==")
+        lines.append(f"{'metric':<40} {'count':>7} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+        for name, stats in sorted(metrics.items(), key=lambda item: -item[1]["mean"]):
+            lines.append(
+                f"{name:<40} {stats['count']:>7} {stats['mean']:>10.3f} {stats['p50']:>10.3f} "
+                f"{stats['p95']:>10.3f} {stats['p99']:>10.3f} {stats['max']:>10.3f}"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+def main():
+    """Main function to summarize timing logs."""
+    args = parse_arguments()
+
+    try:
+        streams = [open(path, 'r') for path in args.logs] if args.logs else [sys.stdin]
+        summary = summarize(collect(read_records(streams), args.by_command))
+    except Exception as e:
+        print(f"Error reading timing logs: {str(e)}")
+        sys.exit(1)
+
+    if not summary:
+        print("No timing records found.")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_table(summary))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
 import * as vscode from 'vscode';
 import * as path from 'path';
 import * as fs from 'fs';
-import * as os from 'os';
-import { exec, spawn } from 'child_process';
-import { promisify } from 'util';
+import { callFramed, splitArgs } from './ipc';
 
-const execPromise = promisify(exec);
+// How long to wait for the agent script before killing it
+const AGENT_TIMEOUT_MS = 30000;
 
 export class ChatPanel {
   public static currentPanel: ChatPanel | undefined;
@@ -590,14 +589,6 @@ export class ChatPanel {
       return `Error: Agent script not found at ${resolvedScriptPath}\n\nCommand that would have been executed:\n${command}\n\nPlease check the 'dev-agent.scriptPath' setting in your VS Code settings.`;
     }
     
-    // Create a temporary file for the request data
-    const tempDir = path.join(os.tmpdir(), 'dev-agent');
-    if (!fs.existsSync(tempDir)) {
-      fs.mkdirSync(tempDir, { recursive: true });
-    }
-    
-    const tempFile = path.join(tempDir, `request_${Date.now()}.json`);
-    
     // Create the request data
     const requestData = {
       command: commandType,
@@ -606,29 +597,35 @@ export class ChatPanel {
       filePath: filePath,
       // Add new fields for the enhanced functionality
       prompt: userCommand,
-      input: fileContent
+      input: fileContent,
+      // Folders walked by "summarize workspace"
+      workspace_folders: (vscode.workspace.workspaceFolders || []).map(folder => folder.uri.fsPath),
+      // The agent gives up on its own (and stops its child processes) at the same deadline
+      timeout: AGENT_TIMEOUT_MS / 1000
     };
     
-    // Write the request data to the temporary file
-    fs.writeFileSync(tempFile, JSON.stringify(requestData, null, 2));
-    
-    // Construct the command
-    const command = `${pythonPath} "${resolvedScriptPath}" --input-file "${tempFile}" ${additionalArgs}`.trim();
+    // Construct the command; the request and the reply are frames on its stdin and stdout
+    const args = [resolvedScriptPath, '--framed', ...splitArgs(additionalArgs)];
+    const command = `${pythonPath} "${resolvedScriptPath}" --framed ${additionalArgs}`.trim();
     
     try {
       // Set a timeout for execution (30 seconds)
-      const timeoutMs = 30000;
+      const execution = callFramed(pythonPath, args, requestData);
+      let timer: NodeJS.Timeout | undefined;
       const timeoutPromise = new Promise<never>((_, reject) => {
-        setTimeout(() => reject(new Error('Agent script execution timed out after 30 seconds')), timeoutMs);
+        timer = setTimeout(() => {
+          // Stop the agent rather than leaving it running in the background
+          execution.child.kill('SIGTERM');
+          reject(new Error('Agent script execution timed out after 30 seconds'));
+        }, AGENT_TIMEOUT_MS);
       });
       
       // Execute the agent script with timeout
-      const execPromiseWithTimeout = Promise.race([
-        execPromise(command),
+      const { message, stderr } = await Promise.race([
+        execution.reply,
         timeoutPromise
-      ]);
-      
-      const { stdout, stderr } = await execPromiseWithTimeout as { stdout: string, stderr: string };
+      ]).finally(() => clearTimeout(timer));
+      const stdout = typeof message.response === 'string' ? message.response : JSON.stringify(message.response);
       
       if (stderr) {
         console.error('Agent script stderr:', stderr);
@@ -643,13 +640,6 @@ export class ChatPanel {
       
       // Return a detailed error message including the command that was executed
       return `Error executing agent script:\n${error instanceof Error ? error.message : String(error)}\n\nCommand executed:\n${command}\n\nPlease check your settings and ensure the script exists and is executable.`;
-    } finally {
-      // Clean up the temporary file
-      try {
-        fs.unlinkSync(tempFile);
-      } catch (error) {
-        console.error('Failed to delete temporary file:', error);
-      }
     }
   }
 
@@ -4,6 +4,7 @@ import * as fs from 'fs';
 import * as os from 'os';
 import { exec, spawn } from 'child_process';
 import { promisify } from 'util';
+import { callFramed, splitArgs } from './ipc';
 
 const execPromise = promisify(exec);
 
@@ -544,39 +545,25 @@ export class ChatViewProvider implements vscode.WebviewViewProvider {
         throw new Error(`Agent script not found at ${resolvedScriptPath}`);
       }
 
-      // Create a temporary file for the input
-      const tempDir = os.tmpdir();
-      const tempFile = path.join(tempDir, `dev_agent_input_${Date.now()}.json`);
-      
       // Create input data
       const inputData = {
         command: command,
         command_type: commandType,
         file_content: fileContent,
         file_path: filePath,
+        // Folders walked by "summarize workspace"
+        workspace_folders: (vscode.workspace.workspaceFolders || []).map(folder => folder.uri.fsPath),
         // For backward compatibility
         prompt: command,
         input: fileContent
       };
       
-      // Write input data to temp file
-      fs.writeFileSync(tempFile, JSON.stringify(inputData, null, 2));
-      
-      // Build the command
-      let cmd = `${pythonPath} "${resolvedScriptPath}" --input-file "${tempFile}"`;
-      if (additionalArgs) {
-        cmd += ` ${additionalArgs}`;
-      }
+      // Build the command; the request and the reply are frames on its stdin and stdout
+      const args = [resolvedScriptPath, '--framed', ...splitArgs(additionalArgs)];
       
       // Execute the command
-      const { stdout, stderr } = await execPromise(cmd, { maxBuffer: 10 * 1024 * 1024 });
-      
-      // Clean up temp file
-      try {
-        fs.unlinkSync(tempFile);
-      } catch (error) {
-        console.error('Failed to delete temp file:', error);
-      }
+      const { message, stderr } = await callFramed(pythonPath, args, inputData).reply;
+      const stdout = typeof message.response === 'string' ? message.response : JSON.stringify(message.response);
       
       if (stderr) {
         console.warn('Agent script stderr:', stderr);
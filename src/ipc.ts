@@ -0,0 +1,121 @@
+import { ChildProcess, spawn } from 'child_process';
+import * as zlib from 'zlib';
+
+// Frames as in dev_agent/ipc.py: a 4-byte big-endian header length, a compact
+// JSON header, then the raw segments the header lists under "_segments" as
+// [field, length, flags] ("z": deflated, "b": bytes rather than text)
+const SEGMENTS_KEY = '_segments';
+// Text fields at least this long travel as segments rather than JSON strings
+const SEGMENT_MIN_CHARS = 1024;
+
+export type Message = { [field: string]: unknown };
+
+// Segments of at least compressMin bytes are deflated when that makes them
+// smaller; without it (the default, right for local pipes) nothing is
+export function encodeFrame(message: Message, compressMin?: number): Buffer {
+  const header: Message = {};
+  const segments: Array<[string, number, string]> = [];
+  const payloads: Buffer[] = [];
+  for (const [field, value] of Object.entries(message)) {
+    if (value === undefined) {
+      continue;
+    }
+    let payload: Buffer;
+    let flags = '';
+    if (Buffer.isBuffer(value)) {
+      payload = value;
+      flags = 'b';
+    } else if (typeof value === 'string' && value.length >= SEGMENT_MIN_CHARS) {
+      payload = Buffer.from(value, 'utf8');
+    } else {
+      header[field] = value;
+      continue;
+    }
+    if (compressMin !== undefined && payload.length >= compressMin) {
+      const deflated = zlib.deflateSync(payload, { level: 1 });
+      if (deflated.length < payload.length) {
+        payload = deflated;
+        flags += 'z';
+      }
+    }
+    segments.push([field, payload.length, flags]);
+    payloads.push(payload);
+  }
+  if (segments.length > 0) {
+    header[SEGMENTS_KEY] = segments;
+  }
+  const json = Buffer.from(JSON.stringify(header), 'utf8');
+  const prefix = Buffer.alloc(4);
+  prefix.writeUInt32BE(json.length);
+  return Buffer.concat([prefix, json, ...payloads]);
+}
+
+// Returns the message of the frame at the start of data
+export function decodeFrame(data: Buffer): Message {
+  if (data.length < 4) {
+    throw new Error('No reply frame from the agent');
+  }
+  let offset = 4 + data.readUInt32BE(0);
+  if (offset > data.length) {
+    throw new Error(`Reply frame truncated after ${data.length} bytes`);
+  }
+  const message = JSON.parse(data.toString('utf8', 4, offset)) as Message;
+  const segments = (message[SEGMENTS_KEY] || []) as Array<[string, number, string]>;
+  delete message[SEGMENTS_KEY];
+  for (const [field, size, flags] of segments) {
+    if (offset + size > data.length) {
+      throw new Error(`Reply frame truncated in segment ${field}`);
+    }
+    let payload = data.subarray(offset, offset + size);
+    offset += size;
+    if (flags.includes('z')) {
+      payload = zlib.inflateSync(payload);
+    }
+    message[field] = flags.includes('b') ? payload : payload.toString('utf8');
+  }
+  return message;
+}
+
+export interface FramedCall {
+  child: ChildProcess;
+  reply: Promise<{ message: Message, stderr: string }>;
+}
+
+// Splits a command line setting such as dev-agent.additionalArgs into
+// arguments, on whitespace outside single or double quotes
+export function splitArgs(line: string): string[] {
+  const args: string[] = [];
+  const pattern = /"([^"]*)"|'([^']*)'|(\S+)/g;
+  let match: RegExpExecArray | null;
+  while ((match = pattern.exec(line)) !== null) {
+    args.push(match[1] ?? match[2] ?? match[3]);
+  }
+  return args;
+}
+
+// Runs the agent (with --framed among its args), sending the request as a
+// frame on its stdin and decoding the reply frame from its stdout. The
+// executable is started directly, without a shell, so that killing the child
+// stops the agent itself
+export function callFramed(executable: string, args: string[], request: Message): FramedCall {
+  const child = spawn(executable, args);
+  const stdout: Buffer[] = [];
+  const stderr: Buffer[] = [];
+  const reply = new Promise<{ message: Message, stderr: string }>((resolve, reject) => {
+    child.stdout!.on('data', (chunk: Buffer) => stdout.push(chunk));
+    child.stderr!.on('data', (chunk: Buffer) => stderr.push(chunk));
+    child.on('error', reject);
+    child.on('close', (code) => {
+      const errors = Buffer.concat(stderr).toString('utf8');
+      try {
+        resolve({ message: decodeFrame(Buffer.concat(stdout)), stderr: errors });
+      } catch (error) {
+        reject(new Error(`Agent exited with code ${code}: ${errors || (error instanceof Error ? error.message : String(error))}`));
+      }
+    });
+    // The agent may exit before reading everything, e.g. on a usage error
+    child.stdin!.on('error', () => undefined);
+    child.stdin!.end(encodeFrame(request));
+  });
+  return { child, reply };
+}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# agent_v2.py and the dev_agent package live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
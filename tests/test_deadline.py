@@ -0,0 +1,102 @@
+"""Tests for the deadlines and cancellation of dev_agent/deadline.py."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from dev_agent import deadline, ipc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+def test_token_expiry_and_cancellation():
+    token = deadline.CancelToken(timeout=60, deadline=time.time() + 0.05)
+    assert not token.cancelled and 0 < token.remaining() <= 0.05
+
+    time.sleep(0.06)
+
+    assert token.cancelled and token.timed_out and token.remaining() == 0
+    with pytest.raises(deadline.Cancelled, match="deadline exceeded"):
+        token.check()
+
+    cancelled = deadline.CancelToken()
+    cancelled.cancel("terminated")
+    cancelled.cancel()
+    assert cancelled.reason == "terminated" and not cancelled.timed_out and cancelled.remaining() is None
+
+def test_token_from_request_and_extend():
+    assert deadline.CancelToken.from_request({"timeout": "100"}, default_timeout=1).remaining() <= 1
+    assert deadline.CancelToken.from_request({"timeout": "soon"}).remaining() is None
+
+    token = deadline.CancelToken(timeout=1)
+    token.extend(deadline.CancelToken(timeout=100))
+    assert token.remaining() > 50
+    token.extend(deadline.CancelToken())
+    assert token.remaining() is None
+
+def test_checked_stops_at_the_active_token():
+    token = deadline.CancelToken()
+    seen = []
+
+    with pytest.raises(deadline.Cancelled):
+        with deadline.activate(token):
+            for item in deadline.checked(range(10)):
+                seen.append(item)
+                if item == 2:
+                    token.cancel()
+
+    assert seen == [0, 1, 2] and deadline.current() is None
+    deadline.check()
+
+def test_child_and_its_children_are_killed_past_the_deadline(tmp_path):
+    pids = tmp_path / "pids"
+    child = ("import subprocess, sys, time\n"
+             "grandchild = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+             f"open({str(pids)!r}, 'w').write(str(grandchild.pid))\n"
+             "time.sleep(60)\n")
+    process = subprocess.Popen([sys.executable, "-c", child], stdout=subprocess.PIPE, start_new_session=True)
+    started = time.monotonic()
+
+    with pytest.raises(deadline.Cancelled, match="deadline exceeded"):
+        deadline.communicate(process, deadline.CancelToken(timeout=1))
+
+    assert time.monotonic() - started < 1 + deadline.KILL_GRACE
+    assert process.returncode is not None
+    grandchild = int(pids.read_text())
+    stop = time.monotonic() + 5
+    while alive(grandchild) and time.monotonic() < stop:
+        time.sleep(0.05)
+    assert not alive(grandchild)
+
+def test_a_child_ignoring_sigterm_is_killed():
+    child = "import signal, time\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\nprint('ready', flush=True)\ntime.sleep(60)\n"
+    process = subprocess.Popen([sys.executable, "-c", child], stdout=subprocess.PIPE, start_new_session=True)
+    process.stdout.readline()
+
+    deadline.kill_process_group(process, grace=0.2)
+
+    assert process.returncode == -9
+
+def test_request_timeout_kills_executed_code(tmp_path):
+    pid_file = tmp_path / "pid"
+    code = f"import os, time\nopen({str(pid_file)!r}, 'w').write(str(os.getpid()))\ntime.sleep(60)\n"
+    request = {"command": "execute", "file_content": code, "timeout": 1}
+    started = time.monotonic()
+
+    result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "agent_v2.py"), "--framed"],
+                            input=b"".join(ipc.encode(request)), capture_output=True, timeout=30)
+
+    reply = ipc.decode(result.stdout)
+    assert result.returncode == 1
+    assert reply == {"status": "error", "response": "Error processing input: Request deadline exceeded"}
+    assert time.monotonic() - started < 15
+    assert not alive(int(pid_file.read_text()))
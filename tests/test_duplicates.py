@@ -0,0 +1,98 @@
+"""Tests for the winnowing duplicate finder of dev_agent/duplicates.py."""
+
+import random
+
+from dev_agent import duplicates
+
+ORIGINAL = """
+def total_price(items, tax_rate):
+    subtotal = 0
+    for item in items:
+        if item.quantity > 0:
+            subtotal += item.price * item.quantity
+    discount = subtotal * 0.1 if subtotal > 100 else 0
+    taxed = (subtotal - discount) * (1 + tax_rate)
+    return round(taxed, 2)
+"""
+
+# The same code with other names, constants and comments
+RENAMED = """
+def order_cost(lines, vat):
+    # Sum up the order
+    acc = 0
+    for line in lines:
+        if line.count > 0:
+            acc += line.cost * line.count
+    rebate = acc * 0.2 if acc > 250 else 0
+    gross = (acc - rebate) * (1 + vat)
+    return round(gross, 3)
+"""
+
+UNRELATED = """
+class Parser:
+    def __init__(self, text):
+        self.text = text
+        self.position = 0
+
+    def peek(self):
+        return self.text[self.position] if self.position < len(self.text) else None
+"""
+
+def test_tokens_ignore_names_constants_and_comments():
+    original, _ = duplicates.tokenize(ORIGINAL)
+    renamed, lines = duplicates.tokenize(RENAMED)
+
+    assert original == renamed
+    assert lines[0] == 2 and lines[-1] == 10
+    assert duplicates.tokenize('x = """a\nb"""\ny = 1')[1] == [1, 1, 1, 3, 3, 3]
+
+def test_winnowing_fingerprints_every_window():
+    generator = random.Random(7)
+    values = [generator.randrange(50) for _ in range(200)]
+
+    fingerprints = duplicates.winnow(values)
+    chosen = [index for _, index in fingerprints]
+
+    assert chosen == sorted(set(chosen))
+    kgrams = len(values) - duplicates.K_GRAM + 1
+    for start in range(kgrams - duplicates.WINDOW + 1):
+        assert any(start <= index < start + duplicates.WINDOW for index in chosen)
+    # Away from the edges, the same tokens elsewhere get the same fingerprints
+    shifted = {h for h, _ in duplicates.winnow([1, 2, 3] + values)}
+    assert {h for h, index in fingerprints if index >= duplicates.WINDOW} <= shifted
+    assert duplicates.winnow(values[:duplicates.K_GRAM - 1]) == []
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_renamed_copy_is_found(tmp_path):
+    body = ORIGINAL * 3
+    files = [(name, duplicates.fingerprint_file(write(tmp_path, name, text))[1])
+             for name, text in [("a.py", body), ("b.py", RENAMED * 3), ("c.py", UNRELATED * 3)]]
+
+    clusters = duplicates.find_clones(files)
+
+    assert clusters
+    names = {location[0] for cluster in clusters for location in cluster.locations}
+    assert {"a.py", "b.py"} <= names and "c.py" not in names
+    assert all(cluster.similarity >= duplicates.MIN_SIMILARITY for cluster in clusters)
+
+def test_scan_reuses_cached_fingerprints(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    write(project, "a.py", ORIGINAL * 3)
+    write(project, "b.py", RENAMED * 3)
+    write(project, "notes.md", ORIGINAL * 3)
+    cache = str(tmp_path / "cache.json")
+
+    first = duplicates.DuplicateReport([str(project)])
+    progress = list(duplicates.scan(first, cache, workers=1))
+    second = duplicates.DuplicateReport([str(project)])
+    list(duplicates.scan(second, cache, workers=1))
+
+    assert progress[0] == {"files_done": 0, "files_total": 2, "cached": 0}
+    assert second.cached == 2
+    assert [cluster.locations for cluster in second.clusters] == [cluster.locations for cluster in first.clusters]
+    assert first.clusters and {location[0] for location in first.clusters[0].locations} == {"a.py", "b.py"}
@@ -0,0 +1,15 @@
+"""Tests for the execute command of agent_v2.py."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import agent_v2
+
+def test_concurrent_executions_run_their_own_code():
+    codes = [f"print({number} * 2)" for number in range(4)]
+
+    with ThreadPoolExecutor(len(codes)) as pool:
+        responses = list(pool.map(lambda code: agent_v2.process_command("execute", code), codes))
+
+    for number, response in enumerate(responses):
+        assert response.lstrip().startswith("# Code Execution Result")
+        assert f"```\n{number * 2}\n" in response
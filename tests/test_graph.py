@@ -0,0 +1,44 @@
+"""Tests for the module graph of dev_agent/graph.py and the questions agent_v2 answers from it."""
+
+import pytest
+
+import agent_v2
+from dev_agent import graph
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "app.py").write_text("import util\n\ndef main():\n    util.helper()\n")
+    (tmp_path / "util.py").write_text("import app\nimport json\n\ndef helper():\n    return json.dumps({})\n")
+    (tmp_path / "leaf.py").write_text("from util import helper\n\ndef run():\n    helper()\n")
+    return tmp_path
+
+def test_import_cycles(workspace):
+    cycles = graph.get_graph([str(workspace)]).import_cycles()
+
+    assert len(cycles) == 1
+    assert sorted(cycles[0][:-1]) == [str(workspace / "app.py"), str(workspace / "util.py")]
+
+    response = agent_v2.process_command("import cycles", "", None, None, [str(workspace)])
+    assert "Found 1 import cycle" in response
+    assert "- `app.py` → `util.py` → `app.py`" in response
+
+def test_callers_and_transitive_imports(workspace):
+    callers = agent_v2.process_command("who calls helper?", "", None, None, [str(workspace)])
+    imports = agent_v2.process_command("transitive imports of leaf", "", None, None, [str(workspace)])
+
+    assert "- `app.main` in `app.py` line 4" in callers
+    assert "- `leaf.run` in `leaf.py` line 4" in callers
+    assert "imports 2 workspace modules (1 directly) and 1 external package" in imports
+
+def test_questions_about_this_file(workspace):
+    folders = [str(workspace)]
+    leaf = str(workspace / "leaf.py")
+
+    for prompt in ("transitive imports of this file", "show transitive imports of this module?",
+                   "transitive imports", "imports of nothing_like_it"):
+        response = agent_v2.process_command(prompt, "", leaf, None, folders)
+        assert "# Transitive Imports of `leaf.py`" in response, prompt
+        assert "imports 2 workspace modules (1 directly)" in response, prompt
+
+    assert "Found 1 import cycle" in agent_v2.process_command("Show  import cycles", "", None, None, folders)
+    assert agent_v2.ROUTER.classify("list all import cycles") == "graph"
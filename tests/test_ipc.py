@@ -0,0 +1,53 @@
+"""Tests for the length-prefixed frames of dev_agent/ipc.py."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from dev_agent import deadline, ipc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("compress_min", [None, 0])
+def test_round_trip(compress_min):
+    message = {"id": 7, "file_content": "def f():\n    return 'é'\n" * 500, "blob": b"\0\1" * 600,
+               "odd": "\ud800" * 2000, "short": "x", "nested": {"a": [1, 2]}}
+
+    buffers = ipc.encode(message, compress_min)
+
+    assert buffers[0][0] == 0
+    assert ipc.decode(b"".join(buffers)) == message
+
+def test_truncated_frame_is_an_error():
+    data = b"".join(ipc.encode({"file_content": "x" * 5000}))
+
+    with pytest.raises(ipc.FramingError):
+        ipc.decode(data[:-1])
+    assert ipc.decode(b"") is None
+
+def test_agent_answers_a_framed_request():
+    request = {"command": "explain", "file_content": "def f():\n    return 1\n" * 100, "file_path": "f.py"}
+    result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "agent_v2.py"), "--framed"],
+                            input=b"".join(ipc.encode(request)), capture_output=True, check=True)
+
+    reply = ipc.decode(result.stdout)
+
+    assert reply["status"] == "ok"
+    assert reply["response"].lstrip().startswith("# Code Explanation in f.py")
+
+def test_communicate_sends_input_to_a_slow_child_once():
+    child = ("import sys, time\n"
+             "from dev_agent import ipc\n"
+             "request = ipc.read_frame(sys.stdin.buffer)\n"
+             "time.sleep(0.3)\n"
+             "ipc.write_frame(sys.stdout.buffer, {'echo': request['file_content']})\n")
+    process = subprocess.Popen([sys.executable, "-c", child], cwd=REPO_ROOT, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+    with deadline.activate(deadline.CancelToken(timeout=30)):
+        stdout, _ = deadline.communicate(process, input=b"".join(ipc.encode({"file_content": "x" * 100000})))
+
+    assert ipc.decode(stdout) == {"echo": "x" * 100000}
+    assert process.returncode == 0
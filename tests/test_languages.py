@@ -0,0 +1,57 @@
+"""Tests for the language registry of dev_agent/languages.py."""
+
+import sys
+import types
+
+import pytest
+
+from dev_agent import languages
+from dev_agent.frontends import Frontend
+
+class KotlinFrontend(Frontend):
+    language = "Kotlin Script"
+
+    def overview(self, code):
+        return "is a Kotlin script"
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(languages, "EXTENSIONS", dict(languages.EXTENSIONS))
+    monkeypatch.setattr(languages, "FRONTENDS", dict(languages.FRONTENDS))
+    monkeypatch.setattr(languages, "_frontends", {})
+    monkeypatch.setattr(languages, "_plugins", None)
+
+def test_detect_by_extension_then_content():
+    assert languages.detect("", "pkg/Module.PY") == "Python"
+    assert languages.detect("def f():\n    import os\n", "script") == "Python"
+    assert languages.detect("<HTML><body></body></HTML>") == "HTML"
+    assert languages.detect("int x = f(y);\n{ }") == languages.SIGNATURES[-1][0]
+    assert languages.detect("plain words") == languages.UNKNOWN_LANGUAGE
+
+def test_frontends_are_loaded_once_on_first_use():
+    sys.modules.pop("dev_agent.frontends.outlined", None)
+
+    go = languages.frontend("Go")
+
+    assert "dev_agent.frontends.outlined" in sys.modules
+    assert type(go).__name__ == "OutlinedFrontend" and go.name == "Go"
+    assert languages.frontend("Go") is go
+    assert type(languages.frontend("Ruby")) is Frontend
+
+def test_register_replaces_a_loaded_frontend():
+    languages.frontend("Kotlin")
+    languages.register(".KTS", "Kotlin", "tests.test_languages:KotlinFrontend")
+
+    assert languages.detect("", "build.gradle.kts") == "Kotlin"
+    assert languages.frontend("Kotlin").overview("") == "is a Kotlin script"
+
+def test_unknown_extensions_come_from_plugins(monkeypatch):
+    reads = []
+    entry_point = types.SimpleNamespace(name=".KTS", value="tests.test_languages:KotlinFrontend",
+                                        load=lambda: KotlinFrontend)
+    monkeypatch.setattr(languages, "_entry_points", lambda: reads.append(1) or [entry_point])
+
+    assert languages.detect("", "build.kts") == "Kotlin Script"
+    assert languages.frontend("Kotlin Script").overview("") == "is a Kotlin script"
+    assert languages.detect("plain words", "notes.txt") == languages.UNKNOWN_LANGUAGE
+    assert reads == [1]
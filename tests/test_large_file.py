@@ -0,0 +1,98 @@
+"""Tests for memory-bounded large-file analysis."""
+
+import os
+import tracemalloc
+
+import pytest
+
+import agent_v2
+from dev_agent import large_file, pseudo_code
+
+BUDGET = 4 * 1024 * 1024
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_large_python_file(path, target_bytes=6 * 1024 * 1024):
+    block = "".join(
+        f"# comment {i}\nclass C{i}(Base):\n    def method_{i}(self, x):\n        if x:\n            print(x)\n        return x\n"
+        for i in range(1000)
+    )
+    with open(path, "w") as f:
+        for _ in range(target_bytes // len(block) + 1):
+            f.write(block)
+    return path
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(agent_v2, "MEMORY_BUDGET", BUDGET)
+    monkeypatch.setattr(agent_v2, "LARGE_FILE_THRESHOLD", 1024 * 1024)
+    return BUDGET
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize("command", ["explain", "summarize", "pseudo code", "what issues are there?"])
+def test_streaming_from_disk_stays_within_budget(tmp_path, budget, command):
+    path = write_large_python_file(str(tmp_path / "big.py"))
+
+    response, peak = peak_memory(agent_v2.process_command, command, "", path)
+
+    assert "Large file mode" in response or "too large to convert" in response
+    assert peak < budget
+
+def test_in_memory_content_stays_within_budget(tmp_path, budget):
+    path = write_large_python_file(str(tmp_path / "big.py"))
+    with open(path) as f:
+        content = f.read()
+
+    response, peak = peak_memory(agent_v2.process_command, "summarize", content, path)
+
+    assert f"approximately {len(content.split(chr(10)))} lines" in response
+    assert peak < budget
+
+def test_overlong_line_is_truncated(tmp_path):
+    limits = large_file.Limits(BUDGET)
+    path = tmp_path / "minified.js"
+    path.write_text("var a = 1;" * (limits.chunk_chars // 2) + "\nfunction tail() {}\n")
+
+    lines = list(large_file.iter_source_lines("", str(path), limits))
+
+    assert [len(line) for line in lines] == [limits.max_line_chars, len("function tail() {}"), 0]
+
+@pytest.mark.parametrize("path", ["test_script.py", "test_file.py", "agent_v2.py", "src/chatPanel.ts"])
+def test_matches_regular_analysis_on_small_files(path):
+    path = os.path.join(REPO_ROOT, path)
+    with open(path) as f:
+        content = f.read()
+    language = agent_v2.detect_language(content, path)
+    limits = large_file.Limits()
+    limits.chunk_chars = 4096
+
+    analysis = large_file.analyze(large_file.iter_chunks(content, path, limits), language, limits)
+
+    assert list(large_file.iter_source_lines(content, path, limits)) == content.split("\n")
+    assert large_file.render_overview(analysis, language) == agent_v2.get_code_overview(content, path)
+    assert large_file.render_components(analysis) == agent_v2.get_key_components(content)
+    assert large_file.render_issues(analysis) == agent_v2.get_potential_issues(content)
+    assert large_file.render_suggestions(analysis) == agent_v2.get_improvement_suggestions(content)
+    assert large_file.render_file_summary(analysis, language) == agent_v2.get_file_summary(content, path)
+    assert large_file.render_key_points(analysis) == agent_v2.get_key_points(content)
+    symbols = large_file.outline_symbols(content, path, language, limits)
+    assert large_file.render_structure(analysis, language, symbols) == agent_v2.get_file_structure(content, path)
+
+@pytest.mark.parametrize("path", ["test_script.py", "agent_v2.py", "dev_agent/lines.py"])
+def test_pseudo_code_in_top_level_chunks_matches_one_pass(path):
+    with open(os.path.join(REPO_ROOT, path)) as f:
+        content = f.read()
+    limits = large_file.Limits()
+    limits.chunk_chars = 4096
+
+    chunks = list(pseudo_code.top_level_chunks(large_file.iter_chunks(content, path, limits), 2048))
+
+    assert len(chunks) > 1 and "\n".join(chunks) == content
+    converted = (pseudo_code.convert(chunk) for chunk in chunks)
+    assert "\n".join(text for text in converted if text) == pseudo_code.convert(content)
@@ -0,0 +1,55 @@
+"""Tests for the line index of dev_agent/lines.py."""
+
+import mmap
+
+import pytest
+
+from dev_agent.lines import LineIndex, Span, stripped_lines
+
+TEXT = "first\n\nthird line\nlast"
+
+@pytest.mark.parametrize("text", [TEXT, TEXT + "\n", "", "\n", "only"])
+def test_lines_match_split(text):
+    index = LineIndex(text)
+    expected = text.split("\n")
+
+    assert len(index) == len(expected)
+    assert list(index) == expected
+    assert [index.line(number) for number in range(1, len(expected) + 1)] == expected
+    assert list(index.lines(2, 99)) == expected[1:]
+    assert list(index.lines(3, 2)) == []
+
+def test_bytes_and_mmap_buffers(tmp_path):
+    data = "é\nzwei\n".encode("utf-8")
+    path = tmp_path / "data.txt"
+    path.write_bytes(data)
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for buffer in (data, mapped):
+            index = LineIndex(buffer)
+            assert [bytes(line) for line in index] == data.split(b"\n")
+            assert isinstance(index.line(1), memoryview)
+            del index
+
+def test_offsets_and_spans():
+    index = LineIndex(TEXT)
+
+    assert [index.line_of(offset) for offset in (0, 5, 6, 7, len(TEXT))] == [1, 1, 2, 3, 4]
+    assert (index.start(3), index.end(3)) == (7, 17)
+    assert TEXT[index.start(4):index.end(4)] == "last"
+    assert repr(index.span(TEXT.index("third"), TEXT.index("last") + 2)) == "Span(3, 4)"
+    # The newline ending a line belongs to that line
+    assert repr(index.span(0, 6)) == "Span(1, 1)"
+    with pytest.raises(IndexError):
+        index.line(5)
+
+def test_span():
+    assert Span(3).end_line == 3 and Span(3).line_count == 1
+    assert Span(2, 5).overlaps(Span(5, 9)) and Span(5, 9).overlaps(Span(2, 5))
+    assert not Span(2, 4).overlaps(Span(5, 9))
+
+def test_stripped_lines():
+    text = "import os\n  from x import y\nimported = 1\n    import\t\nprint('import')\n"
+
+    assert list(stripped_lines(text, "import ", "from ")) == ["import os", "from x import y"]
+    assert list(stripped_lines(text, "import")) == ["import os", "imported = 1", "import"]
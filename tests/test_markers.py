@@ -0,0 +1,69 @@
+"""Tests for the issue marker index of dev_agent/markers.py."""
+
+import os
+import subprocess
+
+import pytest
+
+import agent_v2
+from dev_agent import markers
+
+GIT_ENV = {"GIT_AUTHOR_NAME": "alice", "GIT_AUTHOR_EMAIL": "alice@example.com",
+           "GIT_COMMITTER_NAME": "alice", "GIT_COMMITTER_EMAIL": "alice@example.com",
+           "GIT_AUTHOR_DATE": "2001-01-01T00:00:00", "GIT_COMMITTER_DATE": "2001-01-01T00:00:00"}
+
+def git(root, *args):
+    subprocess.run(["git", "-C", str(root), *args], env={**os.environ, **GIT_ENV}, capture_output=True, check=True)
+
+@pytest.fixture
+def checkout(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "old.py").write_text("# FIXME: handle errors\ndef f():\n    print('debug')\n")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "Initial commit")
+    (tmp_path / "new.py").write_text("try:\n    pass\nexcept:\n    pass\n")
+    return tmp_path
+
+def test_parse_query():
+    query = markers.parse_query("all FIXMEs under ./src/ older than 3 months by alice")
+
+    assert query.kinds == {"FIXME"}
+    assert query.under == "src"
+    assert (query.min_age_days, query.max_age_days, query.author) == (90, None, "alice")
+    assert markers.parse_query("TODOs in the last 2 weeks").max_age_days == 14
+
+def test_scan_and_blame(checkout):
+    index = markers.MarkerIndex([str(checkout)], cache_path=str(checkout / "cache.json"))
+    index.refresh()
+
+    old = index.query(markers.parse_query("FIXMEs older than 90 days"))
+    everything = index.query(markers.Query())
+
+    assert [(marker.name, marker.line, marker.author) for marker in old] == [("src/old.py", 1, "alice")]
+    assert [(marker.name, marker.line, marker.kind) for marker in everything] == [
+        ("new.py", 3, "bare except"), ("src/old.py", 1, "FIXME"), ("src/old.py", 3, "print")]
+    # Blame cached by the first query does not leak into the second
+    assert not any(marker.blamed for marker in everything)
+
+def test_blame_columns_only_for_queries_that_need_blame(checkout):
+    folders = [str(checkout)]
+    by_age = agent_v2.process_command("all FIXMEs under src/ older than 90 days", "", None, None, folders)
+    prints = agent_v2.process_command("leftover prints", "", None, None, folders)
+    recent = agent_v2.process_command("bare excepts in the last 30 days", "", None, None, folders)
+
+    assert "| Author | Date |" in by_age and "| alice | 2001-01-01 |" in by_age
+    assert "Author" not in prints
+    assert "| not committed |" in recent
+
+def test_comment_starts_in_strings_are_not_markers(tmp_path):
+    python = tmp_path / "scan.py"
+    python.write_text('PATTERN = r"(?:#|//)\\s*TODO"\n'
+                      '"""Docstring\n# FIXME: not a comment\n"""\n'
+                      '# markers ("TODO" in text) are mentions\n'
+                      "url = 'http://example.com'  # HACK: real\n")
+    script = tmp_path / "app.ts"
+    script.write_text("const url = `http://${host}/x`; // TODO: check\nconst s = '// FIXME';\n")
+
+    assert markers.scan_file(str(python), "Python") == [[6, "HACK", "real"]]
+    assert markers.scan_file(str(script), "TypeScript") == [[1, "TODO", "check"]]
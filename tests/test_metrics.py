@@ -0,0 +1,88 @@
+"""Tests for the metrics of dev_agent/metrics.py and the resident server's JSON-line protocol."""
+
+import json
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from dev_agent import metrics, server
+
+def test_counters_sum_the_shards_of_every_thread():
+    registry = metrics.Registry()
+    counter = metrics.Counter("test_total", "Test counter.", ("kind",), registry=registry)
+
+    threads = [threading.Thread(target=lambda: [counter.labels("a").inc() for _ in range(100)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.labels("b").inc(2)
+
+    assert counter.value("a") == 400 and counter.value("b") == 2
+    with pytest.raises(ValueError):
+        counter.labels("a", "extra")
+    with pytest.raises(ValueError):
+        counter.inc()
+
+def test_exposition_format():
+    registry = metrics.Registry()
+    histogram = metrics.Histogram("test_seconds", "Test histogram.", buckets=(0.1, 1.0), registry=registry)
+    gauge = metrics.Gauge("test_gauge", "Test gauge.", ("name",), registry=registry)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    gauge.labels('say "hi"').set(1.5)
+    gauge.labels("broken").set_function(lambda: 1 / 0)
+
+    lines = registry.exposition().splitlines()
+
+    assert lines[:2] == ["# HELP test_seconds Test histogram.", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_seconds_sum 5.55" in lines and "test_seconds_count 3" in lines
+    assert 'test_gauge{name="say \\"hi\\""} 1.5' in lines
+    assert not any("broken" in line for line in lines)
+
+def test_metrics_endpoint():
+    registry = metrics.Registry()
+    metrics.Counter("test_total", "Test counter.", registry=registry).inc()
+    http = metrics.start_metrics_server(port=0, registry=registry)
+    try:
+        url = "http://127.0.0.1:%d/metrics" % http.server_address[1]
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+            assert "test_total 1" in response.read().decode("utf-8")
+    finally:
+        http.shutdown()
+        http.server_close()
+
+@pytest.fixture
+def address():
+    def handler(request):
+        if request["command"] == "slow":
+            time.sleep(1)
+        return request["command"].upper()
+
+    agent = server.AgentServer(handler, lambda request: ("explain", None), workers=2, request_timeout=0.2)
+    agent.start()
+    tcp = server._TCPServer(("127.0.0.1", 0), type("RequestHandler", (server._RequestHandler,), {"agent": agent}))
+    threading.Thread(target=tcp.serve_forever, daemon=True).start()
+    yield tcp.server_address
+    tcp.shutdown()
+    tcp.server_close()
+    agent.stop()
+
+def test_json_line_requests(address):
+    with socket.create_connection(address, timeout=5) as connection:
+        connection.sendall(b'{"id": 1, "command": "explain"}\n\nnot json\n[1]\n{"id": 2, "command": "slow"}\n')
+        connection.shutdown(socket.SHUT_WR)
+        replies = [json.loads(line) for line in connection.makefile("rb")]
+
+    assert replies[0] == {"id": 1, "status": "ok", "response": "EXPLAIN", "cached": False, "coalesced": False}
+    assert [reply["status"] for reply in replies[1:3]] == ["error", "error"]
+    assert replies[1]["response"].startswith("Error parsing request:")
+    assert replies[3]["id"] == 2 and replies[3]["status"] == "timeout"
@@ -0,0 +1,76 @@
+"""Tests for the single-pass source outline of dev_agent/outline.py."""
+
+from dev_agent import outline
+
+def symbols(text, language):
+    return [(depth, symbol.kind, symbol.name, symbol.start_line, symbol.end_line)
+            for depth, symbol in outline.iter_symbols(outline.outline(text, language))]
+
+JS = """const s = "{ not a brace";
+const t = `template ${ {a: 1}.a } with } brace`;
+const re = /[{}]+/g;
+// class Fake {
+/* function fake() { */
+class Shape {
+  area() {
+    return s.length / 2;
+  }
+  static of({ w, h }) {
+    return new Shape();
+  }
+}
+function draw(x) {
+  const ratio = x / 2; const y = ratio / 3;
+  return y;
+}
+export const handler = async (event) => {
+  return event;
+};
+"""
+
+def test_javascript_literals_do_not_open_symbols():
+    assert symbols(JS, "JavaScript") == [
+        (0, "class", "Shape", 6, 13),
+        (1, "method", "area", 7, 9),
+        (1, "method", "of", 10, 12),
+        (0, "function", "draw", 14, 17),
+        (0, "function", "handler", 18, 20),
+    ]
+
+def test_c_strings_characters_and_preprocessor_branches():
+    text = """#include <stdio.h>
+struct node { int v; };
+static int add(int a, int b) {
+    const char *s = "{";
+    char c = '}';
+    return a + b;
+}
+#if X
+int f() {
+#else
+int f(int a) {
+#endif
+    return 0;
+}
+"""
+    assert symbols(text, "C") == [(0, "struct", "node", 2, 2), (0, "function", "add", 3, 7),
+                                  (0, "function", "f", 9, 14)]
+
+def test_go_rust_and_java():
+    go = "package main\n\ntype Point struct {\n\tX int\n}\n\nfunc (p *Point) Move(dx int) {\n\ts := \"}\"\n}\n"
+    rust = "impl Foo {\n    fn new() -> Self { Foo {} }\n}\ntrait Bar { fn b(&self); }\n"
+    java = 'public class A {\n    String s = """\n        } text {\n        """;\n    public void run() { }\n}\n'
+
+    assert symbols(go, "Go") == [(0, "struct", "Point", 3, 5), (0, "method", "Point.Move", 7, 9)]
+    assert symbols(rust, "Rust") == [(0, "impl", "Foo", 1, 3), (1, "method", "new", 2, 2), (0, "trait", "Bar", 4, 4)]
+    assert symbols(java, "Java") == [(0, "class", "A", 1, 6), (1, "method", "run", 5, 5)]
+
+def test_unclosed_input_and_other_languages():
+    assert symbols("function f() {\n  const s = `unterminated ${", "JavaScript")[0][:3] == (0, "function", "f")
+    assert outline.outline("def f(): pass", "Python") is None
+
+def test_render_outline_limits_depth_and_count():
+    rendered = outline.render_outline(outline.outline(JS, "JavaScript"), max_symbols=2, max_depth=1)
+
+    assert rendered.split("\n") == ["- Class `Shape` (lines 6-13)", "- Function `draw` (lines 14-17)",
+                                    "- ... and 3 more"]
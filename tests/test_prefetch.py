@@ -0,0 +1,50 @@
+"""Tests for prefetching responses for the active file into the resident agent's result cache."""
+
+import time
+
+import pytest
+
+import agent_v2
+from dev_agent.server import AgentServer
+
+CODE = "import os\r\n\r\ndef main():\r\n    print(os.getcwd())\r\n"
+
+@pytest.fixture
+def agent():
+    agent = AgentServer(agent_v2.handle_request, agent_v2.describe_request, workers=2,
+                        expand_prefetch=agent_v2.expand_prefetch)
+    agent.start()
+    yield agent
+    agent.stop()
+
+def test_prefetched_responses_answer_later_requests(agent, tmp_path):
+    path = tmp_path / "main.py"
+    path.write_bytes(CODE.encode("utf-8"))
+    requests = [{"command": command, "file_content": CODE, "file_path": str(path)} for command in ("explain", "summarize")]
+    keys = [agent.describe(request)[1] for request in requests]
+
+    assert agent.prefetch({"file_path": str(path)}) == 2
+    stop = time.monotonic() + 10
+    while not all(key in agent.cache for key in keys) and time.monotonic() < stop:
+        time.sleep(0.01)
+    # Already cached: nothing is queued again
+    assert agent.prefetch({"file_path": str(path)}) == 0
+
+    for request in requests:
+        reply = agent.submit(request)
+        assert reply["cached"] and reply["status"] == "ok"
+        assert reply["response"] == agent_v2.process_command(request["command"], CODE, str(path))
+
+def test_files_that_are_not_prefetched(monkeypatch, tmp_path):
+    large = tmp_path / "large.py"
+    large.write_text("x = 1\n" * 100)
+    binary = tmp_path / "data.py"
+    binary.write_bytes(b"\xff\xfe\x00")
+    monkeypatch.setattr(agent_v2, "LARGE_FILE_THRESHOLD", 100)
+
+    assert agent_v2.expand_prefetch({"file_path": str(large)}) == []
+    assert agent_v2.expand_prefetch({"file_path": str(binary)}) == []
+    assert agent_v2.expand_prefetch({"file_path": str(tmp_path / "missing.py")}) == []
+    assert agent_v2.expand_prefetch({"file_content": "x" * 101}) == []
+    assert [request["command"] for request in agent_v2.expand_prefetch(
+        {"file_content": "x = 1", "commands": ["summarize", "execute"]})] == ["summarize"]
@@ -0,0 +1,53 @@
+"""Tests for the change-scoped review of dev_agent/changes.py and agent_v2.py."""
+
+import os
+import subprocess
+
+import pytest
+
+import agent_v2
+from dev_agent import changes
+
+GIT_ENV = {"GIT_AUTHOR_NAME": "alice", "GIT_AUTHOR_EMAIL": "alice@example.com",
+           "GIT_COMMITTER_NAME": "alice", "GIT_COMMITTER_EMAIL": "alice@example.com"}
+
+def git(root, *args):
+    subprocess.run(["git", "-C", str(root), *args], env={**os.environ, **GIT_ENV}, capture_output=True, check=True)
+
+@pytest.fixture
+def checkout(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    (tmp_path / "app.py").write_text("class Greeter:\n    def greet(self):\n        return 1\n\ndef other():\n    pass\n")
+    (tmp_path / "README.md").write_text("# App\n\nEach line is one `request`:\n\nold text\n")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "Initial commit")
+    git(tmp_path, "commit", "-q", "--allow-empty", "-m", "Empty")
+    (tmp_path / "app.py").write_text("class Greeter:\n    def greet(self):\n        # Say hello first\n"
+                                     "        print('hello')\n        return 1\n\ndef other():\n    pass\n")
+    (tmp_path / "README.md").write_text("# App\n\nEach line is one `request`:\n\nnew text\n")
+    return tmp_path
+
+def test_diff_and_changed_definitions(checkout):
+    file_changes = {change.path: change for change in changes.diff(str(checkout), "HEAD")}
+    change = file_changes["app.py"]
+
+    assert sorted(file_changes) == ["README.md", "app.py"]
+    assert (change.added, change.removed) == (2, 0)
+    assert changes.changed_definitions((checkout / "app.py").read_text(), changes.changed_ranges(change)) == ["Greeter.greet"]
+
+@pytest.mark.parametrize("prompt", ["review", "review changes", "Review my changes against HEAD~1"])
+def test_review_prompts(checkout, prompt):
+    response = agent_v2.process_command(prompt, "", None, None, [str(checkout)])
+
+    base = "HEAD~1" if "HEAD~1" in prompt else "HEAD"
+    assert response.lstrip().startswith(f"# Change Review against `{base}`")
+    assert "- Changed definitions: `Greeter.greet`" in response
+    assert "- Added comments: Say hello first" in response
+    assert "- Contains print statements which might be left from debugging" in response
+    # Git's guess at a function context in a Markdown file is arbitrary text
+    assert "Changed in" not in response
+
+def test_inline_code():
+    assert agent_v2.inline_code("def f():") == "`def f():`"
+    assert agent_v2.inline_code("one `request`") == "`` one `request` ``"
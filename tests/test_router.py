@@ -0,0 +1,74 @@
+"""Tests for the command router of dev_agent/router.py."""
+
+import types
+
+import agent_v2
+from dev_agent import router
+from dev_agent.router import Request, Router
+
+def make_router():
+    commands = Router(default="custom")
+    commands.register("custom", (), lambda request: ("custom", request.rest))
+    commands.register("explain", ("explain", "explain code"), lambda request: ("explain", request.rest))
+    commands.register("explain_this", ("explain this",), lambda request: ("explain_this", request.rest))
+    commands.register("test", ("test",), lambda request: ("test", request.rest), word=True)
+    commands.register("hidden", ("hidden",), lambda request: "hidden", typed=False)
+    return commands
+
+def test_longest_prefix_wins():
+    commands = make_router()
+
+    assert commands.classify("explain") == "explain"
+    assert commands.classify("  EXPLAIN   this file") == "explain_this"
+    assert commands.classify("explain\tcode please") == "explain"
+    assert commands.classify("explainer") == "explain"
+    assert commands.classify("what is this?") == "custom"
+
+def test_word_prefixes_end_at_a_word_boundary():
+    commands = make_router()
+
+    assert commands.classify("test the parser") == "test"
+    assert commands.classify("test") == "test"
+    assert commands.classify("testing the parser") == "custom"
+
+def test_command_type_selects_typed_commands_only():
+    commands = make_router()
+
+    assert commands.classify("anything", "explain") == "explain"
+    assert commands.classify("explain", "hidden") == "explain"
+    assert commands.classify("explain", "unknown") == "explain"
+
+def test_dispatch_sets_rest_and_args():
+    commands = make_router()
+    commands.register("echo", ("echo",), "tests.test_router:echo", parse=lambda request: request.rest.split())
+
+    assert commands.dispatch(Request("  Explain this   the parser ")) == ("explain_this", "the parser")
+    assert commands.dispatch(Request("echo a b")) == ["a", "b"]
+    assert commands.dispatch(Request("hello", command_type="test")) == ("test", "hello")
+    assert isinstance(commands.commands["echo"].handler, types.FunctionType)
+
+def echo(request):
+    return request.args
+
+def test_plugins_are_only_read_by_load_plugins(monkeypatch):
+    reads = []
+    plugin = types.SimpleNamespace(name="echo", value="tests.test_router:echo")
+    builtin = types.SimpleNamespace(name="explain", value="tests.test_router:echo")
+    monkeypatch.setattr(router, "_entry_points", lambda: reads.append(1) or [plugin, builtin])
+    commands = make_router()
+
+    assert commands.classify("echo hi") == "custom" and reads == []
+    assert commands.load_plugins() and commands.load_plugins()
+    assert reads == [1]
+    assert commands.classify("echo hi") == "echo"
+    assert commands.dispatch(Request("explain")) == ("explain", "")
+
+def test_review_base_is_parsed_from_the_prompt():
+    def base(prompt):
+        return agent_v2.review_base(Request(prompt))
+
+    assert base("review") == "HEAD"
+    assert base("review my changes against main") == "main"
+    assert base("review since `v1.2`?") == "v1.2"
+    assert agent_v2.ROUTER.classify("reviewer notes") == "custom"
+    assert agent_v2.ROUTER.classify("Review the diff") == "review"
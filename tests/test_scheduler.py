@@ -0,0 +1,55 @@
+"""Tests for the priority scheduler of dev_agent/scheduler.py."""
+
+import pytest
+
+from dev_agent import scheduler
+
+def test_more_urgent_classes_run_first():
+    jobs = scheduler.Scheduler(workers=4, aging_seconds=3600)
+    for item, priority in (("b1", "batch"), ("p1", "prefetch"), ("i1", "interactive"), ("i2", "interactive")):
+        jobs.put(item, priority)
+
+    assert [jobs.get() for _ in range(3)] == [("interactive", "i1"), ("interactive", "i2"), ("prefetch", "p1")]
+
+def test_one_worker_is_kept_for_interactive_requests():
+    jobs = scheduler.Scheduler(workers=2, aging_seconds=3600)
+    jobs.put("b1", "batch")
+    jobs.put("p1", "prefetch")
+    assert jobs.get() == ("prefetch", "p1")
+
+    # The only other worker is reserved: the batch job waits while an interactive one may run
+    assert jobs._select() is None
+    jobs.put("i1", "interactive")
+    assert jobs.get() == ("interactive", "i1")
+    jobs.done("prefetch")
+    jobs.done("interactive")
+    assert jobs.get() == ("batch", "b1")
+
+def test_waiting_background_jobs_age(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: clock[0])
+    jobs = scheduler.Scheduler(workers=4, aging_seconds=5)
+    jobs.put("b1", "batch")
+    clock[0] += 11
+    jobs.put("i1", "interactive")
+
+    # Waiting 11 s took the batch job more than two classes up
+    assert jobs.get() == ("batch", "b1")
+
+def test_full_queue_rejects_and_promote_moves_up():
+    jobs = scheduler.Scheduler(workers=4, max_queued={"prefetch": 2}, aging_seconds=3600)
+    first, second = object(), object()
+    jobs.put(first, "prefetch")
+    jobs.put(second, "prefetch")
+    with pytest.raises(scheduler.Overloaded):
+        jobs.put(object(), "prefetch")
+
+    assert jobs.promote(second, "interactive")
+    assert jobs.get() == ("interactive", second)
+    assert jobs.depth("prefetch") == 1
+
+def test_close_wakes_workers():
+    jobs = scheduler.Scheduler(workers=1)
+    jobs.close()
+
+    assert jobs.get() is None
@@ -0,0 +1,87 @@
+"""Tests for the response sections of dev_agent/sections.py and the formats agent_v2 renders them in."""
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import agent_v2
+from dev_agent import ipc
+from dev_agent.sections import Progress, Response, heading, iter_frames, paragraph, table
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = "import os\n\nclass Greeter:\n    def greet(self, name):\n        print(name)\n        return name\n"
+
+# What the explain command printed before responses were built from sections
+LEGACY_EXPLAIN = """
+# Code Explanation in greeter.py
+
+This code appears to be Python.
+
+## Overview
+The code defines one or more Python classes.
+
+## Key Components
+- Import: `import os`
+- Class: `Greeter`
+- Function: `greet`
+
+## Potential Issues
+- Contains print statements which might be left from debugging
+- Limited or no comments/documentation
+
+## Suggestions for Improvement
+- Add comments or docstrings to improve code readability
+- Consider replacing print statements with proper logging
+"""
+
+def test_markdown_is_the_legacy_output():
+    response = agent_v2.build_response("explain", CODE, "greeter.py")
+
+    assert response.to_markdown() == LEGACY_EXPLAIN
+    assert agent_v2.process_command("explain", CODE, "greeter.py") == LEGACY_EXPLAIN
+
+def test_sections_format():
+    reply = agent_v2.handle_request({"command": "explain", "file_content": CODE, "file_path": "greeter.py",
+                                     "response_format": "sections", "include_markdown": True})
+
+    sections = reply["sections"]
+    assert reply["format"] == "sections" and reply["markdown"] == LEGACY_EXPLAIN
+    assert sections[0] == {"id": "title", "type": "heading", "level": 1, "text": "Code Explanation in greeter.py",
+                           "bytes": len("# Code Explanation in greeter.py")}
+    assert len({section["id"] for section in sections}) == len(sections)
+    assert [section["id"] for section in sections[1:4]] == ["language", "overview-heading", "overview"]
+    components = next(section for section in sections if section["id"] == "key-components")
+    assert components["type"] == "list"
+    assert components["items"] == ["Import: `import os`", "Class: `Greeter`", "Function: `greet`"]
+    assert json.loads(json.dumps(reply)) == reply
+
+def test_frames_add_up_to_the_document():
+    sections = [heading("title", "Report", level=1), Progress("scan", {"files": 3}),
+                paragraph("summary", "Süß"), heading("details-heading", "Details"),
+                table("details", ["name", "count"], [["a", 1]])]
+
+    frames = list(iter_frames(sections))
+
+    assert [frame["event"] for frame in frames] == ["section", "progress", "section", "section", "section", "done"]
+    assert frames[1]["progress"] == {"files": 3, "id": "scan"}
+    assert [frame["seq"] for frame in frames if frame["event"] == "section"] == [0, 1, 2, 3]
+    assert frames[-1]["sections"] == 4
+    assert "".join(frame.get("markdown", "") for frame in frames) == Response(sections).to_markdown()
+    assert frames[2]["section"]["bytes"] == len("Süß".encode("utf-8"))
+
+def test_streamed_frames_from_the_agent():
+    request = {"command": "explain", "file_content": CODE, "file_path": "greeter.py"}
+    result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "agent_v2.py"), "--framed", "--stream"],
+                            input=b"".join(ipc.encode(request)), capture_output=True, check=True)
+
+    frames = []
+    stream = io.BytesIO(result.stdout)
+    while (frame := ipc.read_frame(stream)) is not None:
+        frames.append(frame)
+
+    assert frames[0]["event"] == "section" and frames[0]["section"]["id"] == "title"
+    assert frames[-1]["event"] == "done"
+    assert "".join(frame["markdown"] for frame in frames) == LEGACY_EXPLAIN
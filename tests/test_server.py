@@ -0,0 +1,108 @@
+"""Tests for request coalescing and the result cache of dev_agent/server.py."""
+
+import threading
+import time
+
+from dev_agent.cache import ResultCache, request_key
+from dev_agent.server import AgentServer
+
+def describe(request):
+    return "explain", request.get("key")
+
+def wait_for(condition, timeout=5):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    assert condition()
+
+def test_identical_requests_share_one_computation():
+    release = threading.Event()
+    calls = []
+
+    def handler(request):
+        calls.append(request["key"])
+        release.wait(5)
+        return "answer"
+
+    agent = AgentServer(handler, describe, workers=2)
+    agent.start()
+    try:
+        replies = []
+        threads = [threading.Thread(target=lambda i=i: replies.append(agent.submit({"id": i, "key": "k"})))
+                   for i in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: "k" in agent._pending and len(agent._pending["k"].waiters) == 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert calls == ["k"]
+        assert [reply["response"] for reply in replies] == ["answer"] * 3
+        assert sorted(reply["coalesced"] for reply in replies) == [False, True, True]
+
+        again = agent.submit({"id": 3, "key": "k"})
+        assert again["cached"] and again["response"] == "answer" and calls == ["k"]
+    finally:
+        release.set()
+        agent.stop()
+
+def test_requests_without_a_key_are_never_shared():
+    calls = []
+    agent = AgentServer(lambda request: calls.append(1) or "fresh", describe, workers=1)
+    agent.start()
+    try:
+        assert agent.submit({"id": 1})["response"] == "fresh"
+        assert not agent.submit({"id": 2})["cached"]
+        assert len(calls) == 2 and len(agent.cache) == 0
+    finally:
+        agent.stop()
+
+def test_errors_are_reported_and_not_cached():
+    def handler(request):
+        raise ValueError("boom")
+
+    agent = AgentServer(handler, describe, workers=1)
+    agent.start()
+    try:
+        reply = agent.submit({"id": 1, "key": "k"})
+        assert reply["status"] == "error" and "boom" in reply["response"]
+        assert "k" not in agent.cache
+    finally:
+        agent.stop()
+
+def test_request_key_covers_every_input():
+    base = request_key("explain", "explain", "x = 1\n", "a.py")
+
+    assert base == request_key("explain", "explain", "x = 1\n", "a.py")
+    assert base != request_key("explain", "explain", "x = 2\n", "a.py")
+    assert base != request_key("explain", "explain", "x = 1\n", "b.py")
+    assert base != request_key("explain", "explain", "x = 1\n", "a.py", "json")
+
+def test_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+    sized = ResultCache(max_bytes=10)
+    sized.put("a", "12345")
+    sized.put("b", "12345")
+    sized.put("c", "12")
+    sized.put("huge", "x" * 11)
+    assert "a" not in sized and "huge" not in sized and sized.size_bytes == 7
+
+def test_speculative_entries_have_their_own_budget():
+    cache = ResultCache(max_bytes=100, speculative_bytes=4)
+    cache.put("asked", "12345")
+    cache.put("guess", "1234", speculative=True)
+    cache.put("other", "1234", speculative=True)
+
+    assert "asked" in cache and "guess" not in cache
+    assert cache.lookup("other") == ("1234", True)
+    assert cache.lookup("other") == ("1234", False)
+    cache.put("asked", "changed", speculative=True)
+    assert cache.get("asked") == "12345"
@@ -0,0 +1,55 @@
+"""Tests for the chat sessions of the resident agent."""
+
+import pytest
+
+import agent_v2
+from dev_agent import sessions
+
+CODE = "import os\n\nclass Greeter:\n    def greet(self, name):\n        print(name)\n        return name\n"
+
+@pytest.fixture
+def store(monkeypatch):
+    store = sessions.SessionStore()
+    monkeypatch.setattr(agent_v2, "SESSIONS", store)
+    return store
+
+def ask(request):
+    return agent_v2.handle_request(agent_v2.prepare_request(request))
+
+def test_follow_up_reuses_the_file_and_its_analyses(store):
+    first = ask({"command": "explain", "file_content": CODE, "file_path": "greeter.py", "session_id": "s"})
+    file = store.find("s").current_file()
+    # Only a result reused from the session can contain this
+    file.analyses[("get_potential_issues", (), ())] = "- Reused issue"
+
+    follow_up = ask({"command": "what issues are there?", "session_id": "s"})
+
+    assert first.lstrip().startswith("# Code Explanation in greeter.py")
+    assert "- Reused issue" in follow_up
+    assert ask({"command": "explain", "session_id": "s"}) == first
+    assert "- Reused issue" not in ask({"command": "what issues are there?", "file_content": CODE})
+
+def test_sessions_are_separate(store):
+    ask({"command": "explain", "file_content": CODE, "file_path": "greeter.py", "session_id": "a"})
+
+    request = agent_v2.prepare_request({"command": "pseudo code", "session_id": "b"})
+
+    assert request.get("file_content", "") == ""
+    assert store.find("a").current_file().path == "greeter.py"
+
+def test_session_memory_cap_and_idle_expiry(monkeypatch):
+    session = sessions.Session("s", max_bytes=3000)
+    first = session.add_file("a" * 1000, "a.py")
+    session.add_file("b" * 1000, "b.py")
+    session.add_response(("explain",), "x" * 1500)
+
+    assert first.digest not in session.files
+    assert session.current_file().path == "b.py"
+    assert session.size_bytes <= 3000
+
+    store = sessions.SessionStore(idle_seconds=60)
+    store.get("old")
+    clock = [sessions.time.monotonic() + 61]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: clock[0])
+    store.get("new")
+    assert store.find("old") is None and store.find("new") is not None
@@ -0,0 +1,46 @@
+"""Tests for the schema inference of dev_agent/structured.py."""
+
+import json
+
+import pytest
+
+import agent_v2
+from dev_agent import structured
+
+RECORDS = [{"id": 1, "name": "a", "tags": ["x"]}, {"id": 7, "name": "b"}, {"id": 3, "name": None, "tags": []}]
+
+def test_json_lines_schema():
+    content = "".join(json.dumps(record) + "\n" for record in RECORDS) + "not json\n"
+
+    report = structured.summarize(content, "data.jsonl")
+    schema = report.record_schema
+
+    assert (report.records, report.invalid) == (4, 1)
+    assert schema.properties["id"].minimum == 1 and schema.properties["id"].maximum == 7
+    assert structured.to_json_schema(schema)["required"] == ["id", "name"]
+    assert "optional (67% of objects)" in structured.render_structure(report)
+
+def test_top_level_array_in_small_chunks():
+    content = json.dumps(RECORDS)
+
+    report = structured.summarize(content, "data.json", chunk_bytes=7)
+
+    assert report.record_count == 3
+    assert structured.to_json_schema(report.record_schema)["properties"]["name"]["type"] == ["string", "null"]
+
+def test_yaml_documents():
+    pytest.importorskip("yaml")
+    report = structured.summarize("a: 1\nb: [x, y]\n---\na: 2\n", "config.yaml")
+
+    assert report.records == 2
+    assert set(report.record_schema.properties) == {"a", "b"}
+
+@pytest.mark.parametrize("content", ["", "[]"])
+def test_empty_file_has_no_structure(tmp_path, content):
+    path = tmp_path / "empty.json"
+    path.write_text(content)
+
+    response = agent_v2.process_command("infer schema", "", str(path))
+
+    assert "The file has no records" in response
+    assert "Record:" not in response and "$schema" not in response
@@ -0,0 +1,20 @@
+"""Tests for the per-request timing breakdown of agent_v2.py."""
+
+import sys
+
+import agent_v2
+
+def test_imports_are_timed_apart_from_render(tmp_path, monkeypatch):
+    (tmp_path / "slow_module.py").write_text("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    timings = agent_v2.Timings()
+    monkeypatch.setattr(sys, "meta_path", [agent_v2.ImportTimer(timings), *sys.meta_path])
+
+    with timings.phase("process"):
+        import slow_module
+    phases = timings.to_dict()["phases"]
+
+    assert phases["import"] >= 50
+    assert phases["render"] < 10
+    # The module keeps its own loader once imported
+    assert not isinstance(slow_module.__loader__, agent_v2._TimedLoader)
@@ -0,0 +1,57 @@
+"""Tests for the file watcher of dev_agent/watcher.py."""
+
+import queue
+import sys
+
+import pytest
+
+from dev_agent import watcher
+
+@pytest.fixture(params=["inotify", "polling"])
+def watch(request, monkeypatch, tmp_path):
+    if request.param == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify needs Linux")
+    monkeypatch.setattr(watcher, "POLL_SECONDS", 0.05)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("x = 1\n")
+    changes = queue.Queue()
+    instance = watcher.Watcher(lambda paths, rescan: changes.put((paths, rescan)), debounce=0.05,
+                               polling=request.param == "polling")
+    instance.watch(str(tmp_path))
+    instance.start()
+    # A folder that was just added is compared with the disk once
+    assert changes.get(timeout=5) == ([], [str(tmp_path)])
+    yield changes
+    instance.stop()
+
+def test_changed_files_are_reported_once_after_a_burst(watch, tmp_path):
+    path = tmp_path / "src" / "app.py"
+    for index in range(5):
+        path.write_text(f"x = {index + 2}\n")
+    (tmp_path / "src" / "new.py").write_text("y = 1\n")
+
+    reported = []
+    while str(tmp_path / "src" / "new.py") not in reported:
+        paths, rescan = watch.get(timeout=5)
+        reported.extend(paths)
+        assert rescan == []
+
+    assert sorted(reported) == [str(path), str(tmp_path / "src" / "new.py")]
+    with pytest.raises(queue.Empty):
+        watch.get(timeout=0.3)
+
+def test_deleted_files_are_reported(watch, tmp_path):
+    (tmp_path / "src" / "app.py").unlink()
+
+    paths, _ = watch.get(timeout=5)
+
+    assert str(tmp_path / "src" / "app.py") in paths
+
+def test_files_in_new_directories_are_reported(watch, tmp_path):
+    package = tmp_path / "pkg"
+    package.mkdir()
+    (package / "mod.py").write_text("z = 1\n")
+
+    paths = set()
+    while str(package / "mod.py") not in paths:
+        paths.update(watch.get(timeout=5)[0])
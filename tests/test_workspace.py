@@ -0,0 +1,76 @@
+"""Tests for the workspace summary of dev_agent/workspace.py and the "summarize workspace" command."""
+
+import pytest
+
+import agent_v2
+from dev_agent import deadline, workspace
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    root = tmp_path / "project"
+    (root / "pkg").mkdir(parents=True)
+    for number in range(6):
+        (root / "pkg" / f"mod{number}.py").write_text(f"class C{number}:\n    def f(self):\n        if x:\n"
+                                                      f"            pass  # TODO\n" + "\n" * number)
+    (root / "app.js").write_text("function main() {\n  for (;;) {}\n}\n")
+    (root / "notes.txt").write_text("not code\n")
+    (root / "blob.py").write_bytes(b"\0binary")
+    (root / ".gitignore").write_text("build/\n")
+    (root / "build").mkdir()
+    (root / "build" / "out.js").write_text("function generated() {}\n")
+    return root
+
+def scan(root, workers=1, cache_path=None):
+    summary = workspace.WorkspaceSummary([str(root)])
+    progress = list(workspace.scan(summary, cache_path, workers))
+    return summary, progress
+
+def test_parallel_scan_matches_the_serial_one(project, monkeypatch, tmp_path):
+    serial, progress = scan(project, cache_path=str(tmp_path / "serial.json"))
+    monkeypatch.setattr(workspace, "MIN_PARALLEL_FILES", 2)
+    monkeypatch.setattr(workspace, "MAX_BATCH_FILES", 2)
+    parallel, _ = scan(project, workers=2, cache_path=str(tmp_path / "parallel.json"))
+
+    assert progress[0]["files_total"] == 8 and progress[0]["files_done"] == 0
+    assert (serial.files, serial.skipped, serial.other_files) == (7, 1, 2)
+    assert serial.languages == {"Python": [6, 39, 6, 6], "JavaScript": [1, 3, 0, 1]}
+    assert serial.todo == 6 and serial.largest_files()[0] == (9, "pkg/mod5.py")
+    assert (parallel.languages, parallel.todo, parallel.largest_files()) == \
+        (serial.languages, serial.todo, serial.largest_files())
+
+def test_unchanged_files_come_from_the_cache(project):
+    scan(project)
+    (project / "app.js").write_text("function main() {}\n")
+
+    summary, _ = scan(project)
+
+    assert summary.cached == 7
+    assert summary.languages["JavaScript"][1] == 1
+
+def test_cancelled_scan_keeps_the_work_done(project, monkeypatch):
+    token = deadline.CancelToken()
+    analyze_batch = workspace.analyze_batch
+
+    def analyze_then_cancel(paths):
+        token.cancel("deadline exceeded")
+        return analyze_batch(paths)
+
+    monkeypatch.setattr(workspace, "MAX_BATCH_FILES", 3)
+    monkeypatch.setattr(workspace, "analyze_batch", analyze_then_cancel)
+    with pytest.raises(deadline.Cancelled), deadline.activate(token):
+        scan(project)
+    monkeypatch.setattr(workspace, "analyze_batch", analyze_batch)
+
+    summary, _ = scan(project)
+    assert summary.cached == 3 and summary.files == 7
+
+def test_summarize_workspace_command(project):
+    first = agent_v2.process_command("summarize workspace", "", None, None, [str(project)])
+    second = agent_v2.process_command("summarize workspace", "", None, None, [str(project)])
+
+    assert "`project` contains 7 source files with 42 lines in 2 languages." in first
+    assert "| Python | 6 | 39 | 6 | 6 |" in first
+    assert "- TODO: 6" in first
+    assert "_2 files in other formats were not analyzed; 1 binary, unreadable or oversized files were skipped._" in first
+    assert "(8 unchanged since the last summary)" in second
@@ -6,22 +6,82 @@ This script handles workflow orchestration tasks.
 
 import argparse
 import json
+import struct
 import sys
 import os
-import traceback
+import time
+import zlib
 from datetime import datetime
 
+# Frame format of dev_agent/ipc.py, which the orchestrator cannot import
+# since it runs in its own environment: a 4-byte big-endian header length,
+# a JSON header, then the segments it lists as [field, length, flags]
+_FRAME_LENGTH = struct.Struct(">I")
+SEGMENT_MIN_CHARS = 1024
+
+class DeadlineExceeded(Exception):
+    """Raised when the workflow runs past the --deadline it was given."""
+
+def check_deadline(deadline):
+    """Raise DeadlineExceeded once the Unix timestamp deadline has passed."""
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded(f"Deadline exceeded by {time.time() - deadline:.3f} seconds")
+
+def read_frame(stream):
+    """Read one framed message from a binary stream."""
+    def read_exactly(size):
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError(f"frame truncated after {len(data)} of {size} bytes")
+        return data
+    (length,) = _FRAME_LENGTH.unpack(read_exactly(_FRAME_LENGTH.size))
+    message = json.loads(read_exactly(length))
+    for field, size, flags in message.pop("_segments", ()):
+        payload = read_exactly(size)
+        if "z" in flags:
+            payload = zlib.decompress(payload)
+        message[field] = payload if "b" in flags else payload.decode("utf-8")
+    return message
+
+def write_frame(stream, message):
+    """Write a message to a binary stream as one frame, long strings as segments."""
+    header, segments, payloads = {}, [], []
+    for field, value in message.items():
+        try:
+            payload = value.encode("utf-8") if isinstance(value, str) and len(value) >= SEGMENT_MIN_CHARS else None
+        except UnicodeEncodeError:
+            payload = None
+        if payload is None:
+            header[field] = value
+        else:
+            segments.append([field, len(payload), ""])
+            payloads.append(payload)
+    if segments:
+        header["_segments"] = segments
+    data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    stream.write(_FRAME_LENGTH.pack(len(data)) + data)
+    for payload in payloads:
+        stream.write(payload)
+    stream.flush()
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Workflow Orchestrator')
     parser.add_argument('--input-file', type=str, help='Path to the input JSON file')
     parser.add_argument('--output-file', type=str, help='Path to the output JSON file')
+    parser.add_argument('--framed', action='store_true',
+                        help='Read the input as a frame on stdin and write the result as a frame on stdout')
     parser.add_argument('--workflow', type=str, help='Workflow to execute')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
+    parser.add_argument('--deadline', type=float, help='Unix time after which the workflow is abandoned')
     return parser.parse_args()
 
-def execute_workflow(workflow_name, input_data, verbose=False):
-    """Execute the specified workflow with the given input data."""
+def execute_workflow(workflow_name, input_data, verbose=False, deadline=None):
+    """Execute the specified workflow with the given input data.
+
+    Long-running steps should call check_deadline(deadline) between units of work.
+    """
+    check_deadline(deadline)
     if verbose:
         print(f"Executing workflow: {workflow_name}")
         print(f"Input data: {input_data}")
@@ -40,8 +100,13 @@ def main():
     """Main function to process input and execute workflows."""
     args = parse_arguments()
     
-    if not args.input_file:
-        print("Error: No input file specified. Use --input-file to specify the input JSON file.")
+    reply_stream = None
+    if args.framed:
+        # stdout carries the result frame; everything printed goes to stderr
+        reply_stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
+    elif not args.input_file:
+        print("Error: No input file specified. Use --input-file to specify the input JSON file, or --framed.")
         sys.exit(1)
     
     if not args.workflow:
@@ -49,24 +114,34 @@ def main():
         sys.exit(1)
     
     try:
-        # Read the input file
-        with open(args.input_file, 'r') as f:
-            input_data = json.load(f)
+        # Read the input frame or file
+        if args.framed:
+            input_data = read_frame(sys.stdin.buffer)
+        else:
+            with open(args.input_file, 'r') as f:
+                input_data = json.load(f)
         
         # Execute the workflow
-        result = execute_workflow(args.workflow, input_data, args.verbose)
+        result = execute_workflow(args.workflow, input_data, args.verbose, args.deadline)
+        check_deadline(args.deadline)
         
-        # Write the result to the output file if specified
-        if args.output_file:
+        # Write the result as a frame, or to the output file if specified
+        if reply_stream is not None:
+            write_frame(reply_stream, result)
+        elif args.output_file:
             with open(args.output_file, 'w') as f:
                 json.dump(result, f, indent=2)
         else:
             # Print the result to stdout
             print(json.dumps(result, indent=2))
         
+    except DeadlineExceeded as e:
+        print(f"Error executing workflow: {str(e)}")
+        sys.exit(124)
     except Exception as e:
         print(f"Error executing workflow: {str(e)}")
         if args.verbose:
+            import traceback
             traceback.print_exc()
         sys.exit(1)
 